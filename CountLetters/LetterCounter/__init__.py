@@ -3,4 +3,10 @@
 This file makes `LetterCounter` importable for tests and scripts.
 """
 
-__all__ = ["letter_counter"]
+# Submodules are imported by whoever uses them; this block only tells type
+# checkers what ``__all__`` refers to
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+	from . import alphabet, cache, crawl, formats, letter_counter, ngrams, weighted
+
+__all__ = ["alphabet", "cache", "crawl", "formats", "letter_counter", "ngrams", "weighted"]
@@ -0,0 +1,147 @@
+"""Alphabets that decide which letters are counted and how they fold.
+
+The counting engines report every character ``str.isalpha`` accepts,
+upper-cased, so accented and non-Latin letters show up as keys of their own.
+An alphabet maps those counts onto the letters a report should contain:
+
+- ``ascii``: only A-Z; every other letter is dropped.
+- ``latin``: Latin letters are folded to their base letters A-Z using
+  tables precomputed from Unicode NFD decompositions (``É`` -> ``E``,
+  ``Ñ`` -> ``N``), plus the letters NFD leaves alone (``ß`` -> ``SS``,
+  ``Æ`` -> ``AE``, ``Ø`` -> ``O``, ...). Other scripts are dropped.
+- ``unicode``: every letter is kept as counted.
+
+Folding works on counts rather than text: a Counter has a few dozen keys
+however large the input was, so no per-character ``unicodedata`` call is
+ever made. :func:`fold_text` applies the same tables to text in a single
+``str.translate`` pass for callers that need folded text itself.
+
+Examples
+--------
+>>> from collections import Counter
+>>> from LetterCounter.alphabet import fold_counts
+>>> fold_counts(Counter({'E': 2, 'É': 1, 'SS': 1, 'Ж': 4}), 'latin')
+Counter({'E': 3, 'S': 2})
+
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+	from typing import Counter as CounterType, Dict, Mapping
+
+ALPHABETS = ("ascii", "latin", "unicode")
+
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_LETTER_SET = frozenset(LETTERS)
+
+# Latin letters without a canonical decomposition to a base letter
+_LATIN_EXTRAS = {
+	"ß": "SS", "ẞ": "SS", "Æ": "AE", "æ": "AE", "Œ": "OE", "œ": "OE",
+	"Ø": "O", "ø": "O", "Þ": "TH", "þ": "TH", "Ð": "D", "ð": "D",
+	"Đ": "D", "đ": "D", "Ħ": "H", "ħ": "H", "ı": "I", "Ĳ": "IJ", "ĳ": "IJ",
+	"ĸ": "K", "Ŀ": "L", "ŀ": "L", "Ł": "L", "ł": "L", "Ŋ": "NG", "ŋ": "NG",
+	"Ŧ": "T", "ŧ": "T", "ſ": "S",
+}
+
+# Latin-1 Supplement, Latin Extended-A/B and Latin Extended Additional
+_LATIN_RANGES = ((0x00C0, 0x0250), (0x1E00, 0x1F00))
+
+
+_latin_table: Dict[int, str | None] | None = None
+
+
+def _get_latin_table() -> Dict[int, str | None]:
+	"""Map every non-ASCII Latin letter to its upper-case A-Z base letters.
+
+	Built on first use, so the ``ascii`` and ``unicode`` alphabets never pay
+	for importing ``unicodedata`` and decomposing the Latin blocks.
+	"""
+	global _latin_table
+	if _latin_table is not None:
+		return _latin_table
+
+	import unicodedata
+
+	table: Dict[int, str | None] = {}
+	for start, stop in _LATIN_RANGES:
+		for cp in range(start, stop):
+			ch = chr(cp)
+			if not ch.isalpha():
+				continue
+			base = _LATIN_EXTRAS.get(ch)
+			if base is None:
+				# NFD splits off combining marks; keep the ASCII letters left
+				base = "".join(c for c in unicodedata.normalize("NFD", ch).upper() if c in LETTERS)
+			table[cp] = base or None
+	_latin_table = table
+	return table
+
+
+def fold_text(text: str, alphabet: str = "latin") -> str:
+	"""Return ``text`` upper-cased with its letters folded for ``alphabet``.
+
+	Characters outside the alphabet are left in place (for ``latin`` only
+	Latin letters are rewritten); counting then ignores them as usual.
+
+	Args:
+		text: Text to fold.
+		alphabet: One of :data:`ALPHABETS`.
+
+	Returns:
+		The folded text.
+	"""
+	_check(alphabet)
+	text = text.upper()
+	if alphabet == "latin" and not text.isascii():
+		text = text.translate(_get_latin_table())
+	return text
+
+
+def fold_counts(counts: Mapping[str, int], alphabet: str = "latin") -> CounterType[str]:
+	"""Fold letter counts onto ``alphabet``.
+
+	Keys may hold several letters (``'ß'.upper()`` is ``'SS'``); each letter
+	of a key is counted.
+
+	Args:
+		counts: Mapping of upper-case letters to counts, as returned by the
+			counting functions.
+		alphabet: One of :data:`ALPHABETS`.
+
+	Returns:
+		collections.Counter with the folded counts.
+	"""
+	_check(alphabet)
+	if alphabet == "unicode":
+		return Counter(counts)
+
+	folded: CounterType[str] = Counter()
+	for key, cnt in counts.items():
+		if alphabet == "ascii":
+			# Multi-letter keys come from non-ASCII letters ('ß' -> 'SS')
+			if key in _LETTER_SET:
+				folded[key] += cnt
+			continue
+		if not key.isascii():
+			key = key.translate(_get_latin_table())
+		for letter in key:
+			if letter in _LETTER_SET:
+				folded[letter] += cnt
+	return folded
+
+
+def report_keys(counts: Mapping[str, int], alphabet: str) -> list[str] | None:
+	"""Keys ``format_counts`` should list for ``alphabet`` (None means A-Z)."""
+	_check(alphabet)
+	if alphabet != "unicode":
+		return None
+	return sorted(set(LETTERS) | set(counts))
+
+
+def _check(alphabet: str) -> None:
+	if alphabet not in ALPHABETS:
+		raise ValueError(f"unknown alphabet {alphabet!r} (expected one of {', '.join(ALPHABETS)})")
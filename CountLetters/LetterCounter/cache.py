@@ -0,0 +1,312 @@
+"""Persistent caches of letter counts.
+
+Re-counting a large corpus that has not changed is wasted work. A
+:class:`CountCache` remembers the counts of every file it has seen, keyed
+by the file's path, size, modification time and inode (plus the encoding it
+was decoded with), so an unchanged file costs a single ``stat()``. With
+``content_hash=True`` a file whose metadata changed but whose bytes did not
+(for example after a ``touch`` or a copy) is recognised by a BLAKE2 digest
+of its content, which is still far cheaper than counting it again.
+
+The cache is one small binary file: each record holds the 26 A-Z counts as
+fixed-size integers plus any non-ASCII letters. Records are evicted least
+recently used first once ``max_entries`` is exceeded.
+
+For append-only files such as logs an :class:`OffsetStore` keeps, per path,
+how far the file was read and the counts up to there, so the next run only
+reads the bytes appended since (see
+:func:`LetterCounter.letter_counter.count_letters_incremental`).
+
+Examples
+--------
+>>> from LetterCounter.cache import CountCache
+>>> from LetterCounter.letter_counter import count_letters_in_file
+>>> with CountCache('counts.cache') as cache:                 # doctest: +SKIP
+...     counts = count_letters_in_file('corpus.txt', cache=cache)
+
+"""
+
+import hashlib
+import os
+import struct
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import BinaryIO, Counter as CounterType, Iterable, Iterator, NamedTuple
+
+from .alphabet import LETTERS
+
+_MAGIC = b"LCC1"
+_NO_DIGEST = bytes(16)
+# stat key, content digest, A-Z counts, length of the non-ASCII extras
+_RECORD = struct.Struct("<16s16s26QI")
+_HASH_BLOCK = 1 << 20
+
+_OFFSET_MAGIC = b"LCO1"
+# path key, inode, offset, digest of the bytes before offset, A-Z counts, extras length
+_OFFSET_RECORD = struct.Struct("<16sQQ16s26QI")
+# How many bytes before the saved offset are compared to detect a rewritten file
+FINGERPRINT_SIZE = 4096
+
+
+class _Entry(NamedTuple):
+	content: bytes
+	hist: tuple[int, ...]
+	extras: bytes
+
+
+def _digest(*parts: object) -> bytes:
+	return hashlib.blake2b("\0".join(map(str, parts)).encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+def _encode_extras(counts: CounterType[str]) -> bytes:
+	return "\n".join(f"{key}\t{cnt}" for key, cnt in counts.items() if key not in LETTERS).encode("utf-8")
+
+
+def _decode_extras(data: bytes) -> CounterType[str]:
+	extras: CounterType[str] = Counter()
+	for line in data.decode("utf-8").splitlines():
+		key, _, cnt = line.rpartition("\t")
+		extras[key] = int(cnt)
+	return extras
+
+
+def _histogram(counts: CounterType[str]) -> tuple[int, ...]:
+	return tuple(counts.get(letter, 0) for letter in LETTERS)
+
+
+def _counts(hist: Iterable[int], extras: bytes) -> CounterType[str]:
+	counts = Counter({letter: cnt for letter, cnt in zip(LETTERS, hist) if cnt})
+	counts.update(_decode_extras(extras))
+	return counts
+
+
+def _read_records(path: Path, magic: bytes, record: struct.Struct) -> Iterator[tuple[tuple, bytes]]:
+	"""Yield ``(fields, extras)`` from a record file; the last field is the extras length."""
+	try:
+		data = path.read_bytes()
+	except FileNotFoundError:
+		return
+	if not data.startswith(magic):
+		return  # unknown format; start over and overwrite on save
+
+	pos = len(magic)
+	while pos + record.size <= len(data):
+		*fields, extras_len = record.unpack_from(data, pos)
+		pos += record.size
+		yield tuple(fields), data[pos:pos + extras_len]
+		pos += extras_len
+
+
+def _write_records(path: Path, magic: bytes, record: struct.Struct, items: Iterable[tuple[tuple, bytes]]) -> None:
+	"""Write ``(fields, extras)`` records to ``path``, replacing it atomically."""
+	path.parent.mkdir(parents=True, exist_ok=True)
+	tmp = path.with_name(path.name + ".tmp")
+	with open(tmp, "wb") as fh:
+		fh.write(magic)
+		for fields, extras in items:
+			fh.write(record.pack(*fields, len(extras)))
+			fh.write(extras)
+	os.replace(tmp, path)
+
+
+class CountCache:
+	"""On-disk, size-bounded LRU cache of per-file letter counts.
+
+	Use it as a context manager, or call :meth:`save` when done; changes are
+	only written then. ``hits`` and ``misses`` count lookups since opening.
+
+	Args:
+		path: Cache file; created on first save.
+		max_entries: Number of files remembered before the least recently
+			used ones are dropped.
+		content_hash: On a metadata miss, also look the file up by a digest
+			of its content.
+	"""
+
+	def __init__(self, path: str | Path, max_entries: int = 10_000, content_hash: bool = False) -> None:
+		self.path = Path(path)
+		self.max_entries = max_entries
+		self.content_hash = content_hash
+		self.hits = 0
+		self.misses = 0
+		self._entries: OrderedDict[bytes, _Entry] = OrderedDict()
+		self._by_content: dict[bytes, bytes] = {}
+		# content digests computed during lookup, reused by store
+		self._pending: dict[bytes, bytes] = {}
+		self._dirty = False
+		self._load()
+
+	def __enter__(self) -> "CountCache":
+		return self
+
+	def __exit__(self, *exc_info: object) -> None:
+		self.save()
+
+	def __len__(self) -> int:
+		return len(self._entries)
+
+	def _load(self) -> None:
+		for (key, content, *hist), extras in _read_records(self.path, _MAGIC, _RECORD):
+			self._entries[key] = _Entry(content, tuple(hist), extras)
+			if content != _NO_DIGEST:
+				self._by_content[content] = key
+
+	def save(self) -> None:
+		"""Write the cache to disk if it changed, replacing the file atomically."""
+		if not self._dirty:
+			return
+		records = (((key, entry.content, *entry.hist), entry.extras) for key, entry in self._entries.items())
+		_write_records(self.path, _MAGIC, _RECORD, records)
+		self._dirty = False
+
+	@staticmethod
+	def _stat_key(path: Path, encoding: str, st: os.stat_result) -> bytes:
+		return _digest(os.path.abspath(path), st.st_size, st.st_mtime_ns, st.st_ino, encoding)
+
+	@staticmethod
+	def _content_key(path: Path, encoding: str) -> bytes:
+		h = hashlib.blake2b(digest_size=16)
+		with open(path, "rb") as fh:
+			while block := fh.read(_HASH_BLOCK):
+				h.update(block)
+		h.update(b"\0" + encoding.encode("ascii", "ignore"))
+		return h.digest()
+
+	def lookup(self, path: str | Path, encoding: str = "utf-8", st: os.stat_result | None = None) -> CounterType[str] | None:
+		"""Return the cached counts for ``path``, or None on a miss.
+
+		Args:
+			path: File to look up.
+			encoding: Encoding the counts were made with.
+			st: ``os.stat`` result of ``path`` if the caller already has one.
+		"""
+		p = Path(path)
+		st = st or p.stat()
+		key = self._stat_key(p, encoding, st)
+		entry = self._entries.get(key)
+
+		if entry is None and self.content_hash:
+			content = self._content_key(p, encoding)
+			old_key = self._by_content.get(content)
+			if old_key is not None and old_key in self._entries:
+				# Same bytes under new metadata (touched, copied, ...)
+				entry = self._entries[old_key]
+				self._entries[key] = entry
+				self._by_content[content] = key
+				self._dirty = True
+			else:
+				self._pending[key] = content
+
+		if entry is None:
+			self.misses += 1
+			return None
+
+		self._entries.move_to_end(key)
+		self.hits += 1
+		return _counts(entry.hist, entry.extras)
+
+	def store(self, path: str | Path, counts: CounterType[str], encoding: str = "utf-8", st: os.stat_result | None = None) -> None:
+		"""Remember ``counts`` for ``path``.
+
+		Pass the ``st`` taken before counting so a file that changed while it
+		was being read is not stored under its new metadata.
+		"""
+		p = Path(path)
+		st = st or p.stat()
+		key = self._stat_key(p, encoding, st)
+		content = self._pending.pop(key, None)
+		if content is None and self.content_hash:
+			content = self._content_key(p, encoding)
+
+		self._entries[key] = _Entry(content or _NO_DIGEST, _histogram(counts), _encode_extras(counts))
+		self._entries.move_to_end(key)
+		if content:
+			self._by_content[content] = key
+		while len(self._entries) > self.max_entries:
+			old_key, old = self._entries.popitem(last=False)
+			if self._by_content.get(old.content) == old_key:
+				del self._by_content[old.content]
+		self._dirty = True
+
+
+class Checkpoint(NamedTuple):
+	"""How far a file was counted: its inode, the byte offset reached, a
+	digest of the bytes just before that offset and the counts up to it."""
+
+	inode: int
+	offset: int
+	fingerprint: bytes
+	counts: CounterType[str]
+
+
+def fingerprint(fh: BinaryIO, offset: int) -> bytes:
+	"""Digest of the up to :data:`FINGERPRINT_SIZE` bytes of ``fh`` before ``offset``."""
+	start = max(0, offset - FINGERPRINT_SIZE)
+	fh.seek(start)
+	return hashlib.blake2b(fh.read(offset - start), digest_size=16).digest()
+
+
+class OffsetStore:
+	"""On-disk record of how far each file has been counted.
+
+	Used by :func:`~LetterCounter.letter_counter.count_letters_incremental`.
+	Like :class:`CountCache` it is written on :meth:`save` (or when the
+	``with`` block ends) and keeps at most ``max_entries`` paths, dropping the
+	least recently used. ``bytes_read`` and ``full_scans`` describe the work
+	done since opening.
+
+	Args:
+		path: State file; created on first save.
+		max_entries: Number of paths remembered.
+	"""
+
+	def __init__(self, path: str | Path, max_entries: int = 10_000) -> None:
+		self.path = Path(path)
+		self.max_entries = max_entries
+		self.bytes_read = 0
+		self.full_scans = 0
+		self._entries: OrderedDict[bytes, tuple[tuple, bytes]] = OrderedDict()
+		self._dirty = False
+		for (key, *fields), extras in _read_records(self.path, _OFFSET_MAGIC, _OFFSET_RECORD):
+			self._entries[key] = (tuple(fields), extras)
+
+	def __enter__(self) -> "OffsetStore":
+		return self
+
+	def __exit__(self, *exc_info: object) -> None:
+		self.save()
+
+	def __len__(self) -> int:
+		return len(self._entries)
+
+	@staticmethod
+	def _key(path: str | Path, encoding: str) -> bytes:
+		return _digest(os.path.abspath(path), encoding)
+
+	def get(self, path: str | Path, encoding: str = "utf-8") -> Checkpoint | None:
+		"""Return the last checkpoint of ``path``, or None if it was never counted."""
+		key = self._key(path, encoding)
+		entry = self._entries.get(key)
+		if entry is None:
+			return None
+		self._entries.move_to_end(key)
+		(inode, offset, digest, *hist), extras = entry
+		return Checkpoint(inode, offset, digest, _counts(hist, extras))
+
+	def put(self, path: str | Path, checkpoint: Checkpoint, encoding: str = "utf-8") -> None:
+		"""Remember ``checkpoint`` as the state of ``path``."""
+		key = self._key(path, encoding)
+		fields = (checkpoint.inode, checkpoint.offset, checkpoint.fingerprint, *_histogram(checkpoint.counts))
+		self._entries[key] = (fields, _encode_extras(checkpoint.counts))
+		self._entries.move_to_end(key)
+		while len(self._entries) > self.max_entries:
+			self._entries.popitem(last=False)
+		self._dirty = True
+
+	def save(self) -> None:
+		"""Write the state to disk if it changed, replacing the file atomically."""
+		if not self._dirty:
+			return
+		records = (((key, *fields), extras) for key, (fields, extras) in self._entries.items())
+		_write_records(self.path, _OFFSET_MAGIC, _OFFSET_RECORD, records)
+		self._dirty = False
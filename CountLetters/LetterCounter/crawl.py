@@ -0,0 +1,313 @@
+"""Count letters across large trees of small files.
+
+For a source tree with hundreds of thousands of tiny files the cost is in
+opening and reading them one at a time, not in counting. A
+:class:`TreeCounter` instead:
+
+- walks the tree with ``os.scandir`` (no per-entry ``stat`` unless a size
+  filter needs it) and filters by extension and size,
+- reads files on a bounded pool of threads with ``readinto`` into a fixed
+  set of reusable buffers, packing many small files into each buffer
+  (file I/O releases the GIL, so reads overlap each other and the counting),
+- and feeds every full buffer to one counting loop, so the per-block
+  counting cost is paid once per buffer rather than once per file.
+
+Files are read as UTF-8. Files that vanish or cannot be read while the
+crawl runs are skipped and counted in ``errors``. If counting is
+interrupted (an exception or Ctrl+C), the reader threads stop at their next
+buffer instead of reading the rest of the tree.
+
+Examples
+--------
+>>> from LetterCounter.crawl import TreeCounter
+>>> crawler = TreeCounter(extensions=['.py', '.md'], max_size=1 << 20)   # doctest: +SKIP
+>>> counts = crawler.count(['src'])                                       # doctest: +SKIP
+>>> crawler.files, crawler.bytes_read                                     # doctest: +SKIP
+(18342, 96113875)
+
+"""
+
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Counter as CounterType, Iterable, Iterator
+
+from .letter_counter import CHUNK_SIZE, BlockCounter
+
+_NEWLINE = 10
+
+# How often a reader waiting for a free buffer checks whether to stop
+_STOP_POLL = 0.1
+
+
+class _Stopped(Exception):
+	"""Raised inside a reader thread once the crawl has been abandoned."""
+
+
+def _normalize_extensions(extensions: Iterable[str] | None) -> frozenset[str] | None:
+	if extensions is None:
+		return None
+	return frozenset(ext.lower() if ext.startswith(".") else "." + ext.lower() for ext in extensions)
+
+
+def iter_tree(
+	roots: Iterable[str | Path],
+	extensions: Iterable[str] | None = None,
+	min_size: int = 0,
+	max_size: int | None = None,
+) -> Iterator[str]:
+	"""Yield the files under ``roots`` that pass the filters.
+
+	Directories are walked depth first with ``os.scandir``; symlinked
+	directories are not followed. Root paths that are files are yielded
+	as-is (still filtered).
+
+	Args:
+		roots: Files and directories to walk.
+		extensions: Only yield files with one of these suffixes
+			(case-insensitive, with or without the dot); all files if None.
+		min_size: Skip files smaller than this many bytes.
+		max_size: Skip files larger than this many bytes.
+
+	Raises:
+		FileNotFoundError: if a root does not exist.
+	"""
+	exts = _normalize_extensions(extensions)
+	need_size = min_size > 0 or max_size is not None
+
+	def wanted(name: str, size: int | None) -> bool:
+		# ``size`` is only looked up (and not None) when a size filter is set
+		if exts is not None and os.path.splitext(name)[1].lower() not in exts:
+			return False
+		if size is not None and (size < min_size or (max_size is not None and size > max_size)):
+			return False
+		return True
+
+	for root in roots:
+		root = os.fspath(root)
+		if os.path.isfile(root):
+			if wanted(root, os.path.getsize(root) if need_size else None):
+				yield root
+			continue
+		if not os.path.isdir(root):
+			raise FileNotFoundError(root)
+
+		stack = [root]
+		while stack:
+			try:
+				it = os.scandir(stack.pop())
+			except OSError:
+				continue  # unreadable or vanished directory
+			with it:
+				subdirs = []
+				for entry in it:
+					try:
+						if entry.is_dir(follow_symlinks=False):
+							subdirs.append(entry.path)
+						elif entry.is_file() and wanted(entry.name, entry.stat().st_size if need_size else None):
+							yield entry.path
+					except OSError:
+						continue
+			# Reversed so the walk visits subdirectories in listing order
+			stack.extend(reversed(subdirs))
+
+
+def _utf8_cut(buf: bytearray, end: int) -> int:
+	"""Return the largest offset <= ``end`` that does not split a UTF-8 character."""
+	for i in range(end - 1, max(end - 4, 0) - 1, -1):
+		byte = buf[i]
+		if byte & 0xC0 == 0x80:
+			continue
+		size = 1 if byte < 0xC0 else 2 if byte < 0xE0 else 3 if byte < 0xF0 else 4
+		return i if i + size > end else end
+	return end
+
+
+class TreeCounter:
+	"""Count letters in every matching file under a set of directories.
+
+	``files``, ``bytes_read`` and ``errors`` describe the last :meth:`count`.
+
+	Args:
+		extensions: Only count files with these suffixes; all files if None.
+		min_size: Skip files smaller than this many bytes.
+		max_size: Skip files larger than this many bytes.
+		threads: Reader threads.
+		buffer_size: Size of each reusable read buffer; ``2 * threads``
+			buffers are allocated.
+	"""
+
+	def __init__(
+		self,
+		extensions: Iterable[str] | None = None,
+		min_size: int = 0,
+		max_size: int | None = None,
+		threads: int = 8,
+		buffer_size: int = CHUNK_SIZE,
+	) -> None:
+		if threads < 1:
+			raise ValueError(f"threads must be at least 1, got {threads}")
+		if buffer_size < 16:
+			raise ValueError(f"buffer_size must be at least 16, got {buffer_size}")
+		self.extensions = _normalize_extensions(extensions)
+		self.min_size = min_size
+		self.max_size = max_size
+		self.threads = threads
+		self.buffer_size = buffer_size
+		self.files = 0
+		self.bytes_read = 0
+		self.errors = 0
+		self._lock = threading.Lock()
+
+	def count(self, roots: Iterable[str | Path]) -> CounterType[str]:
+		"""Count the letters of every matching file under ``roots``.
+
+		Returns:
+			collections.Counter mapping uppercase letters to counts.
+		"""
+		self.files = self.bytes_read = self.errors = 0
+		paths = iter_tree(roots, self.extensions, self.min_size, self.max_size)
+		# Walk the roots now so a missing one is reported before any thread starts
+		first = next(paths, None)
+		if first is None:
+			return BlockCounter().close()
+
+		free: queue.Queue[bytearray] = queue.Queue()
+		for _ in range(2 * self.threads):
+			free.put(bytearray(self.buffer_size))
+		full: queue.Queue[bytearray | None] = queue.Queue()
+		stop = threading.Event()
+		pending = iter([first])
+
+		def next_path() -> str | None:
+			nonlocal pending
+			if stop.is_set():
+				return None
+			with self._lock:
+				path = next(pending, None)
+				if path is None:
+					pending = paths
+					path = next(paths, None)
+				return path
+
+		counter = BlockCounter()
+		with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="letter-reader") as pool:
+			readers = [pool.submit(self._read_files, next_path, free, full, stop) for _ in range(self.threads)]
+			try:
+				done = 0
+				while done < self.threads:
+					buf = full.get()
+					if buf is None:
+						done += 1
+						continue
+					counter.feed(buf)
+					free.put(buf)
+			except BaseException:
+				# Buffers are no longer recycled; without this the readers would
+				# wait for one forever and the pool shutdown with them
+				stop.set()
+				raise
+			for reader in readers:
+				reader.result()  # re-raise anything a reader failed with
+		return counter.close()
+
+	@staticmethod
+	def _take(free: queue.Queue, stop: threading.Event) -> bytearray:
+		"""Wait for a free buffer; raise :class:`_Stopped` once ``stop`` is set."""
+		while not stop.is_set():
+			try:
+				return free.get(timeout=_STOP_POLL)
+			except queue.Empty:
+				continue
+		raise _Stopped
+
+	def _read_files(self, next_path, free: queue.Queue, full: queue.Queue, stop: threading.Event) -> None:
+		"""Reader thread: pack whole files into buffers and hand them to the counter."""
+		zeros = memoryview(bytes(self.buffer_size))
+		size = self.buffer_size
+		buf = bytearray()
+		view = memoryview(buf)
+		pos = 0
+		files = read = errors = 0
+
+		def ship(end: int) -> None:
+			nonlocal buf, view
+			# Zero bytes are neither letters nor part of a character, so the
+			# unused tail can be counted along without changing the result
+			view[end:] = zeros[:size - end]
+			full.put(buf)
+			buf = self._take(free, stop)
+			view = memoryview(buf)
+
+		try:
+			buf = self._take(free, stop)
+			view = memoryview(buf)
+			while (path := next_path()) is not None:
+				try:
+					fh = open(path, "rb", buffering=0)
+				except OSError:
+					errors += 1
+					continue
+				with fh:
+					while True:
+						try:
+							n = fh.readinto(view[pos:])
+						except OSError:
+							errors += 1
+							break
+						if not n:
+							break
+						pos += n
+						read += n
+						if pos == size:
+							# Keep a character split by the buffer end for the next buffer
+							cut = _utf8_cut(buf, size)
+							carry = bytes(view[cut:])
+							ship(cut)
+							view[:len(carry)] = carry
+							pos = len(carry)
+				files += 1
+				# A newline between files resets any partial trailing character;
+				# a full buffer is always shipped, so there is room for it
+				buf[pos] = _NEWLINE
+				pos += 1
+				if pos == size:
+					ship(size)
+					pos = 0
+			if pos:
+				ship(pos)
+			free.put(buf)
+		except _Stopped:
+			pass
+		finally:
+			with self._lock:
+				self.files += files
+				self.bytes_read += read
+				self.errors += errors
+			full.put(None)
+
+
+def count_letters_in_tree(
+	roots: Iterable[str | Path],
+	extensions: Iterable[str] | None = None,
+	min_size: int = 0,
+	max_size: int | None = None,
+	threads: int = 8,
+) -> CounterType[str]:
+	"""Count letters in every matching file under ``roots``.
+
+	Convenience wrapper around :class:`TreeCounter`.
+
+	Args:
+		roots: Files and directories to walk.
+		extensions: Only count files with these suffixes; all files if None.
+		min_size: Skip files smaller than this many bytes.
+		max_size: Skip files larger than this many bytes.
+		threads: Reader threads.
+
+	Returns:
+		collections.Counter mapping uppercase letters to counts.
+	"""
+	return TreeCounter(extensions, min_size, max_size, threads).count(roots)
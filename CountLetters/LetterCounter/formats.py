@@ -0,0 +1,158 @@
+"""Machine-readable output formats for letter counts.
+
+:func:`~LetterCounter.letter_counter.format_counts` is meant for people.
+The formats here are meant for other programs and can be read back with
+:func:`read_counts`, so partial results (one per shard, per host, per day)
+can be summed by :func:`merge_counts` without scanning any text again:
+
+- ``json``: one object mapping letters to counts.
+- ``csv``: ``letter,count,percent`` rows with a header line.
+- ``binary``: a compact histogram; a magic header, the 26 A-Z counts as
+  little-endian 64-bit integers, then any other keys as ``key<TAB>count``
+  lines.
+
+The letters A-Z are always written, zero counts included, so every output
+of a run has the same shape.
+
+Examples
+--------
+>>> from collections import Counter
+>>> from LetterCounter.formats import dump_counts, load_counts
+>>> load_counts(dump_counts(Counter({'A': 2, 'É': 1}), 'binary'))
+Counter({'A': 2, 'É': 1})
+
+"""
+
+import csv
+import io
+import json
+import struct
+from collections import Counter
+from pathlib import Path
+from typing import Counter as CounterType, Iterable, Mapping
+
+from .alphabet import LETTERS
+
+FORMATS = ("text", "json", "csv", "binary")
+
+_MAGIC = b"LCH1"
+# A-Z counts, length of the extra keys
+_HEADER = struct.Struct("<26QI")
+
+
+def _number(value: str) -> float:
+	try:
+		return int(value)
+	except ValueError:
+		return float(value)
+
+
+def _ordered_keys(counts: Mapping[str, float]) -> list[str]:
+	return list(LETTERS) + sorted(key for key in counts if key not in LETTERS)
+
+
+def dump_counts(counts: Mapping[str, float], fmt: str) -> bytes:
+	"""Serialize ``counts`` in one of the machine-readable formats.
+
+	Args:
+		counts: Mapping of letters to counts (weighted counts may be floats).
+		fmt: ``"json"``, ``"csv"`` or ``"binary"``.
+
+	Returns:
+		The encoded counts; text formats are UTF-8 and end with a newline.
+	"""
+	keys = _ordered_keys(counts)
+	if fmt == "json":
+		text = json.dumps({key: counts.get(key, 0) for key in keys}, ensure_ascii=False)
+		return (text + "\n").encode("utf-8")
+
+	if fmt == "csv":
+		total = sum(counts.get(key, 0) for key in keys)
+		buf = io.StringIO()
+		writer = csv.writer(buf, lineterminator="\n")
+		writer.writerow(("letter", "count", "percent"))
+		for key in keys:
+			cnt = counts.get(key, 0)
+			writer.writerow((key, cnt, f"{cnt / total * 100.0:.4f}" if total else "0.0000"))
+		return buf.getvalue().encode("utf-8")
+
+	if fmt == "binary":
+		hist = []
+		extras = []
+		for key in keys:
+			cnt = counts.get(key, 0)
+			if key in LETTERS and isinstance(cnt, int):
+				hist.append(cnt)
+			else:
+				# Fractional (weighted) letter counts go with the extras as text
+				if key in LETTERS:
+					hist.append(0)
+				if cnt:
+					extras.append(f"{key}\t{cnt!r}")
+		data = "\n".join(extras).encode("utf-8")
+		return _MAGIC + _HEADER.pack(*hist, len(data)) + data
+
+	raise ValueError(f"unknown format {fmt!r} (expected one of json, csv, binary)")
+
+
+def load_counts(data: bytes) -> CounterType[str]:
+	"""Parse counts written by :func:`dump_counts`; the format is detected.
+
+	Raises:
+		ValueError: If ``data`` is not in a known format.
+	"""
+	# Summed in a plain dict: weighted histograms hold float counts
+	counts: dict[str, float] = {}
+	if data.startswith(_MAGIC):
+		if len(data) < len(_MAGIC) + _HEADER.size:
+			raise ValueError("truncated binary histogram")
+		*hist, extras_len = _HEADER.unpack_from(data, len(_MAGIC))
+		counts.update({letter: cnt for letter, cnt in zip(LETTERS, hist) if cnt})
+		start = len(_MAGIC) + _HEADER.size
+		for line in data[start:start + extras_len].decode("utf-8").splitlines():
+			key, _, cnt = line.rpartition("\t")
+			counts[key] = counts.get(key, 0) + _number(cnt)
+		return Counter(counts)
+
+	text = data.decode("utf-8-sig").lstrip()
+	if text.startswith("{"):
+		for key, cnt in json.loads(text).items():
+			if cnt:
+				counts[key] = counts.get(key, 0) + cnt
+		return Counter(counts)
+
+	rows = csv.reader(io.StringIO(text))
+	header = next(rows, None)
+	if not header or header[:2] != ["letter", "count"]:
+		raise ValueError("not a json, csv or binary letter histogram")
+	for row in rows:
+		if row:
+			cnt = _number(row[1])
+			if cnt:
+				counts[row[0]] = counts.get(row[0], 0) + cnt
+	return Counter(counts)
+
+
+def read_counts(path: str | Path) -> CounterType[str]:
+	"""Read a saved histogram file in any of the formats."""
+	return load_counts(Path(path).read_bytes())
+
+
+def merge_counts(paths: Iterable[str | Path]) -> CounterType[str]:
+	"""Sum the histograms saved in ``paths``.
+
+	Only the saved counts are read, never the text they came from, so
+	merging is proportional to the number of files rather than their corpus.
+	"""
+	hist = [0] * 26
+	extras: CounterType[str] = Counter()
+	for path in paths:
+		for key, cnt in read_counts(path).items():
+			index = ord(key) - 65 if len(key) == 1 else -1
+			if 0 <= index < 26:
+				hist[index] += cnt
+			else:
+				extras[key] += cnt
+	total = Counter({letter: cnt for letter, cnt in zip(LETTERS, hist) if cnt})
+	total.update(extras)
+	return total
@@ -15,53 +15,704 @@ The CLI prints counts in alphabetical order if run with a filename:
 
 """
 
-from collections import Counter
-import argparse
+# The CLI is started for every small input in shell pipelines, so importing
+# this module stays cheap: argparse, pathlib, typing, glob and the process
+# pool are only imported where they are used (annotations are not
+# evaluated).
+from __future__ import annotations
+
+from collections import Counter, deque
+import codecs
+import os
+import re
 import sys
-from pathlib import Path
-from typing import Counter as CounterType, Dict
+import time
+
+from .alphabet import LETTERS
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+	import argparse
+	from io import BufferedIOBase
+	from pathlib import Path
+	from typing import IO, BinaryIO, Callable, Counter as CounterType, Dict, Iterable, Iterator, Mapping
+
+	from .cache import CountCache, OffsetStore
+
+
+ENGINES = ("generator", "table")
+
+# Block size for the binary file reader; memory use is bounded by this, not by
+# the file size or the longest line.
+CHUNK_SIZE = 1 << 20
 
+# Files larger than this are split into byte ranges of about this size so a
+# single big file can keep several worker processes busy.
+SHARD_SIZE = 64 << 20
+
+_LETTER_CODES = LETTERS.encode("ascii")
+
+# Tables for the ``table`` engine: one ``bytes.translate`` pass folds a-z onto
+# A-Z and deletes every other byte, leaving only the 26 letters to count.
+_UPPER_TABLE = bytes.maketrans(LETTERS.lower().encode("ascii"), _LETTER_CODES)
+_NON_LETTER_BYTES = bytes(b for b in range(256) if not (65 <= b <= 90 or 97 <= b <= 122))
+_NON_ASCII_RUN = re.compile(r"[^\x00-\x7f]+")
+
+# With NumPy the ``table`` engine counts an input in one histogram pass
+# (``bincount`` over the bytes, ``unique`` over the code points) instead of
+# one ``bytes.count`` pass per letter. Importing NumPy costs about as much as
+# counting a few MB without it, so it is only imported for inputs of at least
+# _NUMPY_IMPORT_SIZE encoded bytes; once loaded (here or by anyone else) it
+# is used for any input of at least _NUMPY_MIN_SIZE. Inputs are counted
+# _NUMPY_SLICE bytes or characters at a time, which bounds the temporaries
+# NumPy makes (``bincount`` widens every byte to a machine word).
+_NUMPY_IMPORT_SIZE = 4 << 20
+_NUMPY_MIN_SIZE = 1 << 12
+_NUMPY_SLICE = 1 << 20
+_numpy_missing = False
+
+
+def _numpy(size: int, total: int = 0):
+	"""Return the numpy module if counting ``size`` items with it is worth it.
+
+	``total`` is the encoded size in bytes of the whole input ``size`` is a
+	part of; it decides whether NumPy is worth importing.
+	"""
+	global _numpy_missing
+	if size < _NUMPY_MIN_SIZE:
+		return None
+	np = sys.modules.get("numpy")
+	if np is None and max(size, total) >= _NUMPY_IMPORT_SIZE and not _numpy_missing:
+		try:
+			import numpy as np
+		except ImportError:
+			_numpy_missing = True
+	return np
+
+
+def _ascii_histogram(data: bytes | bytearray, total: int = 0) -> list[int]:
+	"""Return the A-Z counts of the ASCII letters in ``data`` as a 26-item list."""
+	np = _numpy(len(data), total)
+	if np is not None:
+		codes = np.frombuffer(data, np.uint8)
+		byte_counts = np.zeros(256, np.int64)
+		for start in range(0, len(codes), _NUMPY_SLICE):
+			byte_counts += np.bincount(codes[start:start + _NUMPY_SLICE], minlength=256)
+		return (byte_counts[65:91] + byte_counts[97:123]).tolist()
+
+	folded = data.translate(_UPPER_TABLE, _NON_LETTER_BYTES)
+	count = folded.count
+	hist = [count(code) for code in _LETTER_CODES[:-1]]
+	# Only letters survive the translate, so Z is whatever the others don't cover
+	hist.append(len(folded) - sum(hist))
+	return hist
+
+
+def _histogram_counter(hist: list[int]) -> CounterType[str]:
+	"""Turn a 26-item A-Z histogram into a Counter without zero entries."""
+	return Counter({letter: n for letter, n in zip(LETTERS, hist) if n})
+
+
+def _count_generator(text: str) -> CounterType[str]:
+	# Filter to letters, convert to uppercase and count
+	letters = (ch.upper() for ch in text if ch.isalpha())
+	return Counter(letters)
+
+
+def _count_non_ascii(text: str, total: int = 0) -> CounterType[str]:
+	"""Count the non-ASCII letters of ``text`` the way the generator engine does.
+
+	Each distinct character is tested and upper-cased once ('é' -> 'É',
+	'ß' -> 'SS'), after the characters themselves are counted in bulk.
+	"""
+	np = _numpy(len(text), total)
+	if np is not None:
+		chars: CounterType[str] = Counter()
+		for start in range(0, len(text), _NUMPY_SLICE):
+			piece = text[start:start + _NUMPY_SLICE].encode("utf-32-le", "surrogatepass")
+			codes = np.frombuffer(piece, np.uint32)
+			values, totals = np.unique(codes[codes > 0x7F], return_counts=True)
+			chars.update(dict(zip(map(chr, values.tolist()), totals.tolist())))
+	else:
+		chars = Counter("".join(_NON_ASCII_RUN.findall(text)))
 
-def count_letters_in_text(text: str) -> CounterType[str]:
+	counts: CounterType[str] = Counter()
+	for ch, n in chars.items():
+		if ch.isalpha():
+			counts[ch.upper()] += n
+	return counts
+
+
+def _count_table(text: str) -> CounterType[str]:
+	if text.isascii():
+		hist = _ascii_histogram(text.encode("ascii"))
+		extra = None
+	else:
+		size = len(text.encode("utf-8", "surrogatepass"))
+		hist = _ascii_histogram(text.encode("ascii", "ignore"), size)
+		extra = _count_non_ascii(text, size)
+
+	counts = _histogram_counter(hist)
+	if extra:
+		counts.update(extra)
+	return counts
+
+
+def count_letters_in_text(text: str, engine: str = "generator", alphabet: str = "unicode") -> CounterType[str]:
 	"""Count letters A-Z in ``text`` (case-insensitive).
 
 	Non-letter characters are ignored. Letters are normalized to uppercase
 	so the counts are case-insensitive.
 
+	Two engines produce the same counts:
+
+	- ``"generator"`` walks the text one character at a time.
+	- ``"table"`` counts in bulk and only looks at each distinct character
+	  once. With NumPy available, inputs of a few MB (encoded as UTF-8) and
+	  up are counted with histogram passes, which is well over 10x faster
+	  than ``"generator"`` on any text (ASCII, accented or CJK); the first
+	  such call also pays for importing NumPy. Without NumPy it folds and
+	  filters the ASCII part with ``bytes.translate`` and counts each letter
+	  with ``bytes.count``: about 5x faster on ASCII text and 2-3x on
+	  accented and CJK text.
+
+	With the default ``"unicode"`` alphabet every letter is its own key;
+	``"ascii"`` keeps only A-Z and ``"latin"`` folds accented Latin letters
+	onto A-Z (see :mod:`LetterCounter.alphabet`).
+
 	Args:
 		text: Input text to analyze.
+		engine: Counting engine, one of :data:`ENGINES`.
+		alphabet: Letters to report, one of ``"ascii"``, ``"latin"`` or
+			``"unicode"``.
 
 	Returns:
 		collections.Counter mapping uppercase letters to counts.
 	"""
-	# Filter to ASCII letters, convert to uppercase and count
-	letters = (ch.upper() for ch in text if ch.isalpha())
-	return Counter(letters)
+	if engine not in ENGINES:
+		raise ValueError(f"unknown engine {engine!r} (expected one of {', '.join(ENGINES)})")
+	if alphabet == "unicode":
+		return _count_table(text) if engine == "table" else _count_generator(text)
+
+	from .alphabet import fold_counts
+
+	if alphabet == "ascii" and engine == "table":
+		# Nothing outside A-Z is reported, so skip the non-ASCII pass entirely
+		return _histogram_counter(_ascii_histogram(text.encode("ascii", "ignore")))
+	return fold_counts(_count_table(text) if engine == "table" else _count_generator(text), alphabet)
+
 
+class BlockCounter:
+	"""Incrementally count letters in a stream of encoded byte blocks.
 
-def count_letters_in_file(path: str | Path, encoding: str = "utf-8") -> CounterType[str]:
+	Blocks may split multibyte characters anywhere; an incremental decoder
+	stitches them back together and undecodable bytes are ignored, the same
+	as ``errors="ignore"`` in text mode. For UTF-8 the ASCII letters are
+	counted straight from the raw bytes, and only blocks that contain
+	non-ASCII bytes are decoded at all. Memory use does not grow with the
+	amount of input fed.
+	"""
+
+	def __init__(self, encoding: str = "utf-8") -> None:
+		self._decoder = codecs.getincrementaldecoder(encoding)(errors="ignore")
+		self._utf8 = codecs.lookup(encoding).name == "utf-8"
+		self._hist = [0] * len(LETTERS)
+		self._extra: CounterType[str] = Counter()
+		self.bytes_fed = 0
+
+	def feed(self, block: bytes | bytearray) -> None:
+		"""Count one block of encoded bytes."""
+		self.bytes_fed += len(block)
+		if not self._utf8:
+			self._extra.update(_count_table(self._decoder.decode(block)))
+			return
+
+		# ASCII bytes never occur inside a multibyte UTF-8 sequence
+		self._hist = [a + b for a, b in zip(self._hist, _ascii_histogram(block, self.bytes_fed))]
+		if block.isascii():
+			# A pending partial sequence is cut short by ASCII and would be dropped
+			self._decoder.reset()
+			return
+		text = self._decoder.decode(block)
+		self._extra.update(_count_non_ascii(text, self.bytes_fed))
+
+	@property
+	def pending_bytes(self) -> int:
+		"""Bytes of a partial character held back from the last block."""
+		return len(self._decoder.getstate()[0])
+
+	def counts(self) -> CounterType[str]:
+		"""Return the counts so far (a partial trailing character is not included)."""
+		counts = _histogram_counter(self._hist)
+		counts.update(self._extra)
+		return counts
+
+	def close(self) -> CounterType[str]:
+		"""Flush the decoder and return the final counts."""
+		tail = self._decoder.decode(b"", final=True)
+		if tail:
+			self._extra.update(_count_table(tail))
+		return self.counts()
+
+
+class WindowCounter:
+	"""Letter counts over a sliding window of a text stream.
+
+	The window covers either the last ``size`` characters or the text fed
+	during the last ``seconds`` seconds. Text is kept as a ring of per-block
+	A-Z histograms (plus any non-ASCII letters); feeding a block adds its
+	histogram and evicting one subtracts it, so an update costs O(26) no
+	matter how large the window is.
+
+	In ``size`` mode the window is exact to within ``resolution``
+	characters: fed text is split into blocks of at most that many
+	characters, and only whole blocks are evicted.
+
+	Args:
+		size: Window length in characters.
+		seconds: Window length in seconds (give either this or ``size``).
+		resolution: Characters per block in ``size`` mode; defaults to
+			1/16 of the window.
+		clock: Time source for ``seconds`` mode.
+	"""
+
+	def __init__(
+		self,
+		size: int | None = None,
+		seconds: float | None = None,
+		resolution: int | None = None,
+		clock: Callable[[], float] = time.monotonic,
+	) -> None:
+		if (size is None) == (seconds is None):
+			raise ValueError("give exactly one of size or seconds")
+		if (size is not None and size < 1) or (seconds is not None and seconds <= 0):
+			raise ValueError("the window must be positive")
+		self.size = size
+		self.seconds = seconds
+		self.resolution = None if size is None else resolution or max(1, size // 16)
+		self._clock = clock
+		# (A-Z histogram, non-ASCII letters, characters, time fed)
+		self._blocks: deque[tuple[list[int], CounterType[str] | None, int, float]] = deque()
+		self._hist = [0] * len(LETTERS)
+		self._extra: CounterType[str] = Counter()
+		self.chars = 0
+
+	def feed(self, text: str) -> None:
+		"""Add ``text`` to the window, evicting what falls out of it."""
+		now = self._clock()
+		step = self.resolution or len(text) or 1
+		for start in range(0, len(text), step):
+			self._add(text[start:start + step], now)
+		self._evict(now)
+
+	def _add(self, piece: str, now: float) -> None:
+		if piece.isascii():
+			hist = _ascii_histogram(piece.encode("ascii"))
+			extra = None
+		else:
+			hist = _ascii_histogram(piece.encode("ascii", "ignore"))
+			extra = _count_non_ascii(piece) or None
+			if extra:
+				self._extra.update(extra)
+		self._hist = [a + b for a, b in zip(self._hist, hist)]
+		self._blocks.append((hist, extra, len(piece), now))
+		self.chars += len(piece)
+
+	def _evict(self, now: float) -> None:
+		blocks = self._blocks
+		while blocks:
+			hist, extra, chars, fed_at = blocks[0]
+			if self.size is not None:
+				# Drop the oldest block only if the window stays full without it
+				if self.chars - chars < self.size:
+					break
+			elif self.seconds is not None and fed_at > now - self.seconds:
+				break
+			blocks.popleft()
+			self._hist = [a - b for a, b in zip(self._hist, hist)]
+			if extra:
+				self._extra -= extra
+			self.chars -= chars
+
+	def counts(self) -> CounterType[str]:
+		"""Return the counts of the current window."""
+		if self.seconds is not None:
+			self._evict(self._clock())
+		counts = _histogram_counter(self._hist)
+		counts.update(self._extra)
+		return counts
+
+
+def count_letters_in_blocks(blocks: Iterable[bytes | bytearray], encoding: str = "utf-8") -> CounterType[str]:
+	"""Count letters in an iterable of encoded byte blocks.
+
+	See :class:`BlockCounter` for how blocks and encodings are handled.
+
+	Args:
+		blocks: Iterable of ``bytes`` blocks, in order.
+		encoding: Encoding of the byte stream.
+
+	Returns:
+		collections.Counter mapping uppercase letters to counts.
+	"""
+	counter = BlockCounter(encoding)
+	for block in blocks:
+		counter.feed(block)
+	return counter.close()
+
+
+def count_letters_in_stream(
+	stream: IO,
+	encoding: str = "utf-8",
+	chunk_size: int = CHUNK_SIZE,
+	progress_every: int = 0,
+	on_progress: Callable[[int, CounterType[str]], None] | None = None,
+) -> CounterType[str]:
+	"""Count letters from a file-like object, one ``chunk_size`` block at a time.
+
+	Binary streams are decoded with ``encoding``; text streams (for example
+	``sys.stdin`` without a ``buffer``) are counted as already-decoded text.
+	Each block is discarded once counted, so memory is bounded by
+	``chunk_size`` rather than by the length of the input.
+
+	Args:
+		stream: Readable binary or text stream. For text streams with a
+			``buffer`` attribute (such as ``sys.stdin``) the buffer is read.
+		encoding: Encoding of a binary stream.
+		chunk_size: Bytes (or characters) read per block.
+		progress_every: Call ``on_progress`` after about this many bytes; 0 disables.
+		on_progress: Callback receiving the bytes read so far and the running counts.
+
+	Returns:
+		collections.Counter mapping uppercase letters to counts.
+	"""
+	raw = getattr(stream, "buffer", stream)
+	block = raw.read(chunk_size)
+	text_mode = isinstance(block, str)
+	# Already-decoded text is re-encoded block by block as UTF-8
+	counter = BlockCounter("utf-8" if text_mode else encoding)
+	next_report = progress_every
+
+	while block:
+		counter.feed(block.encode("utf-8", "surrogatepass") if text_mode else block)
+		if on_progress and progress_every and counter.bytes_fed >= next_report:
+			on_progress(counter.bytes_fed, counter.counts())
+			next_report = counter.bytes_fed + progress_every
+		block = raw.read(chunk_size)
+	return counter.close()
+
+
+def iter_file_blocks(
+	fh: BufferedIOBase,
+	chunk_size: int = CHUNK_SIZE,
+	start: int = 0,
+	end: int | None = None,
+) -> Iterator[bytearray]:
+	"""Yield bytes ``start:end`` of ``fh`` in blocks of up to ``chunk_size``.
+
+	Every full block is read into the same buffer, so memory use is one
+	block however large the file is. A block is only valid until the next
+	one is requested; copy it (``bytes(block)``) to keep it.
+	"""
+	fh.seek(start)
+	buffer = bytearray(chunk_size)
+	view = memoryview(buffer)
+	remaining = None if end is None else end - start
+	while remaining is None or remaining > 0:
+		size = fh.readinto(view[:chunk_size if remaining is None else min(chunk_size, remaining)])
+		if not size:
+			break
+		if remaining is not None:
+			remaining -= size
+		# A short read (the end of the range or the file) gets a block of its own
+		yield buffer if size == chunk_size else buffer[:size]
+
+
+def count_letters_in_file(
+	path: str | Path,
+	encoding: str = "utf-8",
+	engine: str = "generator",
+	binary: bool = False,
+	chunk_size: int = CHUNK_SIZE,
+	cache: "CountCache | None" = None,
+) -> CounterType[str]:
 	"""Count letters from a text file.
 
+	With the ``generator`` engine the file is read line by line in text
+	mode. With ``binary=True``, and always with the ``table`` engine, it is
+	read in ``chunk_size`` blocks and counted by
+	:func:`count_letters_in_blocks`, which keeps memory flat however large
+	the file or its lines are (the table engine has a fixed cost per call,
+	so feeding it one short line at a time would be slower than the
+	generator). All modes return the same counts.
+
 	Args:
 		path: Path to a file to read.
 		encoding: Encoding used to open the file.
+		engine: Counting engine, see :func:`count_letters_in_text`; ``table``
+			reads the file in blocks as in binary mode.
+		binary: Use the chunked binary reader instead of text mode.
+		chunk_size: Block size in bytes for binary mode.
+		cache: Optional :class:`~LetterCounter.cache.CountCache`; an unchanged
+			file is answered from it without being read.
 
 	Returns:
 		collections.Counter mapping uppercase letters to counts.
 	"""
-	p = Path(path)
-	if not p.exists():
-		raise FileNotFoundError(p)
+	if not os.path.exists(path):
+		raise FileNotFoundError(path)
+
+	if cache is not None:
+		st = os.stat(path)
+		cached = cache.lookup(path, encoding, st)
+		if cached is not None:
+			return cached
+		counts = count_letters_in_file(path, encoding, engine, binary, chunk_size)
+		cache.store(path, counts, encoding, st)
+		return counts
+
+	if binary or engine == "table":
+		with open(path, "rb") as fh:
+			return count_letters_in_blocks(iter_file_blocks(fh, chunk_size), encoding=encoding)
 
 	c: CounterType[str] = Counter()
-	# Read in chunks in case of very large files
-	with p.open("r", encoding=encoding, errors="ignore") as fh:
+	with open(path, "r", encoding=encoding, errors="ignore") as fh:
 		for line in fh:
-			c.update(count_letters_in_text(line))
+			c.update(count_letters_in_text(line, engine=engine))
 	return c
 
 
-def format_counts(counts: Dict[str, int]) -> str:
+def count_letters_incremental(
+	path: str | Path,
+	state: "OffsetStore",
+	encoding: str = "utf-8",
+	chunk_size: int = CHUNK_SIZE,
+) -> CounterType[str]:
+	"""Count letters in an append-only file, reading only what was appended.
+
+	``state`` remembers, per path, the offset reached by the previous run and
+	the counts up to it. If the file still has the same inode, is at least
+	that long and the bytes just before the offset are unchanged, only the
+	bytes after it are read and added to the saved counts. A truncated,
+	rotated or rewritten file is counted from the start again. A partial
+	character at the end of the file is left for the next run.
+
+	Only UTF-8 can be resumed at a byte offset; other encodings are always
+	counted in full.
+
+	Args:
+		path: Path to a file to read.
+		state: :class:`~LetterCounter.cache.OffsetStore` holding the checkpoints.
+		encoding: Encoding of the file.
+		chunk_size: Block size in bytes.
+
+	Returns:
+		collections.Counter mapping uppercase letters to counts.
+	"""
+	from pathlib import Path
+
+	from .cache import Checkpoint, fingerprint
+
+	p = Path(path)
+	if not p.exists():
+		raise FileNotFoundError(p)
+	if codecs.lookup(encoding).name != "utf-8":
+		state.full_scans += 1
+		state.bytes_read += p.stat().st_size
+		return count_letters_in_file(p, encoding, binary=True, chunk_size=chunk_size)
+
+	with p.open("rb") as fh:
+		st = os.fstat(fh.fileno())
+		start = 0
+		base: CounterType[str] = Counter()
+		previous = state.get(p, encoding)
+		if (
+			previous is not None
+			and previous.inode == st.st_ino
+			and previous.offset <= st.st_size
+			and fingerprint(fh, previous.offset) == previous.fingerprint
+		):
+			start, base = previous.offset, previous.counts
+		else:
+			state.full_scans += 1
+
+		counter = BlockCounter(encoding)
+		for block in iter_file_blocks(fh, chunk_size, start, st.st_size):
+			counter.feed(block)
+		end = start + counter.bytes_fed - counter.pending_bytes
+		counts = base + counter.counts()
+		state.bytes_read += counter.bytes_fed
+		state.put(p, Checkpoint(st.st_ino, end, fingerprint(fh, end), counts), encoding)
+	return counts
+
+
+_GLOB_CHARS = frozenset("*?[")
+
+
+def expand_paths(patterns: Iterable[str | Path]) -> list[Path]:
+	"""Expand files, glob patterns and directories into a list of files.
+
+	Directories are searched recursively and glob patterns accept ``**``.
+	Each file is listed once, in the order it is first found.
+
+	Args:
+		patterns: File paths, directory paths or glob patterns.
+
+	Returns:
+		List of file paths.
+
+	Raises:
+		FileNotFoundError: if a path does not exist or a pattern matches nothing.
+	"""
+	import glob
+	from pathlib import Path
+
+	files: dict[Path, None] = {}
+	for pattern in patterns:
+		text = str(pattern)
+		if _GLOB_CHARS.intersection(text) and not Path(text).exists():
+			matches = [Path(m) for m in sorted(glob.glob(text, recursive=True))]
+			if not matches:
+				raise FileNotFoundError(text)
+		else:
+			matches = [Path(text)]
+
+		for match in matches:
+			if match.is_dir():
+				for sub in sorted(match.rglob("*")):
+					if sub.is_file():
+						files.setdefault(sub)
+			elif match.is_file():
+				files.setdefault(match)
+			else:
+				raise FileNotFoundError(match)
+	return list(files)
+
+
+def _utf8_boundary(fh: BinaryIO, pos: int) -> int:
+	"""Return the first offset >= ``pos`` that is not a UTF-8 continuation byte."""
+	if pos == 0:
+		return 0
+	fh.seek(pos)
+	for byte in fh.read(4):
+		if byte & 0xC0 != 0x80:
+			break
+		pos += 1
+	return pos
+
+
+def _count_shard(path: str, start: int, end: int | None, encoding: str, chunk_size: int) -> CounterType[str]:
+	"""Count bytes ``start:end`` of ``path`` (the whole file when ``end`` is None).
+
+	Range boundaries are moved forward to the next UTF-8 character start, so
+	neighbouring shards agree on where one ends and the next begins.
+	"""
+	with open(path, "rb") as fh:
+		if end is not None:
+			start = _utf8_boundary(fh, start)
+			end = _utf8_boundary(fh, end)
+		return count_letters_in_blocks(iter_file_blocks(fh, chunk_size, start, end), encoding=encoding)
+
+
+def _plan_shards(files: list[Path], encoding: str, shard_size: int) -> list[tuple[str, int, int | None]]:
+	# Only UTF-8 can be cut at arbitrary byte offsets and resynchronised
+	splittable = codecs.lookup(encoding).name == "utf-8"
+	shards: list[tuple[str, int, int | None]] = []
+	for path in files:
+		size = path.stat().st_size
+		if not splittable or size <= shard_size:
+			shards.append((str(path), 0, None))
+			continue
+		for start in range(0, size, shard_size):
+			shards.append((str(path), start, min(start + shard_size, size)))
+	return shards
+
+
+def count_letters_in_paths(
+	paths: Iterable[str | Path],
+	encoding: str = "utf-8",
+	jobs: int = 1,
+	shard_size: int = SHARD_SIZE,
+	chunk_size: int = CHUNK_SIZE,
+	cache: "CountCache | None" = None,
+) -> CounterType[str]:
+	"""Count letters across many files, optionally in parallel.
+
+	``paths`` is expanded with :func:`expand_paths`. Every file is counted with
+	the binary reader; UTF-8 files larger than ``shard_size`` are split into
+	byte ranges so one big file is spread over several workers. With
+	``jobs > 1`` the shards run on a ``ProcessPoolExecutor`` and the partial
+	counts are summed, giving the same totals as the serial path.
+
+	Args:
+		paths: Files, directories or glob patterns.
+		encoding: Encoding of every file.
+		jobs: Number of worker processes; 1 counts in this process and 0 uses
+			one worker per CPU.
+		shard_size: Approximate bytes per shard of a large file.
+		chunk_size: Block size in bytes for reading.
+		cache: Optional :class:`~LetterCounter.cache.CountCache`; cached files
+			are not read and newly counted files are added to it.
+
+	Returns:
+		collections.Counter mapping uppercase letters to counts.
+	"""
+	total: CounterType[str] = Counter()
+	files = expand_paths(paths)
+	stats: dict[str, os.stat_result] = {}
+	if cache is not None:
+		todo = []
+		for path in files:
+			st = path.stat()
+			cached = cache.lookup(path, encoding, st)
+			if cached is None:
+				todo.append(path)
+				stats[str(path)] = st
+			else:
+				total.update(cached)
+		files = todo
+
+	shards = _plan_shards(files, encoding, shard_size)
+	if jobs == 1 or len(shards) <= 1:
+		results: Iterable[CounterType[str]] = (
+			_count_shard(path, start, end, encoding, chunk_size) for path, start, end in shards
+		)
+		per_file = _sum_per_file(shards, results, total)
+	else:
+		from concurrent.futures import ProcessPoolExecutor
+
+		workers = jobs or os.cpu_count() or 1
+		with ProcessPoolExecutor(max_workers=workers) as pool:
+			# Batch small shards so thousands of tiny files don't cost one round-trip each
+			batch = max(1, len(shards) // (workers * 4))
+			path_list, starts, ends = zip(*shards)
+			results = pool.map(
+				_count_shard, path_list, starts, ends,
+				[encoding] * len(shards), [chunk_size] * len(shards),
+				chunksize=batch,
+			)
+			per_file = _sum_per_file(shards, results, total)
+
+	if cache is not None:
+		for path, counts in per_file.items():
+			cache.store(path, counts, encoding, stats[path])
+	return total
+
+
+def _sum_per_file(
+	shards: list[tuple[str, int, int | None]],
+	results: Iterable[CounterType[str]],
+	total: CounterType[str],
+) -> dict[str, CounterType[str]]:
+	"""Add every shard result to ``total`` and return the counts of each file."""
+	per_file: dict[str, CounterType[str]] = {}
+	for (path, _start, _end), counts in zip(shards, results):
+		total.update(counts)
+		per_file.setdefault(path, Counter()).update(counts)
+	return per_file
+
+
+def format_counts(counts: Mapping[str, float], keys: Iterable[str] | None = None, top: int | None = None) -> str:
 	"""Return a human readable string of the counts including percentages.
 
 	The output lists letters with their count and the percentage of the total
@@ -72,15 +723,19 @@ def format_counts(counts: Dict[str, int]) -> str:
 		B: 4 (8.00%)
 		...
 
+	The same layout works for n-grams by passing the n-gram keys to list.
+
 	Args:
-		counts: Mapping of uppercase letters to counts.
+		counts: Mapping of uppercase letters (or n-grams) to counts.
+		keys: Keys to list and total over; defaults to the letters A..Z.
+		top: Only list the ``top`` highest entries; all by default.
 
 	Returns:
 		A multi-line string containing letters and their counts/percentages
 		sorted by percentage (highest first).
 	"""
 	# Ensure counts contains entries for A..Z so sorting is consistent
-	letters = list(map(chr, range(65, 91)))
+	letters = list(map(chr, range(65, 91))) if keys is None else list(keys)
 	total = sum(counts.get(letter, 0) for letter in letters)
 
 	def item_key(letter: str) -> float:
@@ -89,36 +744,370 @@ def format_counts(counts: Dict[str, int]) -> str:
 		pct = (cnt / total * 100.0) if total else 0.0
 		return (-pct, letter)
 
-	sorted_letters = sorted(letters, key=item_key)
+	sorted_letters = sorted(letters, key=item_key)[:top]
 
 	lines = []
 	for letter in sorted_letters:
 		cnt = counts.get(letter, 0)
 		pct = (cnt / total * 100.0) if total else 0.0
-		lines.append(f"{letter}: {cnt} ({pct:.2f}%)")
+		# Weighted counts may be fractional
+		shown = f"{cnt:.2f}" if isinstance(cnt, float) else cnt
+		lines.append(f"{letter}: {shown} ({pct:.2f}%)")
 
 	return "\n".join(lines)
 
 
+def _iter_input_blocks(inputs: list[str], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes | bytearray]:
+	"""Yield the bytes of every input path, or of stdin when there are none."""
+	if not inputs:
+		raw = getattr(sys.stdin, "buffer", sys.stdin)
+		while block := raw.read(chunk_size):
+			yield block.encode("utf-8", "surrogatepass") if isinstance(block, str) else block
+		return
+
+	for path in expand_paths(inputs):
+		with path.open("rb") as fh:
+			yield from iter_file_blocks(fh, chunk_size)
+		# Keep words (and partial characters) from running on into the next file
+		yield b"\n"
+
+
+def _format_letters(counts: Dict[str, int], alphabet: str) -> str:
+	"""Fold ``counts`` onto ``alphabet`` and format them."""
+	from .alphabet import fold_counts, report_keys
+
+	counts = fold_counts(counts, alphabet)
+	return format_counts(counts, keys=report_keys(counts, alphabet))
+
+
+def _emit_counts(counts: Dict[str, int], alphabet: str, fmt: str) -> None:
+	"""Print ``counts`` to stdout as text or in a machine-readable format."""
+	if fmt == "text":
+		print(_format_letters(counts, alphabet))
+		return
+
+	from .alphabet import fold_counts
+	from .formats import dump_counts
+
+	data = dump_counts(fold_counts(counts, alphabet), fmt)
+	sys.stdout.flush()
+	out = getattr(sys.stdout, "buffer", None)
+	if out is None:
+		sys.stdout.write(data.decode("utf-8", "surrogateescape"))
+	else:
+		out.write(data)
+		out.flush()
+
+
+def _window_spec(value: str) -> tuple[int | None, float | None]:
+	"""Parse ``--window`` into ``(size, seconds)``: ``5000`` is 5000 characters, ``30s`` is 30 seconds."""
+	import argparse
+
+	try:
+		if value.endswith("s"):
+			spec = (None, float(value[:-1]))
+		else:
+			spec = (int(value), None)
+	except ValueError:
+		raise argparse.ArgumentTypeError(f"expected a character count or seconds like '30s', got {value!r}")
+	if (spec[0] or spec[1] or 0) <= 0:
+		raise argparse.ArgumentTypeError("the window must be positive")
+	return spec
+
+
+def _positive_float(value: str) -> float:
+	import argparse
+
+	try:
+		number = float(value)
+	except ValueError:
+		raise argparse.ArgumentTypeError(f"expected a number, got {value!r}")
+	if not number > 0:
+		raise argparse.ArgumentTypeError("must be greater than 0")
+	return number
+
+
+def _read_stdin_blocks() -> Iterator[bytes | str]:
+	"""Yield stdin as it arrives; read1 returns whatever is available, so a live stream is reported promptly."""
+	raw = getattr(sys.stdin, "buffer", sys.stdin)
+	read = getattr(raw, "read1", raw.read)
+	# A text stream ends with "" rather than b""
+	while block := read(CHUNK_SIZE):
+		yield block
+
+
+def _run_window(
+	inputs: list[str], spec: tuple[int | None, float | None], every: float | None, alphabet: str, fmt: str
+) -> None:
+	"""Stream the inputs through a :class:`WindowCounter`, printing it periodically."""
+	size, seconds = spec
+	window = WindowCounter(size=size, seconds=seconds)
+	decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+	label = f"last {size} characters" if size else f"last {seconds:g}s"
+
+	def emit() -> None:
+		# Counting evicts expired blocks, so it comes before the character total
+		counts = window.counts()
+		if fmt == "text":
+			print(f"--- {label} ({window.chars} characters) ---")
+		_emit_counts(counts, alphabet, fmt)
+		sys.stdout.flush()
+
+	blocks = _iter_input_blocks(inputs) if inputs else _read_stdin_blocks()
+
+	if size:
+		step = int(every or size)
+		pending = 0
+		for block in blocks:
+			text = decoder.decode(block.encode("utf-8") if isinstance(block, str) else block)
+			while text:
+				# Feed up to the next report so reports land every ``step`` characters
+				piece, text = text[:step - pending], text[step - pending:]
+				window.feed(piece)
+				pending += len(piece)
+				if pending == step:
+					emit()
+					pending = 0
+		if pending:
+			emit()
+		return
+
+	assert seconds is not None
+	interval = every or seconds
+	last = time.monotonic()
+	fed = False
+	for block in blocks:
+		window.feed(decoder.decode(block.encode("utf-8") if isinstance(block, str) else block))
+		fed = True
+		if time.monotonic() - last >= interval:
+			emit()
+			last = time.monotonic()
+			fed = False
+	if fed:
+		emit()
+
+
+def _add_output_arguments(parser: argparse.ArgumentParser) -> None:
+	parser.add_argument("--alphabet", choices=("ascii", "latin", "unicode"), default="ascii",
+		help="Letters to report: A-Z only, accented Latin letters folded onto A-Z, "
+		"or every letter (default: ascii).")
+	parser.add_argument("--format", choices=("text", "json", "csv", "binary"), default="text",
+		help="Output format; json, csv and binary can be summed later with 'merge' (default: text).")
+
+
+def merge_main(argv: list[str] | None = None) -> int:
+	"""CLI for ``merge``: sum saved histograms without reading any text.
+
+	Returns a small integer exit code (0 success, non-zero on error).
+	"""
+	import argparse
+
+	parser = argparse.ArgumentParser(prog="letter_counter merge",
+		description="Sum letter histograms saved with --format json, csv or binary")
+	parser.add_argument("histograms", nargs="+",
+		help="Histogram files, directories or glob patterns.")
+	_add_output_arguments(parser)
+	args = parser.parse_args(argv)
+
+	from .formats import merge_counts
+
+	try:
+		counts = merge_counts(expand_paths(args.histograms))
+	except FileNotFoundError as exc:
+		print(f"ERROR: file not found: {exc}", file=sys.stderr)
+		return 2
+	except ValueError as exc:
+		print(f"ERROR: {exc}", file=sys.stderr)
+		return 1
+	_emit_counts(counts, args.alphabet, args.format)
+	return 0
+
+
+def _print_progress(bytes_read: int, counts: Dict[str, int]) -> None:
+	letters = sum(counts.get(letter, 0) for letter in LETTERS)
+	top = ", ".join(f"{letter}: {n}" for letter, n in Counter(counts).most_common(5))
+	print(f"[{bytes_read} bytes] {letters} letters; top: {top}", file=sys.stderr)
+
+
 def main(argv: list[str] | None = None) -> int:
 	"""Simple CLI to count letters in a file or from stdin.
 
+	``merge`` as the first argument sums saved histograms instead (see
+	:func:`merge_main`).
+
 	Returns a small integer exit code (0 success, non-zero on error).
 	"""
-	parser = argparse.ArgumentParser(description="Count letters A-Z in a file or stdin")
-	parser.add_argument("--file", "-f", type=str, help="Path to a text file. If omitted, read from stdin.")
+	argv = sys.argv[1:] if argv is None else argv
+	if argv[:1] == ["merge"]:
+		return merge_main(argv[1:])
+
+	import argparse
+
+	parser = argparse.ArgumentParser(description="Count letters A-Z in files or stdin",
+		epilog="Use 'merge HISTOGRAM...' to sum histograms saved with --format json, csv or binary.")
+	parser.add_argument("paths", nargs="*",
+		help="Files, directories or glob patterns to count. If omitted, read from stdin.")
+	parser.add_argument("--file", "-f", type=str, action="append", default=[],
+		help="Path to a text file (may be repeated).")
+	parser.add_argument("--engine", choices=ENGINES, default="table",
+		help="Counting engine (default: table).")
+	parser.add_argument("--binary", action="store_true",
+		help="Read a single input file in fixed-size binary chunks (flat memory on huge files/lines).")
+	parser.add_argument("--jobs", "-j", type=int, default=1,
+		help="Worker processes for counting many or large files (0 = one per CPU).")
+	parser.add_argument("--progress-every", type=int, default=0, metavar="N",
+		help="When reading stdin, print running totals to stderr every N bytes.")
+	parser.add_argument("--bigrams", action="store_true", help="Also print letter bigram counts.")
+	parser.add_argument("--trigrams", action="store_true", help="Also print letter trigram counts.")
+	parser.add_argument("--positions", action="store_true",
+		help="Also print word-initial and word-final letter counts.")
+	parser.add_argument("--top", type=int, default=30, metavar="N",
+		help="Number of bigrams/trigrams to print (default: 30).")
+	# Each of these reads the inputs its own way, so only one can be given
+	mode = parser.add_mutually_exclusive_group()
+	mode.add_argument("--weights", choices=("tab", "zipf"),
+		help="Treat inputs as word lists weighted by frequency: 'tab' reads word<TAB>frequency "
+		"lines, 'zipf' weights a ranked list by 1/rank**s.")
+	parser.add_argument("--zipf-exponent", type=float, default=1.0, metavar="S",
+		help="Exponent s for --weights zipf (default: 1.0).")
+	mode.add_argument("--cache", metavar="PATH",
+		help="Cache file of per-file counts; unchanged files are not re-read.")
+	parser.add_argument("--cache-size", type=int, default=10_000, metavar="N",
+		help="Files kept in the --cache before the least recently used are dropped (default: 10000).")
+	parser.add_argument("--cache-hash", action="store_true",
+		help="Also match cached files by content hash when their size/mtime/inode changed.")
+	mode.add_argument("--incremental", metavar="STATE",
+		help="State file for append-only inputs: only bytes appended since the last run are read.")
+	mode.add_argument("--window", type=_window_spec, metavar="N|Ns",
+		help="Print counts over a sliding window of the last N characters (or N seconds with an 's' "
+		"suffix) as the input streams in.")
+	parser.add_argument("--window-every", type=_positive_float, metavar="N",
+		help="With --window, print every N characters (or seconds); defaults to the window length.")
+	mode.add_argument("--crawl", action="store_true",
+		help="Walk the given directories with a pool of reader threads; fastest for trees of many small files.")
+	parser.add_argument("--ext", type=lambda value: [e for e in value.split(",") if e], action="extend",
+		metavar="EXT[,EXT...]", help="With --crawl, only count files with these extensions (may be repeated).")
+	parser.add_argument("--min-size", type=int, default=0, metavar="BYTES",
+		help="With --crawl, skip files smaller than this.")
+	parser.add_argument("--max-size", type=int, metavar="BYTES",
+		help="With --crawl, skip files larger than this.")
+	parser.add_argument("--threads", type=int, default=8,
+		help="With --crawl, number of reader threads (default: 8).")
+	_add_output_arguments(parser)
 	args = parser.parse_args(argv)
 
+	inputs = args.file + args.paths
+	sizes = [n for n, wanted in ((2, args.bigrams), (3, args.trigrams)) if wanted]
+	if args.weights and (not inputs or args.positions):
+		parser.error("--weights needs word list files and does not support --positions")
+	# The mutually exclusive modes that n-grams and --binary cannot be combined with either
+	mode_flag = next((flag for flag, value in (("--incremental", args.incremental), ("--window", args.window),
+		("--crawl", args.crawl), ("--cache", args.cache)) if value), None)
+	if mode_flag in ("--incremental", "--crawl", "--cache") and not inputs:
+		parser.error(f"{mode_flag} needs files or directories to read; it does not apply to stdin")
+	if mode_flag and (sizes or args.positions):
+		parser.error(f"--bigrams/--trigrams/--positions cannot be combined with {mode_flag}")
+	if args.binary and (
+		len(inputs) != 1 or args.jobs != 1 or os.path.isdir(inputs[0]) or not _GLOB_CHARS.isdisjoint(inputs[0])
+		or args.weights or sizes or args.positions or mode_flag not in (None, "--cache")
+	):
+		parser.error("--binary only applies to counting a single file without --jobs or another mode "
+			"(several files, directories and stdin are always read in binary blocks)")
+	if args.format != "text" and (sizes or args.positions):
+		parser.error("--format json/csv/binary only covers letter counts; drop --bigrams/--trigrams/--positions")
+	if args.window and args.window[0] and args.window_every is not None and not args.window_every.is_integer():
+		parser.error("--window-every must be a whole number of characters with a character --window")
 	try:
-		if args.file:
-			counts = count_letters_in_file(args.file)
+		if args.weights:
+			from .weighted import WeightedCounter, iter_word_list
+
+			# Letters and n-grams are counted from one pass over the lists, a batch at a time
+			weighted = WeightedCounter([1, *sizes])
+			for path in expand_paths(inputs):
+				for words, weights in iter_word_list(path, args.weights, args.zipf_exponent):
+					weighted.feed(words, weights)
+
+			letter_counts = Counter(weighted.counts(1))
+			if not sizes:
+				_emit_counts(letter_counts, "ascii", args.format)
+				return 0
+			sections = [format_counts(letter_counts)]
+			for n in sizes:
+				gram_counts = weighted.counts(n)
+				name = "Bigrams" if n == 2 else "Trigrams"
+				sections.append(f"{name}:\n" + format_counts(gram_counts, keys=gram_counts, top=args.top))
+			print("\n\n".join(sections))
+			return 0
+
+		if sizes or args.positions:
+			from .ngrams import NgramCounter
+
+			# Letters and n-grams are counted from the same single pass over the input
+			grams = [NgramCounter(n) for n in sizes or [2]]
+			letters = BlockCounter()
+			for block in _iter_input_blocks(inputs):
+				letters.feed(block)
+				for counter in grams:
+					counter.feed(block)
+			counts = letters.close()
+
+			sections = [_format_letters(counts, args.alphabet)]
+			for counter in grams[:len(sizes)]:
+				counter.close()
+				gram_counts = counter.counts()
+				sections.append(f"{counter.name.capitalize()}:\n" + format_counts(gram_counts, keys=gram_counts, top=args.top))
+			if args.positions:
+				sections.append("Word-initial letters:\n" + format_counts(grams[0].close().initial_counts()))
+				sections.append("Word-final letters:\n" + format_counts(grams[0].final_counts()))
+			print("\n\n".join(sections))
+			return 0
+
+		if args.incremental:
+			from .cache import OffsetStore
+
+			counts = Counter()
+			with OffsetStore(args.incremental) as state:
+				for path in expand_paths(inputs):
+					counts.update(count_letters_incremental(path, state))
+			print(f"incremental: read {state.bytes_read} bytes, {state.full_scans} full scans", file=sys.stderr)
+			_emit_counts(counts, args.alphabet, args.format)
+			return 0
+
+		if args.window:
+			_run_window(inputs, args.window, args.window_every, args.alphabet, args.format)
+			return 0
+
+		if args.crawl:
+			from .crawl import TreeCounter
+
+			crawler = TreeCounter(args.ext, args.min_size, args.max_size, threads=args.threads)
+			counts = crawler.count(inputs)
+			print(f"crawl: {crawler.files} files, {crawler.bytes_read} bytes, {crawler.errors} unreadable",
+				file=sys.stderr)
+			_emit_counts(counts, args.alphabet, args.format)
+			return 0
+
+		cache = None
+		if args.cache:
+			from .cache import CountCache
+
+			cache = CountCache(args.cache, max_entries=args.cache_size, content_hash=args.cache_hash)
+
+		if len(inputs) == 1 and args.jobs == 1 and os.path.isfile(inputs[0]):
+			counts = count_letters_in_file(inputs[0], engine=args.engine, binary=args.binary, cache=cache)
+		elif inputs:
+			counts = count_letters_in_paths(inputs, jobs=args.jobs, cache=cache)
 		else:
-			# Read all of stdin (useful for piping)
-			text = sys.stdin.read()
-			counts = count_letters_in_text(text)
+			# Stream stdin block by block so piped input of any size fits in memory
+			counts = count_letters_in_stream(sys.stdin, progress_every=args.progress_every,
+				on_progress=_print_progress)
+
+		if cache is not None:
+			cache.save()
+			print(f"cache: {cache.hits} hits, {cache.misses} misses", file=sys.stderr)
 
 		# Print results
-		print(format_counts(counts))
+		_emit_counts(counts, args.alphabet, args.format)
 		return 0
 	except FileNotFoundError as exc:
 		print(f"ERROR: file not found: {exc}", file=sys.stderr)
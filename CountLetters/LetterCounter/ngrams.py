@@ -0,0 +1,168 @@
+"""Letter n-gram counting.
+
+This module counts letter bigrams, trigrams (any ``n >= 2``) and
+word-initial / word-final letters, the statistics keyboard layout work such
+as BEAKL needs beyond plain letter frequencies.
+
+A word is a run of ASCII letters A-Z (case-insensitive); anything else,
+non-ASCII letters included, ends it and n-grams never span two words.
+Counts are kept in flat ``array`` tables of ``26 ** n`` integers indexed by
+letter position rather than in dicts keyed by strings, and each distinct
+word in a block is expanded into n-grams once, weighted by how often it
+occurs.
+
+Examples
+--------
+>>> from LetterCounter.ngrams import count_ngrams_in_text
+>>> grams = count_ngrams_in_text('Then the theme', n=2)
+>>> grams['TH'], grams['HE'], grams['EM']
+(3, 3, 1)
+
+"""
+
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Mapping
+
+from .alphabet import LETTERS
+from .letter_counter import CHUNK_SIZE, iter_file_blocks
+
+_NAMES = {2: "bigrams", 3: "trigrams"}
+
+# Fold a-z onto A-Z and turn every other byte into a space, so that
+# ``bytes.split()`` yields the words directly. Bytes of UTF-8 multibyte
+# characters become spaces as well.
+_WORD_TABLE = bytes(b if 65 <= b <= 90 else b - 32 if 97 <= b <= 122 else 32 for b in range(256))
+
+
+def _zeros(size: int) -> array:
+	return array("Q", bytes(8 * size))
+
+
+class NgramCounter:
+	"""Accumulate letter n-gram and word-position counts over a byte stream.
+
+	Feed blocks of ASCII-compatible bytes (UTF-8, Latin-1, ...) with
+	:meth:`feed`; words may be split across blocks. Call :meth:`close` after
+	the last block so the final word is counted.
+
+	Args:
+		n: Length of the n-grams to count (2 for bigrams, 3 for trigrams).
+	"""
+
+	def __init__(self, n: int = 2) -> None:
+		if n < 2:
+			raise ValueError(f"n must be at least 2, got {n}")
+		self.n = n
+		self.table = _zeros(26 ** n)
+		self.initial = _zeros(26)
+		self.final = _zeros(26)
+		self._carry = b""
+
+	@property
+	def name(self) -> str:
+		"""Human name of the n-gram size, e.g. ``"bigrams"``."""
+		return _NAMES.get(self.n, f"{self.n}-grams")
+
+	def feed(self, block: bytes | bytearray) -> None:
+		"""Count one block of bytes."""
+		data = self._carry + block.translate(_WORD_TABLE)
+		if data.endswith(b" "):
+			self._carry = b""
+		else:
+			# The last word may continue in the next block
+			data, _, self._carry = data.rpartition(b" ")
+		self._add_words(Counter(data.split()))
+
+	def feed_text(self, text: str) -> None:
+		"""Count a block of already decoded text."""
+		self.feed(text.encode("utf-8"))
+
+	def close(self) -> "NgramCounter":
+		"""Count the word still pending from the last block and return ``self``."""
+		if self._carry:
+			self._add_words({self._carry: 1})
+			self._carry = b""
+		return self
+
+	def _add_words(self, words: Mapping[bytes, int]) -> None:
+		# words are folded to A-Z bytes; each distinct word is expanded once
+		n = self.n
+		table, initial, final = self.table, self.initial, self.final
+		for word, count in words.items():
+			initial[word[0] - 65] += count
+			final[word[-1] - 65] += count
+			for i in range(len(word) - n + 1):
+				index = 0
+				for code in word[i:i + n]:
+					index = index * 26 + code - 65
+				table[index] += count
+
+	def _gram(self, index: int) -> str:
+		letters = []
+		for _ in range(self.n):
+			index, rem = divmod(index, 26)
+			letters.append(LETTERS[rem])
+		return "".join(reversed(letters))
+
+	def __getitem__(self, gram: str) -> int:
+		gram = gram.upper()
+		if len(gram) != self.n or not set(gram) <= set(LETTERS):
+			raise KeyError(gram)
+		index = 0
+		for letter in gram:
+			index = index * 26 + ord(letter) - 65
+		return self.table[index]
+
+	def counts(self) -> Dict[str, int]:
+		"""Return the non-zero n-gram counts keyed by upper-case n-gram."""
+		return {self._gram(i): cnt for i, cnt in enumerate(self.table) if cnt}
+
+	def initial_counts(self) -> Dict[str, int]:
+		"""Return how often each letter starts a word."""
+		return dict(zip(LETTERS, self.initial))
+
+	def final_counts(self) -> Dict[str, int]:
+		"""Return how often each letter ends a word."""
+		return dict(zip(LETTERS, self.final))
+
+
+def count_ngrams_in_text(text: str, n: int = 2) -> NgramCounter:
+	"""Count letter n-grams and word positions in ``text``.
+
+	Args:
+		text: Input text to analyze.
+		n: Length of the n-grams.
+
+	Returns:
+		A closed :class:`NgramCounter`.
+	"""
+	counter = NgramCounter(n)
+	counter.feed_text(text)
+	return counter.close()
+
+
+def count_ngrams_in_file(path: str | Path, n: int = 2, chunk_size: int = CHUNK_SIZE) -> NgramCounter:
+	"""Count letter n-grams and word positions in a file.
+
+	The file is read in binary blocks, so it must use an ASCII-compatible
+	encoding such as UTF-8.
+
+	Args:
+		path: Path to a file to read.
+		n: Length of the n-grams.
+		chunk_size: Block size in bytes.
+
+	Returns:
+		A closed :class:`NgramCounter`.
+	"""
+	p = Path(path)
+	if not p.exists():
+		raise FileNotFoundError(p)
+
+	counter = NgramCounter(n)
+	with p.open("rb") as fh:
+		for block in iter_file_blocks(fh, chunk_size):
+			counter.feed(block)
+	return counter.close()
@@ -0,0 +1,276 @@
+"""Frequency-weighted letter and n-gram counting for word lists.
+
+Files such as ``top_1000_words.txt`` list each word once, so counting them as
+plain text gives every word the same weight. Typing load follows how often
+words are used, so this module weights each word instead:
+
+- ``word<TAB>frequency`` lines use the given frequency, and
+- ranked lists (one word per line, most common first) use a Zipf weight of
+  ``1 / rank ** exponent``.
+
+Only the letters A-Z are counted, the same as for n-grams; any other
+character ends the n-grams of a word. The words are never expanded into
+repeated text: with NumPy installed the counts are a weighted
+``numpy.bincount`` over the letters of each batch of words, otherwise a
+plain loop over the words is used. Lists are read and counted
+:data:`WORD_BATCH` words at a time (see :func:`iter_word_list` and
+:class:`WeightedCounter`), so memory use does not grow with their length.
+
+Examples
+--------
+>>> from LetterCounter.weighted import count_weighted_letters
+>>> count_weighted_letters(['the', 'a'], [3, 2])
+Counter({'E': 3, 'H': 3, 'T': 3, 'A': 2})
+
+"""
+
+from array import array
+from collections import Counter
+from itertools import islice
+from pathlib import Path
+from typing import Any, Counter as CounterType, Dict, Iterable, Iterator, Sequence
+
+try:
+	import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+	np = None
+
+from .alphabet import LETTERS
+
+WEIGHTINGS = ("tab", "zipf")
+
+# Words parsed and counted at a time; parsing and counting a batch of
+# short words takes under 1 KB per word, about 50 MB at this size
+WORD_BATCH = 1 << 16
+
+# Map a-z/A-Z to 0..25 and everything else to 26, which breaks n-grams
+_SEPARATOR = 26
+_CODE_TABLE = bytes(
+	b - 65 if 65 <= b <= 90 else b - 97 if 97 <= b <= 122 else _SEPARATOR for b in range(256)
+)
+
+
+def read_word_list(
+	path: str | Path,
+	weighting: str = "tab",
+	exponent: float = 1.0,
+	encoding: str = "utf-8",
+) -> tuple[list[str], list[float]]:
+	"""Read a word list and the weight of every word.
+
+	Args:
+		path: Path to the word list.
+		weighting: ``"tab"`` for ``word<TAB>frequency`` lines, ``"zipf"`` for a
+			ranked list with one word per line.
+		exponent: Zipf exponent ``s`` in ``1 / rank ** s``.
+		encoding: Encoding of the file.
+
+	Returns:
+		Tuple of the words and their weights (ints for integral frequencies).
+	"""
+	words: list[str] = []
+	weights: list[float] = []
+	for batch_words, batch_weights in iter_word_list(path, weighting, exponent, encoding):
+		words += batch_words
+		weights += batch_weights
+	return words, weights
+
+
+def iter_word_list(
+	path: str | Path,
+	weighting: str = "tab",
+	exponent: float = 1.0,
+	encoding: str = "utf-8",
+	batch_size: int = WORD_BATCH,
+) -> Iterator[tuple[list[str], list[float]]]:
+	"""Yield the words of a word list and their weights, ``batch_size`` lines at a time.
+
+	Takes the same arguments as :func:`read_word_list`; Zipf ranks carry on
+	from one batch to the next.
+	"""
+	p = Path(path)
+	if not p.exists():
+		raise FileNotFoundError(p)
+	if weighting not in WEIGHTINGS:
+		raise ValueError(f"unknown weighting {weighting!r} (expected one of {', '.join(WEIGHTINGS)})")
+	return _iter_batches(p, weighting, exponent, encoding, batch_size)
+
+
+def _iter_batches(
+	path: Path, weighting: str, exponent: float, encoding: str, batch_size: int
+) -> Iterator[tuple[list[str], list[float]]]:
+	rank = 0
+	with path.open("r", encoding=encoding, errors="ignore") as fh:
+		while lines := list(islice(fh, batch_size)):
+			if weighting == "zipf":
+				words = [word for word in map(str.strip, lines) if word]
+				weights = [1.0 / r ** exponent for r in range(rank + 1, rank + len(words) + 1)]
+				rank += len(words)
+			else:
+				words, weights = _parse_tab_lines(lines)
+			if words:
+				yield words, weights
+
+
+def _parse_tab_lines(lines: list[str]) -> tuple[list[str], list[float]]:
+	# Usually every line is one word, one tab and an integer: split the whole
+	# batch at once instead of line by line
+	text = "".join(lines)
+	if text.count("\t") == len(lines) and "\r" not in text:
+		fields = text.replace("\n", "\t").split("\t")
+		words = fields[0:2 * len(lines):2]
+		try:
+			if "" not in words:
+				return words, list(map(int, fields[1:2 * len(lines):2]))
+		except ValueError:
+			pass
+
+	rows = [
+		(word, freq)
+		for word, sep, freq in (line.rstrip("\r\n").rpartition("\t") for line in lines)
+		if sep and word
+	]
+	try:
+		return [word for word, _ in rows], [int(freq) for _, freq in rows]
+	except ValueError:
+		pass
+
+	# A header, fractional frequencies or malformed lines: one line at a time
+	words: list[str] = []
+	weights: list[float] = []
+	for word, freq in rows:
+		try:
+			weight: float = int(freq)
+		except ValueError:
+			try:
+				weight = float(freq)
+			except ValueError:
+				continue  # header or malformed line
+		words.append(word)
+		weights.append(weight)
+	return words, weights
+
+
+def _as_number(value: float) -> float:
+	# Integral totals are reported as ints so they print like plain counts
+	value = float(value)
+	return int(value) if value.is_integer() else value
+
+
+class WeightedCounter:
+	"""Weighted letter and n-gram counts, fed a batch of words at a time.
+
+	Only the ``26 ** n`` totals of each size are kept between batches, and
+	words are counted :data:`WORD_BATCH` at a time, so memory use does not
+	grow with the number of words fed.
+
+	Args:
+		sizes: N-gram lengths to count; 1 counts single letters.
+	"""
+
+	def __init__(self, sizes: Iterable[int] = (1,)) -> None:
+		self._totals: Dict[int, Any] = {}
+		for n in sizes:
+			if n < 1:
+				raise ValueError(f"n must be at least 1, got {n}")
+			self._totals[n] = np.zeros(26 ** n) if np is not None else array("d", bytes(8 * 26 ** n))
+
+	def feed(self, words: Sequence[str], weights: Sequence[float]) -> None:
+		"""Count ``words``, each word counted ``weight`` times."""
+		if len(words) != len(weights):
+			raise ValueError("words and weights must have the same length")
+		for start in range(0, len(words), WORD_BATCH):
+			batch_words = words[start:start + WORD_BATCH]
+			_add_weighted_bincounts(self._totals, batch_words, weights[start:start + WORD_BATCH])
+
+	def counts(self, n: int = 1) -> Dict[str, float]:
+		"""Return the non-zero weighted counts of the upper-case n-grams of length ``n``."""
+		result: Dict[str, float] = {}
+		for index, cnt in enumerate(self._totals[n].tolist()):
+			if cnt:
+				gram = []
+				for _ in range(n):
+					index, rem = divmod(index, 26)
+					gram.append(LETTERS[rem])
+				result["".join(reversed(gram))] = _as_number(cnt)
+		return result
+
+
+def count_weighted_letters(words: Sequence[str], weights: Sequence[float]) -> CounterType[str]:
+	"""Count letters A-Z in ``words``, each word counted ``weight`` times.
+
+	Args:
+		words: Words to count.
+		weights: Weight of each word, same length as ``words``.
+
+	Returns:
+		collections.Counter mapping uppercase letters to weighted counts.
+	"""
+	counter = WeightedCounter()
+	counter.feed(words, weights)
+	return Counter(counter.counts())
+
+
+def count_weighted_ngrams(words: Sequence[str], weights: Sequence[float], n: int = 2) -> Dict[str, float]:
+	"""Count letter n-grams in ``words``, each word counted ``weight`` times.
+
+	Args:
+		words: Words to count.
+		weights: Weight of each word, same length as ``words``.
+		n: Length of the n-grams.
+
+	Returns:
+		Dict mapping the non-zero upper-case n-grams to weighted counts.
+	"""
+	if n < 2:
+		raise ValueError(f"n must be at least 2, got {n}")
+	counter = WeightedCounter([n])
+	counter.feed(words, weights)
+	return counter.counts(n)
+
+
+def _add_weighted_bincounts(totals: Dict[int, Any], words: Sequence[str], weights: Sequence[float]) -> None:
+	"""Add the weighted count of every n-gram index to ``totals[n]`` (``26 ** n`` entries)."""
+	if np is None:
+		for n, table in totals.items():
+			_add_weighted_bincount_python(table, words, weights, n)
+		return
+
+	# One blob of letter codes with a separator after every word
+	blob = ("\x1a".join(words) + "\x1a").encode("utf-8")
+	codes = np.frombuffer(blob.translate(_CODE_TABLE), dtype=np.uint8)
+	ends = np.flatnonzero(np.frombuffer(blob, dtype=np.uint8) == 0x1A)
+	if len(ends) == len(words):
+		lengths = np.diff(ends, prepend=-1)
+	else:
+		# Some word contains the separator character itself
+		lengths = np.fromiter((len(word.encode("utf-8")) + 1 for word in words), dtype=np.intp, count=len(words))
+	# Weight of the word each code belongs to (its separator included)
+	per_code = np.repeat(np.asarray(weights, dtype=np.float64), lengths)
+	letter = codes != _SEPARATOR
+
+	# Base-26 index of every n-letter window; windows touching a separator are masked out
+	for n, table in totals.items():
+		size = len(codes) - n + 1
+		if size <= 0:
+			continue
+		index = codes[:size].astype(np.intp)
+		valid = letter[:size].copy()
+		for offset in range(1, n):
+			index *= 26
+			index += codes[offset:offset + size]
+			valid &= letter[offset:offset + size]
+		table += np.bincount(index[valid], weights=per_code[:size][valid], minlength=26 ** n)[:26 ** n]
+
+
+def _add_weighted_bincount_python(totals: array, words: Sequence[str], weights: Sequence[float], n: int) -> None:
+	for word, weight in zip(words, weights):
+		codes = word.encode("utf-8").translate(_CODE_TABLE)
+		for i in range(len(codes) - n + 1):
+			index = 0
+			for code in codes[i:i + n]:
+				if code == _SEPARATOR:
+					break
+				index = index * 26 + code
+			else:
+				totals[index] += weight
@@ -7,8 +7,21 @@ Re-export the nested `LetterCounter.letter_counter` module so callers can do
 and the tests / example code will continue to work.
 """
 
-# Import the nested submodule (this will load CountLetters.LetterCounter.letter_counter
-# as the attribute `letter_counter` on the top-level package).
-from .LetterCounter import letter_counter
+# The submodule is loaded on first attribute access (PEP 562) rather than
+# here, so `python -m CountLetters.LetterCounter.letter_counter` does not
+# import it twice and `import CountLetters` stays cheap.
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .LetterCounter import letter_counter
+
+
+def __getattr__(name):
+    if name == "letter_counter":
+        from .LetterCounter import letter_counter
+
+        return letter_counter
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = ["letter_counter"]
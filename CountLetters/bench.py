@@ -0,0 +1,275 @@
+"""Throughput benchmarks for the letter counter.
+
+Run from the repository root:
+
+	python -m CountLetters.bench
+	python -m CountLetters.bench --sizes 1,64 --corpora ascii,cjk --json results.json
+
+Synthetic corpora of several sizes and character mixes are written to a
+temporary directory, then every target is timed on every corpus:
+
+- ``text``: ``count_letters_in_text`` with each engine
+- ``file``: ``count_letters_in_file`` in text mode with each engine, and
+  in binary mode (``short-lines`` is the case where a per-line engine
+  call would dominate)
+- ``stdin``: ``count_letters_in_stream`` reading a binary stream
+- ``format``: ``format_counts`` on the resulting counts
+
+Each case runs in a freshly spawned process so its peak RSS (``VmHWM`` on
+Linux, ``ru_maxrss`` elsewhere) can be reported on its own. The table goes
+to stdout; ``--json`` also writes machine-readable results that can be
+tracked over time.
+"""
+
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from .LetterCounter import letter_counter
+
+try:
+	import resource
+except ImportError:  # pragma: no cover - not available on Windows
+	resource = None
+
+WORDS_FILE = Path(__file__).with_name("top_1000_words.txt")
+
+CORPORA = ("ascii", "latin", "cjk", "long-lines", "short-lines")
+TARGETS = ("text", "file", "stdin", "format")
+
+_ACCENTS = str.maketrans("aeiouncAEIOUNC", "áéíöüñçÀÉÎÖÜÑÇ")
+_FORMAT_CALLS = 1000
+
+
+def _words() -> list[str]:
+	return WORDS_FILE.read_text(encoding="utf-8").split()[2:]
+
+
+def make_ascii_corpus(size: int, seed: int = 0) -> str:
+	"""Return roughly ``size`` characters of space-separated English words."""
+	words = _words()
+	rng = random.Random(seed)
+	parts: list[str] = []
+	length = 0
+	while length < size:
+		line = " ".join(rng.choices(words, k=12)).capitalize() + ".\n"
+		parts.append(line)
+		length += len(line)
+	return "".join(parts)
+
+
+def make_corpus(kind: str, size: int, seed: int = 0) -> str:
+	"""Return about ``size`` bytes (UTF-8) of text of the given kind.
+
+	Kinds are ``ascii`` (English prose), ``latin`` (prose with a third of the
+	words accented), ``cjk`` (mostly CJK ideographs with some English),
+	``long-lines`` (prose on a single line) and ``short-lines`` (one word
+	per line).
+	"""
+	rng = random.Random(seed)
+	if kind == "ascii":
+		return make_ascii_corpus(size, seed)
+	if kind == "long-lines":
+		return make_ascii_corpus(size, seed).replace("\n", " ")
+	if kind == "short-lines":
+		words = _words()
+		return "\n".join(rng.choices(words, k=size // 7)) + "\n"
+	if kind == "latin":
+		words = _words()
+		parts = []
+		length = 0
+		while length < size:
+			word = rng.choice(words)
+			if rng.random() < 0.33:
+				word = word.translate(_ACCENTS)
+			parts.append(word)
+			length += len(word.encode("utf-8")) + 1
+		return " ".join(parts)
+	if kind == "cjk":
+		words = _words()
+		parts = []
+		length = 0
+		while length < size:
+			if rng.random() < 0.2:
+				part = rng.choice(words) + " "
+			else:
+				part = "".join(chr(rng.randint(0x4E00, 0x9FFF)) for _ in range(rng.randint(2, 8)))
+			parts.append(part)
+			length += len(part.encode("utf-8"))
+		return "".join(parts)
+	raise ValueError(f"unknown corpus {kind!r} (expected one of {', '.join(CORPORA)})")
+
+
+def time_call(func, *args, repeat: int = 3, **kwargs) -> float:
+	"""Return the best wall-clock time of ``repeat`` calls, in seconds."""
+	best = float("inf")
+	for _ in range(repeat):
+		start = time.perf_counter()
+		func(*args, **kwargs)
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+def _peak_rss_mb() -> float | None:
+	# On Linux ru_maxrss survives fork+exec and would include the parent's
+	# peak; VmHWM belongs to this process image only.
+	try:
+		with open("/proc/self/status", encoding="ascii") as fh:
+			for line in fh:
+				if line.startswith("VmHWM:"):
+					return int(line.split()[1]) / 1024
+	except OSError:
+		pass
+	if resource is None:
+		return None
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# macOS reports bytes, the others KiB
+	return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _read_stream(path: Path) -> None:
+	with path.open("rb") as fh:
+		letter_counter.count_letters_in_stream(fh)
+
+
+def _format_many(counts: dict[str, int]) -> None:
+	for _ in range(_FORMAT_CALLS):
+		letter_counter.format_counts(counts)
+
+
+def run_case(path: str, target: str, variant: str, repeat: int) -> dict:
+	"""Time one target/variant on the corpus at ``path`` and return its result row."""
+	p = Path(path)
+	if target == "text":
+		text = p.read_text(encoding="utf-8")
+		seconds = time_call(letter_counter.count_letters_in_text, text, engine=variant, repeat=repeat)
+	elif target == "file":
+		if variant == "binary":
+			seconds = time_call(letter_counter.count_letters_in_file, p, binary=True, repeat=repeat)
+		else:
+			seconds = time_call(letter_counter.count_letters_in_file, p, engine=variant, repeat=repeat)
+	elif target == "stdin":
+		seconds = time_call(_read_stream, p, repeat=repeat)
+	elif target == "format":
+		counts = letter_counter.count_letters_in_file(p, binary=True)
+		seconds = time_call(_format_many, counts, repeat=repeat) / _FORMAT_CALLS
+	else:
+		raise ValueError(f"unknown target {target!r} (expected one of {', '.join(TARGETS)})")
+
+	mb = p.stat().st_size / (1024 * 1024)
+	return {
+		"target": target,
+		"variant": variant,
+		"seconds": seconds,
+		# format_counts does not scale with the input, so it is reported per call
+		"mb_per_s": None if target == "format" else (mb / seconds if seconds else None),
+		"calls_per_s": 1 / seconds if target == "format" and seconds else None,
+		"peak_rss_mb": _peak_rss_mb(),
+	}
+
+
+def _variants(target: str) -> tuple[str, ...]:
+	if target == "text":
+		return letter_counter.ENGINES
+	if target == "file":
+		return letter_counter.ENGINES + ("binary",)
+	return ("default",)
+
+
+def run_suite(
+	sizes_mb: list[float],
+	corpora: list[str],
+	targets: list[str],
+	repeat: int = 3,
+	isolate: bool = True,
+) -> list[dict]:
+	"""Run every target on every corpus and size; return one result row per case."""
+	results = []
+	ctx = multiprocessing.get_context("spawn")
+	with tempfile.TemporaryDirectory(prefix="letter-bench-") as tmp:
+		for kind in corpora:
+			for size_mb in sizes_mb:
+				path = Path(tmp) / f"{kind}-{size_mb}.txt"
+				path.write_text(make_corpus(kind, int(size_mb * 1024 * 1024)), encoding="utf-8")
+				for target in targets:
+					for variant in _variants(target):
+						args = (str(path), target, variant, repeat)
+						if isolate:
+							# A fresh process per case so peak RSS belongs to this case alone
+							with ctx.Pool(1) as pool:
+								row = pool.apply(run_case, args)
+						else:
+							row = run_case(*args)
+						row.update(corpus=kind, size_mb=size_mb)
+						results.append(row)
+				path.unlink()
+	return results
+
+
+def format_results(results: list[dict]) -> str:
+	"""Return the results as an aligned text table."""
+	lines = [f"{'corpus':<12} {'MB':>6} {'target':<7} {'variant':<10} {'MB/s':>9} {'peak RSS':>9}"]
+	for row in results:
+		if row["mb_per_s"] is not None:
+			speed = f"{row['mb_per_s']:9.1f}"
+		else:
+			speed = f"{row['calls_per_s']:7.0f}/s"
+		rss = "-" if row["peak_rss_mb"] is None else f"{row['peak_rss_mb']:.1f}MB"
+		lines.append(
+			f"{row['corpus']:<12} {row['size_mb']:>6g} {row['target']:<7} {row['variant']:<10} {speed} {rss:>9}"
+		)
+	return "\n".join(lines)
+
+
+def _csv(value: str) -> list[str]:
+	return [item for item in value.split(",") if item]
+
+
+def main(argv: list[str] | None = None) -> int:
+	parser = argparse.ArgumentParser(description="Benchmark the letter counter")
+	parser.add_argument("--sizes", type=_csv, default=["1", "8"],
+		help="Comma-separated corpus sizes in MB (default: 1,8)")
+	parser.add_argument("--corpora", type=_csv, default=list(CORPORA),
+		help=f"Comma-separated corpora (default: {','.join(CORPORA)})")
+	parser.add_argument("--targets", type=_csv, default=list(TARGETS),
+		help=f"Comma-separated targets (default: {','.join(TARGETS)})")
+	parser.add_argument("--repeat", type=int, default=3, help="Runs per case, best is kept (default: 3)")
+	parser.add_argument("--no-isolate", action="store_true",
+		help="Run every case in this process (faster, but peak RSS is cumulative)")
+	parser.add_argument("--json", metavar="PATH", help="Also write results as JSON ('-' for stdout)")
+	args = parser.parse_args(argv)
+
+	for name, chosen, known in (("corpus", args.corpora, CORPORA), ("target", args.targets, TARGETS)):
+		unknown = sorted(set(chosen) - set(known))
+		if unknown:
+			parser.error(f"unknown {name}: {', '.join(unknown)}")
+
+	results = run_suite(
+		[float(size) for size in args.sizes], args.corpora, args.targets,
+		repeat=args.repeat, isolate=not args.no_isolate,
+	)
+	print(format_results(results))
+
+	if args.json:
+		report = {
+			"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+			"python": platform.python_version(),
+			"platform": platform.platform(),
+			"results": results,
+		}
+		text = json.dumps(report, indent=2)
+		if args.json == "-":
+			print(text)
+		else:
+			Path(args.json).write_text(text + "\n", encoding="utf-8")
+	return 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
@@ -26,6 +26,19 @@ def test_count_letters_in_file(tmp_path: Path):
     assert result['N'] >= 1
 
 
+def test_table_engine_counts_files_in_blocks(tmp_path: Path, monkeypatch):
+    # One word per line: a per-line table call would cost more than the counting
+    p = tmp_path / "words.txt"
+    p.write_text("".join(f"word{i} é\n" for i in range(5000)), encoding="utf-8")
+    expected = letter_counter.count_letters_in_file(p, engine="generator")
+
+    calls = []
+    histogram = letter_counter._ascii_histogram
+    monkeypatch.setattr(letter_counter, "_ascii_histogram", lambda *a: calls.append(a) or histogram(*a))
+    assert letter_counter.count_letters_in_file(p, engine="table", chunk_size=1 << 14) == expected
+    assert 0 < len(calls) <= p.stat().st_size // (1 << 14) + 1
+
+
 def test_cli_reads_stdin(monkeypatch, capsys):
     monkeypatch.setattr(sys, 'stdin', io.StringIO('xXy'))
     rc = letter_counter.main([])
@@ -50,3 +63,584 @@ def test_format_counts_sorted_and_percentage():
     assert lines[1].startswith('C: 2 (33.33%')
     assert lines[2].startswith('B: 1 (16.67%')
 
+
+
+def test_table_engine_matches_generator():
+    samples = [
+        "",
+        "Hello, World!",
+        "The quick brown fox jumps over the lazy dog 1234567890 {}[]",
+        "Zz" * 50,
+        "Café naïve Straße ıstanbul ſ — Ωmega 日本語",
+    ]
+    for text in samples:
+        expected = letter_counter.count_letters_in_text(text, engine="generator")
+        assert letter_counter.count_letters_in_text(text, engine="table") == expected
+
+
+def test_table_engine_backends_match_generator(monkeypatch):
+    import importlib.util
+
+    text = "Café naïve Straße ıstanbul ſ — Ωmega 日本語 \ud800 😀 The quick brown fox " * 50
+    expected = letter_counter.count_letters_in_text(text, engine="generator")
+    encoded = text.replace("\ud800", "").encode("utf-8")
+
+    # Pure-Python fallback, and NumPy (for every input size, in one slice or
+    # in many small ones) when it is installed
+    backends: list[dict[str, object]] = [{"_numpy": lambda size, total=0: None}]
+    if importlib.util.find_spec("numpy") is not None:
+        backends.append({"_NUMPY_IMPORT_SIZE": 0, "_NUMPY_MIN_SIZE": 0})
+        backends.append({"_NUMPY_IMPORT_SIZE": 0, "_NUMPY_MIN_SIZE": 0, "_NUMPY_SLICE": 7})
+    for backend in backends:
+        with monkeypatch.context() as patch:
+            for name, value in backend.items():
+                patch.setattr(letter_counter, name, value)
+            assert letter_counter.count_letters_in_text(text, engine="table") == expected
+            counter = letter_counter.BlockCounter()
+            counter.feed(encoded)
+            assert counter.close() == expected
+
+
+def test_unknown_engine_raises():
+    import pytest
+
+    with pytest.raises(ValueError):
+        letter_counter.count_letters_in_text("abc", engine="nope")
+
+
+def test_binary_mode_matches_text_mode(tmp_path: Path):
+    p = tmp_path / "mixed.txt"
+    text = "Crème brûlée, Straße and naïve ĳ words\n" * 50 + "no newline at the end é"
+    p.write_bytes(text.encode("utf-8") + b"\xff\xfe broken \xc3")
+
+    expected = letter_counter.count_letters_in_file(p)
+    # Tiny chunks split multibyte characters across block boundaries
+    for chunk_size in (1, 3, 7, 4096):
+        assert letter_counter.count_letters_in_file(p, binary=True, chunk_size=chunk_size) == expected
+
+
+def test_binary_mode_other_encodings(tmp_path: Path):
+    p = tmp_path / "utf16.txt"
+    p.write_text("Hello Wörld\n" * 10, encoding="utf-16")
+
+    expected = letter_counter.count_letters_in_file(p, encoding="utf-16")
+    assert expected['L'] == 30
+    assert letter_counter.count_letters_in_file(p, encoding="utf-16", binary=True, chunk_size=5) == expected
+
+
+def test_binary_mode_empty_file(tmp_path: Path):
+    p = tmp_path / "empty.txt"
+    p.write_bytes(b"")
+    assert letter_counter.count_letters_in_file(p, binary=True) == Counter()
+
+
+def test_iter_file_blocks_reuses_one_buffer(tmp_path: Path):
+    p = tmp_path / "data.bin"
+    data = bytes(range(256)) * 40
+    p.write_bytes(data)
+
+    with p.open("rb") as fh:
+        blocks = [(id(block), bytes(block)) for block in letter_counter.iter_file_blocks(fh, 1000)]
+        assert b"".join(block for _, block in blocks) == data
+        assert len({ident for ident, _ in blocks[:-1]}) == 1
+        ranged = b"".join(bytes(b) for b in letter_counter.iter_file_blocks(fh, 1000, 10, 2500))
+        assert ranged == data[10:2500]
+
+
+def test_expand_paths_files_dirs_and_globs(tmp_path: Path):
+    (tmp_path / "sub").mkdir()
+    a = tmp_path / "a.txt"
+    b = tmp_path / "sub" / "b.txt"
+    c = tmp_path / "sub" / "c.log"
+    for p in (a, b, c):
+        p.write_text("abc")
+
+    assert letter_counter.expand_paths([tmp_path / "sub"]) == [b, c]
+    assert letter_counter.expand_paths([str(tmp_path / "**" / "*.txt")]) == [a, b]
+    # Duplicates are listed once
+    assert letter_counter.expand_paths([a, str(tmp_path / "*.txt")]) == [a]
+
+
+def test_expand_paths_missing_raises(tmp_path: Path):
+    import pytest
+
+    with pytest.raises(FileNotFoundError):
+        letter_counter.expand_paths([str(tmp_path / "*.nothing")])
+
+
+def test_sharded_counts_match_serial(tmp_path: Path):
+    big = tmp_path / "big.txt"
+    big.write_text("Ünïcödé text and ASCII words ß\n" * 200, encoding="utf-8")
+    small = tmp_path / "small.txt"
+    small.write_text("Hello World")
+
+    expected = letter_counter.count_letters_in_file(big) + letter_counter.count_letters_in_file(small)
+    # Odd shard sizes cut multibyte characters at shard boundaries
+    for shard_size in (7, 101, 1 << 20):
+        assert letter_counter.count_letters_in_paths([big, small], shard_size=shard_size) == expected
+    assert letter_counter.count_letters_in_paths([tmp_path], jobs=2, shard_size=333) == expected
+
+
+def test_cli_counts_many_paths(tmp_path: Path, capsys):
+    (tmp_path / "one.txt").write_text("aaa")
+    (tmp_path / "two.txt").write_text("bb")
+    rc = letter_counter.main([str(tmp_path / "*.txt"), "--jobs", "2"])
+    out, _ = capsys.readouterr()
+    assert rc == 0
+    assert out.splitlines()[0] == "A: 3 (60.00%)"
+
+
+def test_count_letters_in_stream_binary_blocks():
+    data = ("Grüße aus Köln! " * 100).encode("utf-8")
+    expected = letter_counter.count_letters_in_text(data.decode("utf-8"))
+
+    reports = []
+    result = letter_counter.count_letters_in_stream(
+        io.BytesIO(data), chunk_size=5, progress_every=500,
+        on_progress=lambda n, counts: reports.append(n),
+    )
+    assert result == expected
+    assert reports and all(b - a >= 500 for a, b in zip(reports, reports[1:]))
+
+
+def test_cli_stdin_progress(monkeypatch, capsys):
+    class FakeStdin:
+        buffer = io.BytesIO(b"ab" * 1000)
+
+    monkeypatch.setattr(sys, 'stdin', FakeStdin())
+    rc = letter_counter.main(['--progress-every', '1'])
+    out, err = capsys.readouterr()
+    assert rc == 0
+    assert 'A: 1000 (50.00%)' in out
+    assert '[2000 bytes]' in err
+
+
+def test_ngram_counts_and_positions():
+    from CountLetters.LetterCounter import ngrams
+
+    grams = ngrams.count_ngrams_in_text("The theme, then THE end! café", n=2)
+    assert grams['TH'] == 4
+    assert grams['he'] == 4
+    assert grams['EN'] == 2
+    # Non-letters (and non-ASCII letters) end words: no 'EE' from "the end"
+    assert grams['EE'] == 0
+    assert grams['FE'] == 0
+    assert grams.initial_counts()['T'] == 4
+    assert grams.final_counts()['E'] == 3
+    assert grams.final_counts()['F'] == 1
+
+    tri = ngrams.count_ngrams_in_text("the theme", n=3)
+    assert tri.counts() == {'THE': 2, 'HEM': 1, 'EME': 1}
+
+
+def test_ngram_blocks_split_words(tmp_path: Path):
+    from CountLetters.LetterCounter import ngrams
+
+    text = "alphabet soup with letters " * 40
+    p = tmp_path / "words.txt"
+    p.write_text(text)
+
+    expected = ngrams.count_ngrams_in_text(text, n=3).counts()
+    assert ngrams.count_ngrams_in_file(p, n=3, chunk_size=7).counts() == expected
+
+
+def test_cli_bigrams_and_positions(tmp_path: Path, capsys):
+    p = tmp_path / "words.txt"
+    p.write_text("the then there")
+    rc = letter_counter.main([str(p), "--bigrams", "--positions", "--top", "2"])
+    out, _ = capsys.readouterr()
+    assert rc == 0
+    sections = out.split("\n\n")
+    assert sections[1].splitlines() == ["Bigrams:", "HE: 3 (33.33%)", "TH: 3 (33.33%)"]
+    assert sections[2].splitlines()[1] == "T: 3 (100.00%)"
+    assert sections[3].startswith("Word-final letters:")
+
+
+def test_weighted_counts_match_repeated_text(tmp_path: Path, monkeypatch):
+    import pytest
+    from CountLetters.LetterCounter import ngrams, weighted
+
+    p = tmp_path / "freqs.tsv"
+    p.write_text("word\tcount\nthe\t5\nhello\t3\ndon't\t2\n")
+    words, weights = weighted.read_word_list(p)
+    assert words == ["the", "hello", "don't"]
+    assert weights == [5, 3, 2]
+    batches = list(weighted.iter_word_list(p, batch_size=2))
+    assert batches == [(["the"], [5]), (["hello", "don't"], [3, 2])]
+
+    text = " ".join(w for w, n in zip(words, weights) for _ in range(int(n)))
+    expected_letters = letter_counter.count_letters_in_text(text)
+    expected_bigrams = ngrams.count_ngrams_in_text(text).counts()
+
+    # Pure-Python fallback, and NumPy when it is installed, counting all
+    # words at once or a couple at a time
+    backends: list = [None]
+    if weighted.np is not None:
+        backends.append(weighted.np)
+    batches = (weighted.WORD_BATCH, 2)
+    for backend in backends:
+        monkeypatch.setattr(weighted, "np", backend)
+        for batch in batches:
+            monkeypatch.setattr(weighted, "WORD_BATCH", batch)
+            assert weighted.count_weighted_letters(words, weights) == expected_letters
+            assert weighted.count_weighted_ngrams(words, weights, 2) == expected_bigrams
+
+    with pytest.raises(ValueError):
+        weighted.count_weighted_letters(words, weights[:1])
+
+
+def test_cli_zipf_weighted_word_list(tmp_path: Path, capsys):
+    p = tmp_path / "ranked.txt"
+    p.write_text("a\nb\nab\n")
+    rc = letter_counter.main([str(p), "--weights", "zipf", "--bigrams"])
+    out, _ = capsys.readouterr()
+    assert rc == 0
+    # A: 1 + 1/3, B: 1/2 + 1/3
+    assert out.splitlines()[0] == "A: 1.33 (61.54%)"
+    assert "AB: 0.33 (100.00%)" in out
+
+
+def test_count_cache_hits_misses_and_persistence(tmp_path: Path):
+    import os
+    from CountLetters.LetterCounter.cache import CountCache
+
+    p = tmp_path / "sample.txt"
+    p.write_text("Hello Wörld")
+    cache_file = tmp_path / "counts.cache"
+
+    with CountCache(cache_file) as cache:
+        first = letter_counter.count_letters_in_file(p, cache=cache)
+        again = letter_counter.count_letters_in_file(p, cache=cache)
+        assert (cache.hits, cache.misses) == (1, 1)
+    assert again == first
+    # Non-ASCII letters survive the round trip
+    assert again['Ö'] == 1
+
+    # A fresh instance reads the saved file
+    cache = CountCache(cache_file)
+    assert cache.lookup(p) == first
+
+    # Changed metadata is a miss unless the content digest matches
+    st = p.stat()
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert cache.lookup(p) is None
+
+    hashed = CountCache(tmp_path / "hashed.cache", content_hash=True)
+    letter_counter.count_letters_in_file(p, cache=hashed)
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 2 * 10**9))
+    assert hashed.lookup(p) == first
+
+
+def test_count_cache_evicts_least_recently_used(tmp_path: Path):
+    from CountLetters.LetterCounter.cache import CountCache
+
+    files = []
+    for name in "abc":
+        p = tmp_path / f"{name}.txt"
+        p.write_text(name * 3)
+        files.append(p)
+
+    cache = CountCache(tmp_path / "lru.cache", max_entries=2)
+    a, b, c = files
+    letter_counter.count_letters_in_file(a, cache=cache)
+    letter_counter.count_letters_in_file(b, cache=cache)
+    assert cache.lookup(a) is not None  # a is now the most recently used
+    letter_counter.count_letters_in_file(c, cache=cache)
+
+    assert len(cache) == 2
+    assert cache.lookup(b) is None
+    assert cache.lookup(a) is not None
+
+
+def test_cli_reports_cache_hits(tmp_path: Path, capsys):
+    (tmp_path / "one.txt").write_text("aaa")
+    (tmp_path / "two.txt").write_text("bb")
+    argv = [str(tmp_path / "*.txt"), "--cache", str(tmp_path / "counts.cache")]
+
+    assert letter_counter.main(argv) == 0
+    first_out, err = capsys.readouterr()
+    assert "cache: 0 hits, 2 misses" in err
+
+    assert letter_counter.main(argv) == 0
+    out, err = capsys.readouterr()
+    assert "cache: 2 hits, 0 misses" in err
+    assert out == first_out
+
+
+def test_incremental_counts_only_appended_bytes(tmp_path: Path):
+    from CountLetters.LetterCounter.cache import OffsetStore
+
+    log = tmp_path / "app.log"
+    log.write_bytes("first line é\n".encode("utf-8"))
+    state_file = tmp_path / "offsets.state"
+
+    with OffsetStore(state_file) as state:
+        assert letter_counter.count_letters_incremental(log, state) == letter_counter.count_letters_in_file(log)
+        assert state.full_scans == 1
+
+    # Append, ending in the middle of a multibyte character
+    ü = "ü".encode("utf-8")
+    with log.open("ab") as fh:
+        fh.write(b"second line " + ü[:1])
+
+    with OffsetStore(state_file) as state:
+        counts = letter_counter.count_letters_incremental(log, state)
+        assert state.full_scans == 0
+        assert state.bytes_read == len(b"second line ") + 1
+    assert counts == letter_counter.count_letters_in_file(log)
+
+    with log.open("ab") as fh:
+        fh.write(ü[1:] + b"!\n")
+    with OffsetStore(state_file) as state:
+        counts = letter_counter.count_letters_incremental(log, state)
+        # The held-back first byte of "ü" is read again
+        assert state.bytes_read == 4
+    assert counts['Ü'] == 1
+    assert counts == letter_counter.count_letters_in_file(log)
+
+
+def test_incremental_detects_truncation_and_rewrite(tmp_path: Path):
+    from CountLetters.LetterCounter.cache import OffsetStore
+
+    log = tmp_path / "app.log"
+    log.write_text("aaaa bbbb\n")
+    state = OffsetStore(tmp_path / "offsets.state")
+    letter_counter.count_letters_incremental(log, state)
+
+    # Truncated and rewritten with the same length: the fingerprint differs
+    log.write_text("cccc dddd\n")
+    assert letter_counter.count_letters_incremental(log, state) == Counter({'C': 4, 'D': 4})
+
+    # Shorter than the saved offset
+    log.write_text("z")
+    assert letter_counter.count_letters_incremental(log, state) == Counter({'Z': 1})
+    assert state.full_scans == 3
+
+
+def test_bench_suite_smoke(tmp_path: Path, capsys):
+    import json
+    from CountLetters import bench
+
+    out_file = tmp_path / "bench.json"
+    rc = bench.main([
+        "--sizes", "0.01", "--corpora", "ascii,cjk", "--repeat", "1",
+        "--no-isolate", "--json", str(out_file),
+    ])
+    assert rc == 0
+    report = json.loads(out_file.read_text())
+    rows = report["results"]
+    # text x2 engines, file x2 engines + binary, stdin, format -> 7 cases per corpus
+    assert len(rows) == 14
+    assert {row["corpus"] for row in rows} == {"ascii", "cjk"}
+    assert all(row["seconds"] > 0 for row in rows)
+    assert "peak RSS" in capsys.readouterr().out
+
+
+def test_alphabets_fold_latin_and_keep_unicode():
+    import pytest
+    from CountLetters.LetterCounter import alphabet
+
+    text = "Crème brûlée, Straße, Ærø! Жук"
+    for engine in letter_counter.ENGINES:
+        latin = letter_counter.count_letters_in_text(text, engine=engine, alphabet="latin")
+        assert latin["E"] == 6 and latin["S"] == 3 and latin["A"] == 2
+        assert set(latin) <= set(alphabet.LETTERS)
+        ascii_only = letter_counter.count_letters_in_text(text, engine=engine, alphabet="ascii")
+        assert ascii_only == Counter("CRMEBRLESTRAER")
+        unicode_counts = letter_counter.count_letters_in_text(text, engine=engine)
+        assert unicode_counts["Ж"] == 1 and unicode_counts["É"] == 1 and unicode_counts["SS"] == 1
+
+    assert alphabet.fold_text("Ærø café") == "AERO CAFE"
+    with pytest.raises(ValueError):
+        alphabet.fold_counts({}, "klingon")
+
+
+def test_cli_alphabet_unicode_totals_all_letters(tmp_path: Path, capsys):
+    f = tmp_path / "t.txt"
+    f.write_text("aé", encoding="utf-8")
+    assert letter_counter.main(["--file", str(f), "--alphabet", "unicode"]) == 0
+    out = capsys.readouterr().out
+    assert "A: 1 (50.00%)" in out and "É: 1 (50.00%)" in out
+    assert letter_counter.main(["--file", str(f), "--alphabet", "latin"]) == 0
+    assert "E: 1 (50.00%)" in capsys.readouterr().out
+
+
+def test_histogram_formats_round_trip():
+    import pytest
+    from CountLetters.LetterCounter import formats
+
+    counts = Counter({"A": 3, "Z": 1, "É": 2})
+    for fmt in ("json", "csv", "binary"):
+        assert formats.load_counts(formats.dump_counts(counts, fmt)) == counts
+    weighted = Counter({"A": 1.5, "B": 2})
+    assert formats.load_counts(formats.dump_counts(weighted, "binary")) == weighted
+    with pytest.raises(ValueError):
+        formats.load_counts(b"A: 3 (100.00%)")
+
+
+def test_cli_merge_sums_saved_histograms(tmp_path: Path, capsys):
+    saved = []
+    for i, (text, fmt) in enumerate((("aab", "json"), ("bc", "csv"), ("ccc", "binary"))):
+        src = tmp_path / f"part{i}.txt"
+        src.write_text(text, encoding="utf-8")
+        assert letter_counter.main(["--file", str(src), "--format", fmt]) == 0
+        out = tmp_path / f"part{i}.hist"
+        out.write_bytes(capsys.readouterr().out.encode("utf-8", "surrogateescape"))
+        saved.append(str(out))
+
+    assert letter_counter.main(["merge", *saved]) == 0
+    out = capsys.readouterr().out
+    assert "C: 4 (50.00%)" in out and "A: 2 (25.00%)" in out and "B: 2 (25.00%)" in out
+
+
+def test_tree_counter_matches_per_file_counts(tmp_path: Path, capsys):
+    from CountLetters.LetterCounter.crawl import TreeCounter
+
+    (tmp_path / "src" / "pkg").mkdir(parents=True)
+    texts = {"src/a.py": "héllo wörld " * 50, "src/pkg/b.PY": "ßtraße 日本 abc", "src/pkg/c.txt": "zzz", "src/d.py": ""}
+    for name, text in texts.items():
+        (tmp_path / name).write_text(text, encoding="utf-8")
+
+    expected = letter_counter.count_letters_in_text("".join(t for n, t in texts.items() if not n.endswith(".txt")))
+    # A tiny buffer forces files to be split, mid-character included
+    crawler = TreeCounter(extensions=["py"], threads=3, buffer_size=16)
+    assert crawler.count([tmp_path / "src"]) == expected
+    assert crawler.files == 3 and crawler.errors == 0
+
+    assert TreeCounter(min_size=4, max_size=100).count([tmp_path / "src"]) == letter_counter.count_letters_in_text(texts["src/pkg/b.PY"])
+
+    assert letter_counter.main(["--crawl", "--ext", "txt", str(tmp_path / "src")]) == 0
+    captured = capsys.readouterr()
+    assert "Z: 3 (100.00%)" in captured.out and "crawl: 1 files" in captured.err
+
+
+def test_tree_counter_stops_readers_when_counting_fails(tmp_path: Path, monkeypatch):
+    import threading
+
+    from CountLetters.LetterCounter import crawl
+
+    for i in range(200):
+        (tmp_path / f"{i}.txt").write_text("abc" * 20, encoding="utf-8")
+
+    class FailingCounter(letter_counter.BlockCounter):
+        def feed(self, block):
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(crawl, "BlockCounter", FailingCounter)
+    errors = []
+
+    def run():
+        try:
+            crawl.TreeCounter(threads=4, buffer_size=16).count([tmp_path])
+        except BaseException as exc:
+            errors.append(exc)
+
+    # Readers blocked on a free buffer used to keep the pool shutdown waiting forever
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive()
+    assert len(errors) == 1 and isinstance(errors[0], KeyboardInterrupt)
+
+
+def test_window_counter_tracks_last_characters_and_seconds():
+    import pytest
+
+    text = "The quick brown fox jumps over the lazy dög. " * 40
+    window = letter_counter.WindowCounter(size=100, resolution=10)
+    for i in range(0, len(text), 37):
+        window.feed(text[i:i + 37])
+        fed = i + len(text[i:i + 37])
+        # The window holds whole blocks: at least the last 100 characters, at most 9 more
+        assert 100 <= window.chars < 110 or window.chars == fed
+        assert window.counts() == letter_counter.count_letters_in_text(text[fed - window.chars:fed])
+
+    now = [0.0]
+    timed = letter_counter.WindowCounter(seconds=5, clock=lambda: now[0])
+    timed.feed("aaa")
+    now[0] = 3.0
+    timed.feed("bé")
+    assert timed.counts() == Counter({"A": 3, "B": 1, "É": 1})
+    now[0] = 6.0
+    assert timed.counts() == Counter({"B": 1, "É": 1})
+
+    with pytest.raises(ValueError):
+        letter_counter.WindowCounter(size=10, seconds=1)
+
+
+def test_cli_window_prints_periodic_counts(tmp_path: Path, capsys):
+    f = tmp_path / "stream.txt"
+    f.write_text("a" * 30 + "b" * 30, encoding="utf-8")
+    assert letter_counter.main(["--file", str(f), "--window", "20"]) == 0
+    reports = capsys.readouterr().out.split("--- ")[1:]
+    # 61 characters (the trailing newline included) -> a report every 20 and one at the end
+    assert len(reports) == 4
+    assert "A: 20 (100.00%)" in reports[0]
+    assert "B: 20 (100.00%)" in reports[2]
+
+
+def test_cli_window_every_validation_and_text_stdin(monkeypatch, capsys):
+    import pytest
+
+    # A report interval below one character would never advance
+    for every in ("0.5", "0", "-1"):
+        with pytest.raises(SystemExit):
+            letter_counter.main(["--window", "20", "--window-every", every])
+
+    # A text stream without .buffer ends with "" rather than b""
+    monkeypatch.setattr(sys, "stdin", io.StringIO("a" * 30))
+    assert letter_counter.main(["--window", "20", "--window-every", "10"]) == 0
+    reports = capsys.readouterr().out.split("--- ")[1:]
+    assert len(reports) == 3
+    assert "A: 20 (100.00%)" in reports[-1]
+
+
+def test_cli_rejects_options_it_would_drop(tmp_path: Path, monkeypatch, capsys):
+    import pytest
+
+    a = tmp_path / "a.txt"
+    a.write_text("abc")
+    b = tmp_path / "b.txt"
+    b.write_text("de")
+    rejected = [
+        # Two modes at once
+        [str(a), "--weights", "tab", "--crawl"],
+        [str(a), "--window", "20", "--incremental", str(tmp_path / "state")],
+        [str(a), "--crawl", "--cache", str(tmp_path / "cache")],
+        # Modes that need files, on stdin
+        ["--crawl"],
+        ["--incremental", str(tmp_path / "state")],
+        # N-grams are only counted on their own or with --weights
+        [str(a), "--bigrams", "--crawl"],
+        [str(a), "--positions", "--window", "20"],
+        # --binary only changes how a single file is read
+        [str(a), str(b), "--binary"],
+        [str(tmp_path), "--binary"],
+        [str(a), "--binary", "--jobs", "2"],
+        [str(a), "--binary", "--bigrams"],
+        ["--binary"],
+    ]
+    monkeypatch.setattr(sys, "stdin", io.StringIO("should not be read"))
+    for argv in rejected:
+        with pytest.raises(SystemExit) as exc:
+            letter_counter.main(argv)
+        assert exc.value.code == 2, argv
+    capsys.readouterr()
+
+    assert letter_counter.main([str(a), "--binary", "--cache", str(tmp_path / "cache")]) == 0
+    assert capsys.readouterr().out.splitlines()[0] == "A: 1 (33.33%)"
+
+
+# Modules the CLI only imports where they are used, never at startup
+LAZY_MODULES = ("argparse", "concurrent.futures", "csv", "glob", "json", "numpy", "pathlib", "typing")
+
+
+def test_cli_import_is_lazy():
+    import subprocess
+
+    root = Path(__file__).resolve().parents[2]
+    # A fresh interpreter, so nothing imported by the test run counts
+    code = ("import sys, CountLetters.LetterCounter.letter_counter; "
+            f"print(' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert result.stdout.split() == []
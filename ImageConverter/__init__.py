@@ -0,0 +1,29 @@
+"""Image conversion tools.
+
+The conversion pipeline in :mod:`ImageConverter.pipeline` has no GUI
+dependencies and can be used from other code or run headless:
+
+    python -m ImageConverter convert --out DIR --jobs N PATHS...
+
+``image_converter.py`` and ``svg_converter.py`` are Tk front ends for it and
+are run as scripts.
+"""
+
+# The pipeline (and with it Pillow) is loaded on first attribute access
+# (PEP 562), so importing the package alone stays cheap.
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from . import pipeline
+
+
+def __getattr__(name):
+    if name == "pipeline":
+        # Not `from . import pipeline`: that looks the name up here again
+        import importlib
+
+        return importlib.import_module(".pipeline", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ["pipeline"]
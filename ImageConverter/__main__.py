@@ -0,0 +1,139 @@
+"""Command line entry point: ``python -m ImageConverter convert ...``.
+
+Examples:
+    python -m ImageConverter convert --out converted --jobs 4 photos/ logo.png
+    python -m ImageConverter convert --target svg --in-place --remove-originals assets/
+"""
+import argparse
+import itertools
+import logging
+import sys
+
+from .pipeline import (
+    CACHE_NAME,
+    DEDUPE_MODES,
+    INPUT_EXTENSIONS,
+    JOURNAL_NAME,
+    MAX_SIZE,
+    REDUCING_GAP,
+    TARGETS,
+    default_cache_path,
+    default_journal_path,
+    iter_conversions,
+    iter_image_paths,
+)
+
+
+def _reducing_gap(value: str) -> float | None:
+    gap = float(value)
+    if gap == 0:
+        return None
+    if gap < 1.0:
+        raise argparse.ArgumentTypeError("must be 0 (off) or at least 1.0")
+    return gap
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m ImageConverter",
+                                     description="Convert images to WebP or WebP-in-SVG without a GUI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="convert image files and folders")
+    convert.add_argument("paths", nargs="+", metavar="PATHS",
+                         help="image files, or folders to search recursively")
+    where = convert.add_mutually_exclusive_group(required=True)
+    where.add_argument("--out", metavar="DIR", help="directory for the converted files (created if missing)")
+    where.add_argument("--in-place", action="store_true", help="write each converted file next to its source")
+    convert.add_argument("--target", choices=TARGETS, default="webp",
+                         help="output format: webp, or svg with the WebP embedded (default: webp)")
+    convert.add_argument("--jobs", "-j", type=int, default=0, metavar="N",
+                         help="worker processes; 0 uses one per CPU core (default: 0)")
+    convert.add_argument("--max-size", type=int, default=MAX_SIZE, metavar="PX",
+                         help=f"largest width or height of the output (default: {MAX_SIZE})")
+    convert.add_argument("--reducing-gap", type=_reducing_gap, default=REDUCING_GAP, metavar="X",
+                         help="decode JPEGs at reduced scale and box-reduce down to X times the output size "
+                              f"before the LANCZOS resample; 1.0 is fastest, 0 resamples at full size "
+                              f"(default: {REDUCING_GAP})")
+    convert.add_argument("--remove-originals", action="store_true",
+                         help="delete each source after it converted successfully")
+    convert.add_argument("--journal", metavar="FILE",
+                         help="record finished files in FILE so an interrupted run resumes where it stopped; "
+                              f"deleted when the run completes (default with --in-place: {JOURNAL_NAME} "
+                              "in the first folder given)")
+    cache = convert.add_mutually_exclusive_group()
+    cache.add_argument("--cache", metavar="FILE",
+                       help="conversion cache: files converted before with the same settings are skipped "
+                            f"(default: {CACHE_NAME} in the output folder, or with --in-place in the "
+                            "per-user cache directory)")
+    cache.add_argument("--no-cache", action="store_true", help="convert every file, ignoring the cache")
+    convert.add_argument("--dedupe", choices=DEDUPE_MODES, default="off",
+                         help="convert each image once and hard-link its output for byte-identical copies "
+                              "(exact), or also for re-saved copies with the same dimensions and a "
+                              "near-identical difference hash (perceptual; needs --out and cannot be used "
+                              "with --remove-originals) (default: off)")
+    convert.add_argument("--ordered", action="store_true",
+                         help="take files in sorted path order instead of as the folders are read")
+    convert.add_argument("--verbose", "-v", action="store_true", help="log every file to stderr")
+    return parser
+
+
+def convert_main(args: argparse.Namespace) -> int:
+    if args.jobs < 0:
+        print("error: --jobs must be 0 or more", file=sys.stderr)
+        return 2
+    if args.max_size < 1:
+        print("error: --max-size must be at least 1", file=sys.stderr)
+        return 2
+    if args.dedupe == "perceptual" and (args.in_place or args.remove_originals):
+        # A near copy is a different image; it must keep its own original and output
+        print("error: --dedupe perceptual cannot be used with --in-place or --remove-originals", file=sys.stderr)
+        return 2
+    # Conversion starts with the first image found while the folders are
+    # still being searched
+    file_paths = iter_image_paths(args.paths, INPUT_EXTENSIONS[args.target], ordered=args.ordered)
+    first = next(file_paths, None)
+    if first is None:
+        print("No supported images found.", file=sys.stderr)
+        return 1
+
+    out_dir = None if args.in_place else args.out
+    journal = args.journal
+    if journal is None and args.in_place:
+        journal = default_journal_path(args.paths)
+    cache = None if args.no_cache else args.cache or default_cache_path(out_dir)
+
+    converted = up_to_date = skipped = failed = 0
+    original_kb = output_kb = 0.0
+    results = iter_conversions(itertools.chain([first], file_paths), out_dir, target=args.target,
+                               jobs=args.jobs, remove_originals=args.remove_originals,
+                               max_size=args.max_size, reducing_gap=args.reducing_gap,
+                               journal=journal, cache=cache, dedupe=args.dedupe)
+    for result in results:
+        if result.status == "converted":
+            converted += 1
+            original_kb += result.original_kb
+            output_kb += result.output_kb
+        elif result.status == "skipped" and result.output is not None:
+            up_to_date += 1
+        elif result.status == "skipped":
+            skipped += 1
+        else:
+            failed += 1
+
+    total = converted + up_to_date + skipped + failed
+    print(f"Success: {converted + up_to_date}/{total} "
+          f"(up to date {up_to_date}, skipped {skipped}, failed {failed})\n"
+          f"Original: {original_kb:.1f} KB -> Output: {output_kb:.1f} KB")
+    return 1 if failed else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    # Failures are always reported; per-file successes only with --verbose
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(levelname)s: %(message)s")
+    return convert_main(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""Per-image timing benchmarks for the conversion pipeline.
+
+Run from the repository root:
+
+    python -m ImageConverter.bench
+    python -m ImageConverter.bench --sizes 1200x900,4000x3000 --repeat 5 --json bench.json
+    python -m ImageConverter.bench --sizes 6000x4000 --formats jpeg --stages load --reducing-gaps 0,1,2
+
+Synthetic photo-like and flat (logo-like) images of each size are written
+to a temporary directory as PNG (RGB, RGBA and palette) and JPEG, then
+every stage is timed on every image:
+
+- ``load``: ``pipeline.load_image`` (decode, mode conversion, thumbnail)
+- ``png-roundtrip``: the ``optimize=True`` PNG re-save and second decode
+  the pipeline used to run on every PNG before converting; PNG only. It
+  never changed the output, so this is the time now saved per PNG.
+- ``classify``: ``pipeline.measure_complexity`` on the loaded image (the
+  lossless/lossy decision)
+- ``encode``: ``pipeline.encode_webp`` on the loaded image, classification
+  included
+- ``convert``: ``pipeline.convert_file`` end to end, to WebP
+
+``load`` and ``convert`` are timed once per ``--reducing-gaps`` value (0
+decodes and resamples at full size). The best of ``--repeat`` runs is
+reported in milliseconds. The table goes
+to stdout; ``--json`` also writes machine-readable results.
+"""
+import argparse
+import io
+import json
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from . import pipeline
+
+STAGES = ("load", "png-roundtrip", "classify", "encode", "convert")
+KINDS = ("photo", "flat")
+FORMATS = ("png-rgb", "png-rgba", "png-p", "jpeg")
+
+
+def make_image(kind: str, width: int, height: int, seed: int = 0) -> Image.Image:
+    """Return an RGB test image: ``photo`` (smooth gradients plus noise) or
+    ``flat`` (a few solid blocks, like a logo or screenshot)."""
+    rng = np.random.default_rng(seed)
+    if kind == "photo":
+        y = np.linspace(0, 1, height)[:, None]
+        x = np.linspace(0, 1, width)[None, :]
+        base = np.stack([180 * x + 40 * y, 120 * y + 60 * x * y, 200 * (1 - x) * y + 30], axis=-1)
+        noise = rng.normal(0, 12, (height, width, 3))
+        return Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8))
+    if kind == "flat":
+        pixels = np.full((height, width, 3), 245, dtype=np.uint8)
+        for _ in range(12):
+            x0, y0 = rng.integers(0, width), rng.integers(0, height)
+            pixels[y0:y0 + height // 5, x0:x0 + width // 5] = rng.integers(0, 256, 3)
+        return Image.fromarray(pixels)
+    raise ValueError(f"unknown kind {kind!r} (expected one of {', '.join(KINDS)})")
+
+
+def write_sample(img: Image.Image, fmt: str, path_stem: Path) -> Path:
+    """Save ``img`` in one of FORMATS and return the file's path."""
+    if fmt == "jpeg":
+        path = path_stem.with_suffix(".jpg")
+        img.save(path, quality=90)
+        return path
+    path = path_stem.with_suffix(".png")
+    if fmt == "png-rgb":
+        img.save(path)
+    elif fmt == "png-rgba":
+        img.convert("RGBA").save(path)
+    elif fmt == "png-p":
+        img.convert("P", palette=Image.Palette.ADAPTIVE, colors=256).save(path)
+    else:
+        raise ValueError(f"unknown format {fmt!r} (expected one of {', '.join(FORMATS)})")
+    return path
+
+
+def png_roundtrip(file_path: str) -> None:
+    """The PNG re-optimization the pipeline no longer does."""
+    img = Image.open(file_path)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", optimize=True)
+    buf.seek(0)
+    Image.open(buf).load()
+
+
+def time_call(func, *args, repeat: int = 3, **kwargs) -> float:
+    """Return the best wall-clock time of ``repeat`` calls, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_stage(stage: str, file_path: str, out_dir: str, repeat: int,
+              reducing_gap: float | None = pipeline.REDUCING_GAP) -> float | None:
+    if stage == "load":
+        return time_call(pipeline.load_image, file_path, pipeline.MAX_SIZE, reducing_gap, repeat=repeat)
+    if stage == "png-roundtrip":
+        if not file_path.endswith(".png"):
+            return None
+        return time_call(png_roundtrip, file_path, repeat=repeat)
+    if stage == "classify":
+        img = pipeline.load_image(file_path)
+        return time_call(pipeline.measure_complexity, img, repeat=repeat)
+    if stage == "encode":
+        img = pipeline.load_image(file_path)
+        return time_call(pipeline.encode_webp, img, repeat=repeat)
+    if stage == "convert":
+        return time_call(pipeline.convert_file, file_path, out_dir, "webp", pipeline.MAX_SIZE, reducing_gap,
+                         repeat=repeat)
+    raise ValueError(f"unknown stage {stage!r} (expected one of {', '.join(STAGES)})")
+
+
+def _parse_sizes(value: str) -> list[tuple[int, int]]:
+    sizes = []
+    for part in value.split(","):
+        width, _, height = part.lower().partition("x")
+        sizes.append((int(width), int(height)))
+    return sizes
+
+
+def _parse_gaps(value: str) -> list[float | None]:
+    return [float(part) or None for part in value.split(",")]
+
+
+def _parse_list(value: str, allowed: tuple[str, ...]) -> list[str]:
+    items = [item.strip() for item in value.split(",") if item.strip()]
+    unknown = [item for item in items if item not in allowed]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown {', '.join(unknown)} (expected {', '.join(allowed)})")
+    return items
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m ImageConverter.bench",
+                                     description="Time the image conversion pipeline per image.")
+    parser.add_argument("--sizes", type=_parse_sizes, default=_parse_sizes("1200x900,3000x2000"),
+                        help="comma-separated WIDTHxHEIGHT source sizes (default: 1200x900,3000x2000)")
+    parser.add_argument("--kinds", type=lambda v: _parse_list(v, KINDS), default=list(KINDS),
+                        help=f"comma-separated image kinds: {', '.join(KINDS)}")
+    parser.add_argument("--formats", type=lambda v: _parse_list(v, FORMATS), default=list(FORMATS),
+                        help=f"comma-separated source formats: {', '.join(FORMATS)}")
+    parser.add_argument("--stages", type=lambda v: _parse_list(v, STAGES), default=list(STAGES),
+                        help=f"comma-separated stages: {', '.join(STAGES)}")
+    parser.add_argument("--reducing-gaps", type=_parse_gaps, default=[pipeline.REDUCING_GAP],
+                        help=f"comma-separated reducing gaps for load and convert; 0 is full size "
+                             f"(default: {pipeline.REDUCING_GAP})")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the best is kept (default: 3)")
+    parser.add_argument("--json", metavar="PATH", help="also write results as JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="imgconv-bench-") as tmp:
+        out_dir = str(Path(tmp, "out"))
+        Path(out_dir).mkdir()
+        print(f"{'image':<28} {'stage':<14} {'gap':>4} {'ms':>9}")
+        for width, height in args.sizes:
+            for kind in args.kinds:
+                img = make_image(kind, width, height)
+                for fmt in args.formats:
+                    name = f"{kind}-{fmt}-{width}x{height}"
+                    path = str(write_sample(img, fmt, Path(tmp, name)))
+                    for stage in args.stages:
+                        gaps = args.reducing_gaps if stage in ("load", "convert") else [None]
+                        for gap in gaps:
+                            seconds = run_stage(stage, path, out_dir, args.repeat, gap)
+                            if seconds is None:
+                                continue
+                            shown = "-" if stage not in ("load", "convert") else gap or 0
+                            print(f"{name:<28} {stage:<14} {shown:>4} {seconds * 1000:>9.1f}")
+                            results.append({"image": name, "kind": kind, "format": fmt, "width": width,
+                                            "height": height, "stage": stage, "reducing_gap": gap,
+                                            "ms": round(seconds * 1000, 3)})
+                            sys.stdout.flush()
+
+    if args.json:
+        meta = {"python": platform.python_version(), "pillow": Image.__version__,
+                "platform": platform.platform(), "repeat": args.repeat}
+        Path(args.json).write_text(json.dumps({"meta": meta, "results": results}, indent=2) + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
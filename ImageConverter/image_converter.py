@@ -1,37 +1,18 @@
 import os
 import tkinter as tk
 from tkinter import filedialog
-from PIL import Image
 import logging
 from pathlib import Path
 import tkinterdnd2 as tkdnd
-import math
-import time
-
-# Set up the main application window
-root = tkdnd.TkinterDnD.Tk()
-root.title("Image Converter")
-root.configure(bg="#2B2B2B")  # Dark gray background
-
-# Set window size and position near the top-right corner
-window_width = 400
-window_height = 300
-offset = 50
-screen_width = root.winfo_screenwidth()
-screen_height = root.winfo_screenheight()
-x_position = screen_width - window_width - offset
-y_position = offset
-root.geometry(f"{window_width}x{window_height}+{x_position}+{y_position}")
-
-# Get the Downloads folder path
-downloads_path = str(Path.home() / "Downloads")
-output_folder = os.path.join(downloads_path, "Converted_Images")
-os.makedirs(output_folder, exist_ok=True)
-
-# Set up logging
-log_file = os.path.join(output_folder, "log.txt")
-logging.basicConfig(filename=log_file, level=logging.INFO,
-                    format="%(asctime)s - %(levelname)s - %(message)s")
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# The conversion itself lives in pipeline.py (also used headless through
+# `python -m ImageConverter convert`); this file is only the window.
+from pipeline import CACHE_NAME, iter_conversions
+
 logger = logging.getLogger()
 
 # Track conversion stats
@@ -40,16 +21,27 @@ successful_conversions = 0
 skipped_files = 0
 total_size_removed = 0
 
-def calculate_entropy(img):
-    """Calculate image entropy to determine complexity for adaptive compression."""
-    histogram = img.histogram()
-    histogram_length = sum(histogram)
-    if histogram_length == 0:
-        return 0
-    probabilities = [float(h) / histogram_length for h in histogram if h != 0]
-    return -sum(p * math.log2(p) for p in probabilities)
+# Worker pool for conversions, started on first use and sized to the core count
+executor = None
+
+# The batch loop runs on this background thread so the Tk loop never blocks;
+# it reports to the window through progress_queue, polled with root.after.
+batch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch")
+batch_future = None
+progress_queue = queue.Queue()
+cancel_event = threading.Event()
+resume_event = threading.Event()  # cleared while paused
+resume_event.set()
+POLL_MS = 100
+
+def get_executor():
+    global executor
+    if executor is None:
+        executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+    return executor
 
 def process_images(file_paths):
+    """Convert a batch; runs on the background batch thread."""
     global total_files, successful_conversions, skipped_files, total_size_removed
     total_files = len(file_paths)
     successful_conversions = 0
@@ -57,129 +49,161 @@ def process_images(file_paths):
     total_size_removed = 0
 
     # Initialize status label
-    status_label.config(text="Preparing...")
-    root.update_idletasks()
-
-    for i, file_path in enumerate(file_paths, 1):
-        file_ext = os.path.splitext(file_path)[1].lower()
-
-        # Skip if already WebP
-        if file_ext == ".webp":
-            logger.info(f"Skipped {file_path} (already WebP)")
-            skipped_files += 1
-            status_label.config(text=f"Processing:\n{i}/{total_files} {'image' if total_files == 1 else 'images'}")
-            root.update_idletasks()
-            time.sleep(0.01)  # Slight delay for visible updates
-            continue
-
-        # Check if file is a supported image format
-        if file_ext not in [".png", ".jpg"]:
-            logger.warning(f"Skipped imageteller {file_path} (unsupported image format)")
-            skipped_files += 1
-            status_label.config(text=f"Processing:\n{i}/{total_files} {'image' if total_files == 1 else 'images'}")
-            root.update_idletasks()
-            time.sleep(0.01)
-            continue
-
-        try:
-            # Open image and get original size
-            original_size = os.path.getsize(file_path) / 1024  # KB
-            img = Image.open(file_path)
-
-            # Optimize PNG inputs
-            if file_ext == ".png":
-                img.save("temp.png", optimize=True)
-                img = Image.open("temp.png")
-
-            # Convert to RGB if necessary
-            if img.mode in ("RGBA", "LA"):
-                img = img.convert("RGB")
-
-            # Resize to max 1000px
-            max_dimensions = (1000, 1000)
-            img.thumbnail(max_dimensions, Image.Resampling.LANCZOS)
-
-            # Determine compression settings based on entropy
-            entropy = calculate_entropy(img)
-            if entropy < 4.0:  # Low complexity (e.g., text, logos)
-                quality = 60
-                lossless = True
-            else:  # High complexity (e.g., photos)
-                quality = 75
-                lossless = False
-
-            output_filename = os.path.splitext(os.path.basename(file_path))[0] + ".webp"
-            output_path = os.path.join(output_folder, output_filename)
-
-            # Save as WebP with optimized settings
-            save_params = {
-                "format": "WEBP",
-                "quality": quality if not lossless else 100,
-                "lossless": lossless,
-                "method": 6,  # Maximum compression effort
-                "exif": b"",  # Strip EXIF metadata
-                "icc_profile": None  # Strip ICC profile
-            }
-            img.save(output_path, **save_params)
-
-            # Calculate size savings
-            output_size = os.path.getsize(output_path) / 1024  # KB
-            size_saved = original_size - output_size
-            total_size_removed += size_saved
-
-            logger.info(
-                f"Successfully converted {file_path} to {output_path} (quality={quality}, lossless={lossless}, original={original_size:.1f}KB, output={output_size:.1f}KB, saved={size_saved:.1f}KB)")
+    progress_queue.put(("progress", "Preparing..."))
+
+    done = 0
+    results = iter_conversions(file_paths, output_folder, target="webp",
+                               cache=os.path.join(output_folder, CACHE_NAME), executor=get_executor(),
+                               cancel_event=cancel_event, resume_event=resume_event)
+    for result in results:
+        if result.status == "converted":
             successful_conversions += 1
-
-        except Exception as e:
-            logger.error(f"Failed to convert {file_path}: {str(e)}")
+            total_size_removed += result.original_kb - result.output_kb
+        elif result.output is not None:  # already converted, output up to date
+            successful_conversions += 1
+        elif result.status == "skipped":
+            skipped_files += 1
 
         # Update status label with counter
-        status_label.config(text=f"Processing:\n{i}/{total_files} {'image' if total_files == 1 else 'images'}")
-        root.update_idletasks()
-        time.sleep(0.01)  # Slight delay for visible updates
+        done += 1
+        progress_queue.put(("progress", f"Processing:\n{done}/{total_files} {'image' if total_files == 1 else 'images'}"))
 
     # Show final status
-    success_rate = (successful_conversions / total_files * 100) if total_files > 0 else 0
     status_text = f"Success: {successful_conversions}/{total_files}\nRemoved: {total_size_removed:.1f} KB"
-    status_label.config(text=status_text)
+    if cancel_event.is_set():
+        status_text = f"Cancelled after {done}/{total_files}\n" + status_text
     logger.info(status_text)
-
-    # Clean up the temporary PNG file
-    if os.path.exists("temp.png"):
-        os.remove("temp.png")
+    progress_queue.put(("done", status_text))
+
+def run_batch(file_paths):
+    try:
+        process_images(file_paths)
+    except Exception as e:
+        logger.error(f"Batch failed: {str(e)}")
+        progress_queue.put(("done", f"Batch failed: {str(e)}"))
+
+def start_batch(file_paths):
+    global batch_future
+    if batch_future is not None and not batch_future.done():
+        status_label.config(text="Busy: cancel or wait for\nthe current batch")
+        return
+    cancel_event.clear()
+    resume_event.set()
+    set_busy(True)
+    batch_future = batch_executor.submit(run_batch, list(file_paths))
+
+def poll_progress():
+    # Only the latest message matters; drain everything queued since last poll
+    try:
+        while True:
+            kind, text = progress_queue.get_nowait()
+            if resume_event.is_set() or kind == "done":
+                status_label.config(text=text)
+            if kind == "done":
+                set_busy(False)
+    except queue.Empty:
+        pass
+    root.after(POLL_MS, poll_progress)
+
+def set_busy(busy):
+    state = tk.NORMAL if busy else tk.DISABLED
+    pause_button.config(state=state, text="Pause")
+    cancel_button.config(state=state)
+    select_button.config(state=tk.DISABLED if busy else tk.NORMAL)
+
+def toggle_pause():
+    if resume_event.is_set():
+        resume_event.clear()
+        pause_button.config(text="Resume")
+        status_label.config(text="Paused")
+    else:
+        resume_event.set()
+        pause_button.config(text="Pause")
+
+def cancel_batch():
+    cancel_event.set()
+    resume_event.set()  # a paused batch has to wake up to stop
+    status_label.config(text="Cancelling...")
 
 def select_files():
     files = filedialog.askopenfilenames(
         title="Select Images",
-        filetypes=[("Image files", "*.png *.jpg")]
+        filetypes=[("Image files", "*.png *.jpg *.jpeg")]
     )
     if files:
-        process_images(files)
+        start_batch(files)
 
 def drop(event):
     # Handle dropped files
     file_paths = root.tk.splitlist(event.data)
-    process_images(file_paths)
-
-# UI Elements
-frame = tk.Frame(root, bg="#2B2B2B")
-frame.pack(pady=20)
-
-instruction_label = tk.Label(frame, text="drop images here to convert\npng & jpg into webp",
-                             bg="#2B2B2B", fg="#FFFFFF", font=("Arial", 12))
-instruction_label.pack(pady=10)
-
-select_button = tk.Button(frame, text="Select Images", command=select_files,
-                          bg="#3C3F41", fg="#FFFFFF", font=("Arial", 10), activebackground="#4B4B4B")
-select_button.pack(pady=10)
-
-status_label = tk.Label(frame, text="", bg="#2B2B2B", fg="#FFFFFF", font=("Arial", 10))
-status_label.pack(pady=10)
-
-# Enable drag-and-drop
-root.drop_target_register(tkdnd.DND_FILES)
-root.dnd_bind('<<Drop>>', drop)
-
-# Start the application
-root.mainloop()
\ No newline at end of file
+    start_batch(file_paths)
+
+# Conversions run in worker processes, which import this file again; the
+# window is only built in the main process.
+if __name__ == "__main__":
+    # Needed for worker processes in a frozen (pyinstaller) build
+    multiprocessing.freeze_support()
+
+    # Set up the main application window
+    root = tkdnd.TkinterDnD.Tk()
+    root.title("Image Converter")
+    root.configure(bg="#2B2B2B")  # Dark gray background
+
+    # Set window size and position near the top-right corner
+    window_width = 400
+    window_height = 340
+    offset = 50
+    screen_width = root.winfo_screenwidth()
+    screen_height = root.winfo_screenheight()
+    x_position = screen_width - window_width - offset
+    y_position = offset
+    root.geometry(f"{window_width}x{window_height}+{x_position}+{y_position}")
+
+    # Get the Downloads folder path
+    downloads_path = str(Path.home() / "Downloads")
+    output_folder = os.path.join(downloads_path, "Converted_Images")
+    os.makedirs(output_folder, exist_ok=True)
+
+    # Set up logging
+    log_file = os.path.join(output_folder, "log.txt")
+    logging.basicConfig(filename=log_file, level=logging.INFO,
+                        format="%(asctime)s - %(levelname)s - %(message)s")
+
+    # UI Elements
+    frame = tk.Frame(root, bg="#2B2B2B")
+    frame.pack(pady=20)
+
+    instruction_label = tk.Label(frame, text="drop images here to convert\npng & jpg into webp",
+                                 bg="#2B2B2B", fg="#FFFFFF", font=("Arial", 12))
+    instruction_label.pack(pady=10)
+
+    select_button = tk.Button(frame, text="Select Images", command=select_files,
+                              bg="#3C3F41", fg="#FFFFFF", font=("Arial", 10), activebackground="#4B4B4B")
+    select_button.pack(pady=10)
+
+    control_row = tk.Frame(frame, bg="#2B2B2B")
+    control_row.pack()
+    pause_button = tk.Button(control_row, text="Pause", command=toggle_pause, state=tk.DISABLED,
+                             bg="#3C3F41", fg="#FFFFFF", font=("Arial", 10), activebackground="#4B4B4B")
+    pause_button.pack(side=tk.LEFT, padx=4)
+    cancel_button = tk.Button(control_row, text="Cancel", command=cancel_batch, state=tk.DISABLED,
+                              bg="#3C3F41", fg="#FFFFFF", font=("Arial", 10), activebackground="#4B4B4B")
+    cancel_button.pack(side=tk.LEFT, padx=4)
+
+    status_label = tk.Label(frame, text="", bg="#2B2B2B", fg="#FFFFFF", font=("Arial", 10))
+    status_label.pack(pady=10)
+
+    # Enable drag-and-drop
+    root.drop_target_register(tkdnd.DND_FILES)
+    root.dnd_bind('<<Drop>>', drop)
+
+    # Start the application
+    root.after(POLL_MS, poll_progress)
+    root.mainloop()
+
+    # Window closed: stop a running batch before the pools shut down
+    cancel_event.set()
+    resume_event.set()
+    batch_executor.shutdown()
+    if executor is not None:
+        executor.shutdown(cancel_futures=True)
@@ -0,0 +1,1275 @@
+"""Image conversion pipeline shared by the GUIs and the command line.
+
+Nothing here touches Tk, so it can be imported on headless machines:
+
+    from ImageConverter.pipeline import iter_conversions, iter_image_paths
+
+    for result in iter_conversions(iter_image_paths(["photos"]), "out", target="svg", jobs=0):
+        print(result.status, result.source)
+
+:func:`iter_image_paths` yields images while it is still searching the
+folders, so conversion starts as soon as the first one is found.
+
+Two targets are supported:
+- webp: the image as an optimized .webp file
+- svg:  an .svg file with the optimized WebP embedded as a base64 data URI
+
+Images are resized to at most 1000px (``max_size``) and compressed
+adaptively: graphics (text, logos, charts) are saved lossless, photos
+lossy. :func:`measure_complexity` decides which from a small preview:
+per-channel entropy, the number of distinct colours and the share of
+pixels on a sharp edge. With NumPy installed these are computed as array
+operations, otherwise with the equivalent Pillow operations; both give the
+same numbers.
+
+Every output is written to a temporary file and renamed into place, so a
+crash or kill never leaves a truncated file under the final name. In-place
+runs can keep a :class:`Journal` of finished files; restarting an
+interrupted run with the same journal picks up where it stopped. A
+:class:`ConversionCache` remembers what every source (by content) was
+converted to with which settings, so converting an unchanged folder again
+only costs hashing it. With ``dedupe`` a batch encodes each distinct image
+once (see :func:`find_duplicates`) and hard-links the result for its
+duplicates.
+
+Large sources are never decoded or resampled at full size when they do not
+need to be. JPEGs are decoded straight at 1/2, 1/4 or 1/8 scale (DCT
+scaling), and every format is then shrunk by a fast integer box reduction
+before the final LANCZOS pass. Both steps stop at ``reducing_gap`` times
+the target size, so the LANCZOS filter always has that much detail to work
+from: 2.0 (the default) is indistinguishable from a full-size resample,
+1.0 is fastest, and None decodes and resamples at full size.
+"""
+import binascii
+import hashlib
+import io
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+from urllib.parse import unquote, urlparse
+
+from PIL import Image, ImageChops
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
+
+logger = logging.getLogger(__name__)
+
+TARGETS = ("webp", "svg")
+
+# Source formats each target accepts
+INPUT_EXTENSIONS = {
+    "webp": frozenset({".png", ".jpg", ".jpeg"}),
+    "svg": frozenset({".png", ".jpg", ".jpeg", ".webp"}),
+}
+SUPPORTED_EXTENSIONS = frozenset({".png", ".jpg", ".jpeg", ".webp"})
+
+# Threads reading folders in parallel while searching for images
+SCAN_THREADS = 8
+
+# Bytes of WebP base64-encoded per write when streaming an SVG; a multiple
+# of 3 so the chunks encode without padding and join into one valid string
+SVG_CHUNK_SIZE = 3 * 64 * 1024
+
+# Journal file an in-place run keeps in the folder it was started on
+JOURNAL_NAME = ".imageconverter-journal"
+
+# Conversion cache file kept with the outputs (or in the in-place folder)
+CACHE_NAME = ".imageconverter-cache.sqlite"
+# Part of every cache key; bump it when a change to the pipeline changes its
+# output, so results of the old pipeline are not reused
+PIPELINE_VERSION = 1
+_HASH_BLOCK = 1 << 20
+
+# "exact" merges byte-identical files; "perceptual" also merges images of the
+# same size whose difference hashes are within PERCEPTUAL_MAX_DISTANCE bits
+DEDUPE_MODES = ("off", "exact", "perceptual")
+PERCEPTUAL_MAX_DISTANCE = 2
+
+MAX_SIZE = 1000
+REDUCING_GAP = 2.0
+
+# Complexity is measured on a preview no larger than this
+PREVIEW_SIZE = 256
+# A luminance step (|dx| + |dy| between neighbours) above this is an edge
+EDGE_THRESHOLD = 32
+# Images below this mean per-channel entropy (bits) are lossless candidates:
+# with a small palette (flat graphics, text) or many sharp edges (charts and
+# anti-aliased line art) they compress better or look better lossless
+LOSSLESS_MAX_ENTROPY = 5.0
+LOSSLESS_MAX_COLORS = 256
+LOSSLESS_MIN_EDGE_DENSITY = 0.05
+
+
+class Complexity(NamedTuple):
+    """How hard an image is to compress, measured on a small preview."""
+    entropy: float  # mean Shannon entropy of the R, G and B channels, in bits (0-8)
+    channel_entropy: tuple[float, float, float]
+    unique_colors: int
+    edge_density: float  # share of pixels (0-1) on a sharp luminance edge
+
+    @property
+    def lossless(self) -> bool:
+        """True for graphics that should be saved lossless rather than lossy."""
+        return self.entropy < LOSSLESS_MAX_ENTROPY and (
+            self.unique_colors <= LOSSLESS_MAX_COLORS or self.edge_density >= LOSSLESS_MIN_EDGE_DENSITY)
+
+
+class ConversionResult(NamedTuple):
+    """Outcome of converting one file."""
+    source: str
+    output: str | None
+    status: str  # "converted", "skipped" or "failed"
+    message: str
+    original_kb: float = 0.0
+    output_kb: float = 0.0
+
+
+def normalize_dnd_path(raw: str) -> str:
+    p = raw.strip()
+    if len(p) >= 2 and p[0] == "{" and p[-1] == "}":
+        p = p[1:-1]
+    if p.startswith("file:"):
+        parsed = urlparse(p)
+        p = unquote(parsed.path)
+        if os.name == "nt" and len(p) >= 3 and p[0] == "/" and p[2] == ":":
+            p = p[1:]
+    p = os.path.normpath(p)
+    if not os.path.isabs(p) and os.path.exists(p):
+        p = os.path.abspath(p)
+    return p
+
+
+def resolve_directory_root(p: str) -> str:
+    """Absolute, canonical directory to use as os.walk root (the chosen folder itself)."""
+    if not os.path.isdir(p):
+        return p
+    return str(Path(p).resolve())
+
+
+def batch_includes_folder(raw_paths: list[str]) -> bool:
+    """True if any dropped/selected path is a directory (triggers in-place + delete originals)."""
+    for raw in raw_paths:
+        p = normalize_dnd_path(raw)
+        if os.path.isdir(p):
+            return True
+    return False
+
+
+def _scan_directory(directory: str, extensions: frozenset[str]) -> list[tuple[str, str, bool]]:
+    """``(name, path, is_dir)`` for the images and subfolders in ``directory``.
+
+    File types come from the directory listing itself (os.scandir), so no
+    file is stat'ed. Symlinked folders are not followed, as with os.walk.
+    """
+    found = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                    if is_dir and entry.is_symlink():
+                        continue
+                except OSError:
+                    is_dir = False
+                if is_dir or os.path.splitext(entry.name)[1].lower() in extensions:
+                    found.append((entry.name, entry.path, is_dir))
+    except OSError as e:
+        logger.warning(f"Skipped folder {directory} ({e})")
+    return found
+
+
+def _walk_unordered(root_dir: str, extensions: frozenset[str], pool: ThreadPoolExecutor | None) -> Iterator[str]:
+    if pool is None:
+        folders = [root_dir]
+        while folders:
+            for _name, path, is_dir in _scan_directory(folders.pop(), extensions):
+                if is_dir:
+                    folders.append(path)
+                else:
+                    yield path
+        return
+    # Every folder found is queued on the pool; images come out of whichever
+    # folder is read first
+    pending = {pool.submit(_scan_directory, root_dir, extensions)}
+    while pending:
+        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in finished:
+            for _name, path, is_dir in future.result():
+                if is_dir:
+                    pending.add(pool.submit(_scan_directory, path, extensions))
+                else:
+                    yield path
+
+
+def _walk_ordered(
+    found: list[tuple[str, str, bool]], extensions: frozenset[str], pool: ThreadPoolExecutor | None
+) -> Iterator[str]:
+    # A folder sorts as its name plus a separator, so the images come out
+    # exactly as sorted() would order their full paths
+    found = sorted(found, key=lambda item: item[0] + os.sep if item[2] else item[0])
+    # Subfolders are read ahead on the pool while earlier entries are yielded
+    scans = {path: pool.submit(_scan_directory, path, extensions)
+             for _name, path, is_dir in found if is_dir} if pool is not None else {}
+    for _name, path, is_dir in found:
+        if not is_dir:
+            yield path
+            continue
+        sub = scans[path].result() if pool is not None else _scan_directory(path, extensions)
+        yield from _walk_ordered(sub, extensions, pool)
+
+
+def iter_image_paths(
+    raw_paths: Iterable[str],
+    extensions: Iterable[str] = SUPPORTED_EXTENSIONS,
+    ordered: bool = False,
+    threads: int = SCAN_THREADS,
+) -> Iterator[str]:
+    """Expand files and directories, yielding supported images as they are found.
+
+    Folders are searched recursively with os.scandir. With ``threads`` above
+    1 their subfolders are read in parallel on a thread pool, which matters
+    most on network shares. Paths are handled in the order given. Within a
+    folder, images come in the order they are found, or with ``ordered`` in
+    sorted path order.
+    """
+    extensions = frozenset(extensions)
+    pool = None
+    try:
+        for raw in raw_paths:
+            p = normalize_dnd_path(raw)
+            if not os.path.exists(p):
+                logger.warning(f"Skipped missing path: {raw}")
+                continue
+            if os.path.isfile(p):
+                ext = os.path.splitext(p)[1].lower()
+                if ext in extensions:
+                    yield p
+                else:
+                    logger.warning(f"Skipped file {p} (unsupported image format)")
+            elif os.path.isdir(p):
+                root_dir = resolve_directory_root(p)
+                if pool is None and threads > 1:
+                    pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="scan")
+                if ordered:
+                    yield from _walk_ordered(_scan_directory(root_dir, extensions), extensions, pool)
+                else:
+                    yield from _walk_unordered(root_dir, extensions, pool)
+            else:
+                logger.warning(f"Skipped path {p} (not a file or directory)")
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def collect_image_paths(raw_paths: list[str], extensions: Iterable[str] = SUPPORTED_EXTENSIONS) -> list[str]:
+    """Expand files and directories; recursively collect supported images (sorted).
+
+    Searches everything before returning; :func:`iter_image_paths` streams.
+    """
+    return sorted(iter_image_paths(raw_paths, extensions))
+
+
+def make_preview(img: Image.Image, size: int = PREVIEW_SIZE) -> Image.Image:
+    """A small RGB copy of ``img`` for measuring complexity.
+
+    Nearest-neighbour sampling keeps the source's exact colours and edges; a
+    filtering resample would blend in new colours and soften the edges.
+    """
+    if max(img.size) > size:
+        img = img.resize(fit_size(img.size, size), Image.Resampling.NEAREST)
+    return img if img.mode == "RGB" else img.convert("RGB")
+
+
+def _measure_numpy(preview: Image.Image) -> Complexity:
+    assert np is not None  # only called when NumPy imported
+    hist = np.asarray(preview.histogram(), dtype=np.float64).reshape(3, 256)
+    prob = hist / np.maximum(hist.sum(axis=1, keepdims=True), 1)
+    logs = np.log2(prob, out=np.zeros_like(prob), where=prob > 0)
+    channel_entropy = -(prob * logs).sum(axis=1)
+
+    # Distinct colours: sort the packed 24-bit values and count the steps
+    # (several times faster than np.unique on a preview-sized array)
+    rgb = np.asarray(preview)
+    packed = (rgb[..., 0].astype(np.uint32) << 16) | (rgb[..., 1].astype(np.uint32) << 8) | rgb[..., 2]
+    packed = packed.ravel()
+    packed.sort()
+    unique_colors = int(np.count_nonzero(packed[1:] != packed[:-1])) + 1
+
+    edge_density = 0.0
+    if min(preview.size) > 1:
+        lum = np.asarray(preview.convert("L"), dtype=np.int16)
+        corner = lum[:-1, :-1]
+        step = np.abs(lum[:-1, 1:] - corner) + np.abs(lum[1:, :-1] - corner)
+        edge_density = float(np.count_nonzero(step > EDGE_THRESHOLD)) / step.size
+
+    r, g, b = (float(e) for e in channel_entropy)
+    return Complexity((r + g + b) / 3, (r, g, b), unique_colors, edge_density)
+
+
+def _measure_pillow(preview: Image.Image) -> Complexity:
+    r, g, b = (band.entropy() for band in preview.split())
+    width, height = preview.size
+    colors = preview.getcolors(width * height)
+    assert colors is not None  # None only if there are more colours than pixels
+    unique_colors = len(colors)
+
+    edge_density = 0.0
+    if width > 1 and height > 1:
+        lum = preview.convert("L")
+        corner = lum.crop((0, 0, width - 1, height - 1))
+        dx = ImageChops.difference(lum.crop((1, 0, width, height - 1)), corner)
+        dy = ImageChops.difference(lum.crop((0, 1, width - 1, height)), corner)
+        # add() saturates at 255, which is well above the threshold
+        edges = sum(ImageChops.add(dx, dy).histogram()[EDGE_THRESHOLD + 1:])
+        edge_density = edges / ((width - 1) * (height - 1))
+
+    return Complexity((r + g + b) / 3, (r, g, b), unique_colors, edge_density)
+
+
+def measure_complexity(img: Image.Image) -> Complexity:
+    """Measure entropy, colour count and edge density on a preview of ``img``."""
+    preview = make_preview(img)
+    if np is not None:
+        return _measure_numpy(preview)
+    return _measure_pillow(preview)
+
+
+def calculate_entropy(img):
+    """Mean per-channel entropy of ``img`` in bits, measured on a preview."""
+    return measure_complexity(img).entropy
+
+
+def _svg_header(width: int, height: int) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<svg xmlns="http://www.w3.org/2000/svg" '
+        f'width="{width}" height="{height}" viewBox="0 0 {width} {height}">\n'
+        f'  <image width="{width}" height="{height}" href="data:image/webp;base64,'
+    )
+
+
+_SVG_FOOTER = '"/>\n</svg>\n'
+
+
+def build_svg_with_webp_embed(width: int, height: int, webp_b64: str) -> str:
+    return _svg_header(width, height) + webp_b64 + _SVG_FOOTER
+
+
+def write_svg_with_webp_embed(f, width: int, height: int, webp: bytes | memoryview) -> None:
+    """Write the same SVG as :func:`build_svg_with_webp_embed` to binary file ``f``.
+
+    The WebP is base64-encoded a chunk at a time straight from a memoryview,
+    so no full-size base64 copy of it is ever held in memory.
+    """
+    view = memoryview(webp)
+    f.write(_svg_header(width, height).encode("ascii"))
+    for start in range(0, len(view), SVG_CHUNK_SIZE):
+        f.write(binascii.b2a_base64(view[start:start + SVG_CHUNK_SIZE], newline=False))
+    f.write(_SVG_FOOTER.encode("ascii"))
+
+
+def fit_size(size: tuple[int, int], max_size: int) -> tuple[int, int]:
+    """Size of an image of ``size`` scaled to fit a ``max_size`` square (never enlarged).
+
+    The short side is rounded the way ``Image.thumbnail`` rounds it (to
+    whichever neighbour keeps the aspect ratio closest), so results keep
+    the size the converters produced when they used ``thumbnail``.
+    """
+    width, height = size
+    if width <= max_size and height <= max_size:
+        return width, height
+    aspect = width / height
+    if aspect <= 1:
+        return _round_aspect(max_size * aspect, lambda n: abs(aspect - n / max_size)), max_size
+    return max_size, _round_aspect(max_size / aspect, lambda n: 0 if n == 0 else abs(aspect - max_size / n))
+
+
+def _round_aspect(number: float, error) -> int:
+    return max(min(math.floor(number), math.ceil(number), key=error), 1)
+
+
+def load_image(file_path: str, max_size: int = MAX_SIZE, reducing_gap: float | None = REDUCING_GAP) -> Image.Image:
+    """Open an image, resized and converted so it is ready to encode.
+
+    Args:
+        file_path: Source image.
+        max_size: Largest width or height of the result.
+        reducing_gap: How far above the target size draft decoding and box
+            reduction may go before LANCZOS takes over; None resamples the
+            full-size image.
+
+    The result has the size ``Image.thumbnail`` gives (see :func:`fit_size`).
+    Formats other than JPEG come out pixel-identical to ``thumbnail`` with
+    the same ``reducing_gap``. JPEGs are not: their draft is sized from the
+    target rather than the ``max_size`` square, so a wide or tall JPEG can
+    decode at a smaller scale, and pixels may differ by a level or two.
+    """
+    # PNG inputs used to be re-saved with optimize=True and decoded again
+    # first. That is lossless, so it never changed the WebP output; the
+    # source is now decoded once (see bench.py for the time it saved).
+    img = Image.open(file_path)
+    target_size = fit_size(img.size, max_size)
+
+    # Let the JPEG decoder scale down by 1/2, 1/4 or 1/8 while decoding; the
+    # draft is sized from the real target, so wide or tall images are
+    # scaled as far as their long side allows
+    box = None
+    if reducing_gap is not None and img.format == "JPEG":
+        width, height = target_size
+        drafted = img.draft(img.mode, (int(width * reducing_gap), int(height * reducing_gap)))
+        if drafted is not None:
+            box = drafted[1]  # the source area in drafted pixels, to the sub-pixel
+
+    # Convert to RGB if necessary
+    if img.mode in ("RGBA", "LA"):
+        img = img.convert("RGB")
+
+    # Resize to max 1000px: box-reduce to within reducing_gap of the target, then LANCZOS
+    if img.size != target_size:
+        img = img.resize(target_size, Image.Resampling.LANCZOS, box=box, reducing_gap=reducing_gap)
+    return img
+
+
+def encode_webp(img: Image.Image) -> tuple[memoryview, int, bool]:
+    """Encode as WebP with settings chosen by complexity. Returns (data, quality, lossless).
+
+    The data is a view of the encoder's buffer rather than a copy of it.
+    """
+    # Determine compression settings based on complexity
+    if measure_complexity(img).lossless:  # Low complexity (e.g., text, logos, charts)
+        quality = 60
+        lossless = True
+    else:  # High complexity (e.g., photos)
+        quality = 75
+        lossless = False
+
+    save_params = {
+        "format": "WEBP",
+        "quality": quality if not lossless else 100,
+        "lossless": lossless,
+        "method": 6,  # Maximum compression effort
+        "exif": b"",  # Strip EXIF metadata
+        "icc_profile": None  # Strip ICC profile
+    }
+    buf = io.BytesIO()
+    img.save(buf, **save_params)
+    return buf.getbuffer(), quality, lossless
+
+
+# Suffix atomic_output and link_output add to an output's name while writing it
+_TEMP_SUFFIX = re.compile(r"\.\d+\.tmp$")
+
+
+@contextmanager
+def atomic_output(output_path: str, sync: bool = False):
+    """Open a temporary file next to ``output_path`` and move it into place on success.
+
+    The temporary name includes the process id, so workers writing outputs
+    with the same name do not collide. With ``sync`` the data is flushed to
+    disk before the rename, for when the source is about to be deleted.
+    """
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            yield f
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def output_path_for(file_path: str, out_dir: str | None, target: str) -> str:
+    """Where the converted file goes; next to the source when out_dir is None."""
+    output_filename = os.path.splitext(os.path.basename(file_path))[0] + "." + target
+    return os.path.join(out_dir if out_dir is not None else os.path.dirname(file_path), output_filename)
+
+
+def convert_file(
+    file_path: str,
+    out_dir: str | None,
+    target: str = "webp",
+    max_size: int = MAX_SIZE,
+    reducing_gap: float | None = REDUCING_GAP,
+    sync: bool = False,
+) -> ConversionResult:
+    """Convert one image; safe to run in a worker process.
+
+    The output replaces any existing file atomically; ``sync`` also flushes
+    it to disk first. Errors are reported in the result rather than raised,
+    so one bad file does not stop a batch.
+    """
+    try:
+        # Open image and get original size
+        original_kb = os.path.getsize(file_path) / 1024
+        img = load_image(file_path, max_size, reducing_gap)
+        w, h = img.size
+        webp_bytes, quality, lossless = encode_webp(img)
+
+        output_path = output_path_for(file_path, out_dir, target)
+        with atomic_output(output_path, sync) as f:
+            if target == "svg":
+                write_svg_with_webp_embed(f, w, h, webp_bytes)
+            else:
+                f.write(webp_bytes)
+
+        output_kb = os.path.getsize(output_path) / 1024
+        if target == "svg":
+            details = (f"webp_embed={len(webp_bytes) / 1024:.1f}KB, "
+                       f"original={original_kb:.1f}KB, output_svg={output_kb:.1f}KB")
+        else:
+            details = (f"original={original_kb:.1f}KB, output={output_kb:.1f}KB, "
+                       f"saved={original_kb - output_kb:.1f}KB")
+        message = (f"Successfully converted {file_path} to {output_path} "
+                   f"(quality={quality}, lossless={lossless}, {details})")
+        return ConversionResult(file_path, output_path, "converted", message, original_kb, output_kb)
+
+    except Exception as e:
+        return ConversionResult(file_path, None, "failed", f"Failed to convert {file_path}: {str(e)}")
+
+
+class StaleTemps:
+    """Deletes the temporary files (see :func:`atomic_output`) a killed run left behind.
+
+    Each output folder is listed once, the first time an output in it comes
+    up. Only temporary files for the outputs passed to :meth:`remove` are
+    deleted, and only those older than this object: newer ones belong to
+    workers of the current run.
+    """
+
+    def __init__(self) -> None:
+        self._started = time.time()
+        # Leftover temporary files per output folder, by the output they were for
+        self._temps: dict[str, dict[str, list[str]]] = {}
+
+    def remove(self, output_path: str) -> None:
+        """Delete what an earlier run left of writing ``output_path``."""
+        folder, name = os.path.split(os.path.abspath(output_path))
+        temps = self._temps.get(folder)
+        if temps is None:
+            temps = self._temps[folder] = {}
+            try:
+                names = os.listdir(folder)
+            except OSError:
+                names = []
+            for temp in names:
+                match = _TEMP_SUFFIX.search(temp)
+                if match is not None:
+                    temps.setdefault(temp[:match.start()], []).append(temp)
+        for temp in temps.pop(name, ()):
+            temp_path = os.path.join(folder, temp)
+            try:
+                if os.path.getmtime(temp_path) < self._started:
+                    os.remove(temp_path)
+                    logger.info(f"Removed {temp_path} left by an interrupted run")
+            except OSError:
+                pass
+
+
+class Journal:
+    """Append-only record of the files an in-place run has converted.
+
+    Each converted file gets one JSON line, written once its output is in
+    place and before its original is removed. Starting the run again with
+    the same journal skips every listed file whose source is unchanged and
+    whose output still exists, and finishes removing originals that were
+    left behind. The journal is deleted when a run gets through all of its
+    files.
+
+    Args:
+        path: Journal file; created if missing.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._entries: dict[str, dict] = {}
+        data = b""
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            pass
+        for line in data.splitlines():
+            try:
+                entry = json.loads(line)
+                self._entries[entry["source"]] = entry
+            except (ValueError, KeyError, TypeError):
+                continue  # a line cut short when the run was killed
+        self._file = open(path, "a", encoding="utf-8")
+        if data and not data.endswith(b"\n"):
+            self._file.write("\n")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def finished_output(self, source: str) -> str | None:
+        """The output ``source`` was converted to, if that conversion still stands."""
+        entry = self._entries.get(os.path.abspath(source))
+        if entry is None:
+            return None
+        try:
+            st = os.stat(source)
+        except OSError:
+            return None
+        if (st.st_size, st.st_mtime_ns) != (entry["size"], entry["mtime_ns"]) or not os.path.exists(entry["output"]):
+            return None
+        return entry["output"]
+
+    def record(self, result: ConversionResult) -> None:
+        """Add a converted file; flushed so it survives the process being killed."""
+        if result.output is None:
+            return  # nothing was written
+        source = os.path.abspath(result.source)
+        try:
+            st = os.stat(source)
+        except OSError:
+            return
+        entry = {"source": source, "output": os.path.abspath(result.output),
+                 "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        self._entries[source] = entry
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def close(self, complete: bool = False) -> None:
+        """Close the journal; a ``complete`` run has nothing to resume, so it is deleted."""
+        self._file.close()
+        if complete:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+def _first_folder(raw_paths: list[str]) -> str | None:
+    for raw in raw_paths:
+        p = normalize_dnd_path(raw)
+        if os.path.isdir(p):
+            return resolve_directory_root(p)
+    return None
+
+
+def default_journal_path(raw_paths: list[str]) -> str | None:
+    """Journal location for an in-place run: inside the first folder given."""
+    folder = _first_folder(raw_paths)
+    return os.path.join(folder, JOURNAL_NAME) if folder is not None else None
+
+
+def user_cache_dir() -> str:
+    """This tool's folder in the per-user cache directory of the platform."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser(r"~\AppData\Local")
+        return os.path.join(base, "ImageConverter", "Cache")
+    if sys.platform == "darwin":
+        return os.path.expanduser("~/Library/Caches/ImageConverter")
+    return os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "imageconverter")
+
+
+def default_cache_path(out_dir: str | None) -> str:
+    """Cache location: the output folder, or for in-place runs :func:`user_cache_dir`.
+
+    In-place runs write next to the user's own images, so their cache is
+    kept out of those folders. Entries are keyed by absolute path, so one
+    cache serves every folder.
+    """
+    if out_dir is not None:
+        return os.path.join(out_dir, CACHE_NAME)
+    return os.path.join(user_cache_dir(), CACHE_NAME)
+
+
+def cache_params(target: str, max_size: int, reducing_gap: float | None) -> str:
+    """The part of a cache key that describes how a source was converted."""
+    return f"v{PIPELINE_VERSION}:{target}:{max_size}:{reducing_gap}"
+
+
+def _file_digest(path: str) -> bytes:
+    """BLAKE2 digest of a file's bytes, used by the cache and by :func:`find_duplicates`."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while block := f.read(_HASH_BLOCK):
+            h.update(block)
+    return h.digest()
+
+
+class ConversionCache:
+    """Persistent record of conversions, keyed by source content and settings.
+
+    Sources are identified by a BLAKE2 digest of their bytes; a file whose
+    path, size and mtime are unchanged since it was last hashed is not read
+    again. For each digest and set of settings (:func:`cache_params`) the
+    cache remembers the outputs it was converted to, with their size and
+    mtime so outputs changed or deleted since are not trusted.
+
+    :meth:`lookup` tells whether a source's output is already up to date or
+    can be copied from an identical image converted elsewhere; after
+    converting, :meth:`record` adds the result, and a file that failed or
+    was not converted after all is passed to :meth:`forget` instead, so the
+    digests kept between the two do not pile up. Changes are committed every
+    ``commit_every`` records and on :meth:`close`, so a crash only loses
+    the most recent entries, which are converted again next time.
+
+    ``hits``, ``copies`` and ``misses`` count lookups since opening.
+
+    Args:
+        path: SQLite database file; created if missing.
+        commit_every: Records between commits.
+    """
+
+    def __init__(self, path: str, commit_every: int = 100) -> None:
+        self.path = path
+        self.commit_every = commit_every
+        self.hits = 0
+        self.copies = 0
+        self.misses = 0
+        self._uncommitted = 0
+        self._digests: dict[str, bytes] = {}
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS sources (
+                path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest BLOB);
+            CREATE TABLE IF NOT EXISTS outputs (
+                digest BLOB, params TEXT, path TEXT, size INTEGER, mtime_ns INTEGER,
+                PRIMARY KEY (digest, params, path));
+            """
+        )
+
+    def digest(self, source: str) -> bytes:
+        """Content digest of ``source``, reusing the stored one if the file is unchanged."""
+        source = os.path.abspath(source)
+        st = os.stat(source)
+        row = self._db.execute("SELECT digest FROM sources WHERE path = ? AND size = ? AND mtime_ns = ?",
+                               (source, st.st_size, st.st_mtime_ns)).fetchone()
+        if row is not None:
+            return row[0]
+        digest = _file_digest(source)
+        self._db.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)",
+                         (source, st.st_size, st.st_mtime_ns, digest))
+        self._changed()
+        return digest
+
+    def lookup(self, source: str, output: str, params: str) -> tuple[str, str] | None:
+        """Check for an earlier conversion of ``source`` with ``params``.
+
+        Returns:
+            ``("unchanged", output)`` if ``output`` already holds it,
+            ``("copy", path)`` if an identical image was converted to
+            ``path``, or None if it has to be converted.
+        """
+        digest = self.digest(source)
+        self._digests[os.path.abspath(source)] = digest
+        output = os.path.abspath(output)
+        copy_from = None
+        rows = self._db.execute("SELECT path, size, mtime_ns FROM outputs WHERE digest = ? AND params = ?",
+                                (digest, params)).fetchall()
+        for path, size, mtime_ns in rows:
+            try:
+                st = os.stat(path)
+                current = (st.st_size, st.st_mtime_ns) == (size, mtime_ns)
+            except OSError:
+                current = False
+            if not current:
+                # Overwritten or deleted since it was recorded
+                self._db.execute("DELETE FROM outputs WHERE digest = ? AND params = ? AND path = ?",
+                                 (digest, params, path))
+                self._changed()
+            elif path == output:
+                self.hits += 1
+                return ("unchanged", path)
+            elif copy_from is None:
+                copy_from = path
+        if copy_from is not None:
+            self.copies += 1
+            return ("copy", copy_from)
+        self.misses += 1
+        return None
+
+    def record(self, source: str, output: str, params: str) -> None:
+        """Remember that ``source`` (as hashed by the last lookup) was converted to ``output``."""
+        digest = self._digests.pop(os.path.abspath(source), None)
+        if digest is None:
+            return
+        output = os.path.abspath(output)
+        try:
+            st = os.stat(output)
+        except OSError:
+            return
+        self._db.execute("INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?)",
+                         (digest, params, output, st.st_size, st.st_mtime_ns))
+        self._changed()
+
+    def forget(self, source: str) -> None:
+        """Drop the digest the last lookup of ``source`` kept for :meth:`record`."""
+        self._digests.pop(os.path.abspath(source), None)
+
+    def _changed(self) -> None:
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self._db.commit()
+            self._uncommitted = 0
+
+    def close(self) -> None:
+        """Commit outstanding changes and close the database."""
+        self._db.commit()
+        self._db.close()
+
+
+def dhash(path: str) -> tuple[int, int, int]:
+    """Difference hash of an image: ``(width, height, 64-bit hash)``.
+
+    The image is shrunk to 9x8 grey pixels (JPEGs are decoded at 1/8 scale
+    for this) and each bit says whether a pixel is brighter than its right
+    neighbour. Re-saved or re-compressed copies of an image hash the same
+    or within a bit or two.
+    """
+    with Image.open(path) as img:
+        width, height = img.size
+        img.draft("L", (64, 64))
+        pixels = img.convert("L").resize((9, 8), Image.Resampling.BOX, reducing_gap=2.0).tobytes()
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return width, height, bits
+
+
+def unique_paths(file_paths: Iterable[str]) -> list[str]:
+    """Return ``file_paths`` without repeats, keeping the first spelling of each.
+
+    Paths are compared by their absolute, case-normalized form, so ``a.png``
+    and ``./a.png`` are the same file.
+    """
+    seen: set[str] = set()
+    unique = []
+    for path in file_paths:
+        key = os.path.normcase(os.path.abspath(path))
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique
+
+
+def find_duplicates(
+    file_paths: list[str],
+    perceptual: bool = False,
+    max_distance: int = PERCEPTUAL_MAX_DISTANCE,
+    threads: int = 8,
+) -> dict[str, str]:
+    """Find files in ``file_paths`` that duplicate an earlier one.
+
+    Only files that share their size with another are read, and those are
+    compared by a BLAKE2 digest of their bytes. With ``perceptual`` the
+    remaining images are also compared by :func:`dhash`: images of the same
+    dimensions whose hashes differ in at most ``max_distance`` bits count
+    as the same picture (e.g. a JPEG saved twice). That catches near copies
+    but can also merge images that differ only in small details, so it is
+    opt-in.
+
+    A path listed more than once (see :func:`unique_paths`) is one file, not
+    a duplicate of itself.
+
+    Returns:
+        Mapping of each duplicate to the first file (in input order) it
+        duplicates. Files that cannot be read are left out.
+    """
+    if not 0 <= max_distance <= 3:
+        raise ValueError(f"max_distance must be between 0 and 3, got {max_distance}")
+    file_paths = unique_paths(file_paths)
+    by_size: dict[int, list[str]] = {}
+    for path in file_paths:
+        try:
+            by_size.setdefault(os.path.getsize(path), []).append(path)
+        except OSError:
+            continue
+    candidates = [path for group in by_size.values() if len(group) > 1 for path in group]
+
+    def safe(func, path):
+        try:
+            return func(path)
+        except Exception:
+            return None
+
+    duplicate_of: dict[str, str] = {}
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        first_with: dict[bytes, str] = {}
+        digests = dict(zip(candidates, pool.map(lambda p: safe(_file_digest, p), candidates)))
+        for path in file_paths:
+            digest = digests.get(path)
+            if digest is None:
+                continue
+            if digest in first_with:
+                duplicate_of[path] = first_with[digest]
+            else:
+                first_with[digest] = path
+
+        if perceptual:
+            # Two 64-bit hashes within 3 bits of each other agree exactly on at
+            # least one of their four 16-bit blocks, so only images sharing a
+            # block (and dimensions) need comparing
+            index: dict[tuple, list[tuple[int, str]]] = {}
+            remaining = [path for path in file_paths if path not in duplicate_of]
+            for path, hashed in zip(remaining, pool.map(lambda p: safe(dhash, p), remaining)):
+                if hashed is None:
+                    continue
+                width, height, bits = hashed
+                keys = [(width, height, i, (bits >> (16 * i)) & 0xFFFF) for i in range(4)]
+                match = next((first for key in keys for other, first in index.get(key, ())
+                              if bin(other ^ bits).count("1") <= max_distance), None)
+                if match is not None:
+                    duplicate_of[path] = match
+                    continue
+                for key in keys:
+                    index.setdefault(key, []).append((bits, path))
+    return duplicate_of
+
+
+def link_output(existing: str, output_path: str) -> str:
+    """Make ``output_path`` a hard link to ``existing`` (a copy if linking fails).
+
+    The link or copy is made under a temporary name and renamed into place.
+    Returns ``"linked"`` or ``"copied"``.
+    """
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        os.link(existing, tmp_path)
+        how = "linked"
+    except OSError:
+        # Different file system, or links unsupported
+        shutil.copyfile(existing, tmp_path)
+        how = "copied"
+    try:
+        os.replace(tmp_path, output_path)
+    except OSError:
+        os.remove(tmp_path)
+        raise
+    return how
+
+
+def _skip_reason(file_path: str, target: str) -> str | None:
+    ext = os.path.splitext(file_path)[1].lower()
+    if target == "webp" and ext == ".webp":
+        return "already WebP"
+    if ext not in INPUT_EXTENSIONS[target]:
+        return "unsupported image format"
+    return None
+
+
+def _log(result: ConversionResult) -> None:
+    if result.status == "converted":
+        logger.info(result.message)
+    elif result.status == "skipped" and "unsupported" not in result.message:
+        logger.info(result.message)
+    elif result.status == "skipped":
+        logger.warning(result.message)
+    else:
+        logger.error(result.message)
+
+
+def _remove_original(result: ConversionResult) -> None:
+    try:
+        os.remove(result.source)
+        logger.info(f"Removed original after successful convert: {result.source}")
+    except OSError as exc:
+        logger.error(f"Converted but could not remove original {result.source}: {exc}")
+
+
+def iter_conversions(
+    file_paths: Iterable[str],
+    out_dir: str | None,
+    target: str = "webp",
+    jobs: int = 1,
+    remove_originals: bool = False,
+    max_size: int = MAX_SIZE,
+    reducing_gap: float | None = REDUCING_GAP,
+    journal: str | None = None,
+    cache: str | None = None,
+    dedupe: str = "off",
+    executor: ProcessPoolExecutor | None = None,
+    cancel_event=None,
+    resume_event=None,
+) -> Iterator[ConversionResult]:
+    """Convert files and yield a result for each one as it finishes.
+
+    Args:
+        file_paths: Images to convert.
+        out_dir: Output directory, or None to write next to each source.
+        target: "webp" or "svg".
+        jobs: Worker processes; 1 converts in this process, 0 uses one per core.
+        remove_originals: Delete each source after it converted successfully.
+        max_size: Largest width or height of the converted images.
+        reducing_gap: See :func:`load_image`.
+        journal: :class:`Journal` file to resume from and record into; it
+            is deleted once every file has been processed.
+        cache: :class:`ConversionCache` file; files converted before with
+            the same settings are skipped, or copied from an identical
+            image's output, instead of being converted again.
+        dedupe: One of DEDUPE_MODES. Duplicates found by
+            :func:`find_duplicates` wait for the file they duplicate and get
+            its output hard-linked; this reads the whole file list first and
+            drops paths listed more than once. A perceptual match is not the
+            same image, so ``"perceptual"`` cannot be combined with
+            ``remove_originals`` or an in-place run (``out_dir`` None):
+            the near copy would be replaced by another image's output.
+        executor: Process pool to reuse instead of starting one for this call.
+        cancel_event: threading.Event; once set, no new conversions start.
+        resume_event: threading.Event; while cleared, no new conversions start.
+
+    Results are also logged. With several jobs they arrive in completion
+    order. Files a journal lists as done, and files whose output is up to
+    date by the cache, come back as skipped with their ``output`` set.
+    """
+    if target not in TARGETS:
+        raise ValueError(f"unknown target {target!r} (expected one of {', '.join(TARGETS)})")
+    if max_size < 1:
+        raise ValueError(f"max_size must be at least 1, got {max_size}")
+    if reducing_gap is not None and reducing_gap < 1.0:
+        raise ValueError(f"reducing_gap must be at least 1.0 or None, got {reducing_gap}")
+    if dedupe not in DEDUPE_MODES:
+        raise ValueError(f"unknown dedupe mode {dedupe!r} (expected one of {', '.join(DEDUPE_MODES)})")
+    if dedupe == "perceptual" and (remove_originals or out_dir is None):
+        raise ValueError("perceptual dedupe needs an output directory and keeps the originals")
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+    done = Journal(journal) if journal is not None else None
+    if done is not None and len(done):
+        logger.info(f"Resuming from {journal} ({len(done)} files already converted)")
+    known = ConversionCache(cache) if cache is not None else None
+    duplicate_of: dict[str, str] = {}
+    if dedupe != "off":
+        file_paths = unique_paths(file_paths)
+        duplicate_of = find_duplicates(file_paths, perceptual=dedupe == "perceptual",
+                                       threads=min(8, 2 * (os.cpu_count() or 1)))
+        logger.info(f"Found {len(duplicate_of)} duplicates among {len(file_paths)} files")
+        # Every duplicate comes after the file it duplicates
+        file_paths = ([path for path in file_paths if path not in duplicate_of]
+                      + [path for path in file_paths if path in duplicate_of])
+    complete = False
+    try:
+        yield from _run_conversions(file_paths, out_dir, target, jobs, remove_originals, max_size,
+                                    reducing_gap, done, known, duplicate_of, executor, cancel_event,
+                                    resume_event)
+        complete = cancel_event is None or not cancel_event.is_set()
+    finally:
+        if done is not None:
+            done.close(complete)
+        if known is not None:
+            known.close()
+            logger.info(f"Conversion cache: {known.hits} up to date, {known.copies} copied, "
+                        f"{known.misses} converted")
+
+
+# Returned for a duplicate that has to wait for its file to be converted
+_WAITING = ConversionResult("", None, "waiting", "")
+
+
+def _run_conversions(
+    file_paths: Iterable[str],
+    out_dir: str | None,
+    target: str,
+    jobs: int,
+    remove_originals: bool,
+    max_size: int,
+    reducing_gap: float | None,
+    journal: Journal | None,
+    cache: ConversionCache | None,
+    duplicate_of: dict[str, str],
+    executor: ProcessPoolExecutor | None,
+    cancel_event,
+    resume_event,
+) -> Iterator[ConversionResult]:
+    # Outputs are synced to disk before the originals they replace are deleted
+    sync = remove_originals
+    params = cache_params(target, max_size, reducing_gap)
+    # Output of each finished file that has duplicates (None if it failed),
+    # duplicates waiting for their file to finish, the queue of duplicates
+    # whose file has finished, and those among them to convert after all
+    # because their file failed
+    firsts = set(duplicate_of.values())
+    outputs: dict[str, str | None] = {}
+    waiting: dict[str, list[str]] = {}
+    retry: deque[str] = deque()
+    retry_set: set[str] = set()
+    stale_temps = StaleTemps()
+
+    def link_duplicate(file_path: str, first: str, existing: str) -> ConversionResult:
+        output_path = output_path_for(file_path, out_dir, target)
+        original_kb = os.path.getsize(file_path) / 1024
+        if os.path.abspath(output_path) == os.path.abspath(existing):
+            return ConversionResult(file_path, output_path, "skipped",
+                                    f"Skipped {file_path} (a duplicate of {first}, same output)")
+        if os.path.exists(output_path) and os.path.samefile(output_path, existing):
+            return ConversionResult(file_path, output_path, "skipped",
+                                    f"Skipped {file_path} ({output_path} is already linked to {existing})")
+        try:
+            how = link_output(existing, output_path)
+        except OSError as e:
+            return ConversionResult(file_path, None, "failed", f"Failed to convert {file_path}: {str(e)}")
+        output_kb = os.path.getsize(output_path) / 1024
+        return ConversionResult(file_path, output_path, "converted",
+                                f"Successfully converted {file_path} to {output_path} "
+                                f"({how} from {existing}, a duplicate of {first}, "
+                                f"original={original_kb:.1f}KB, output={output_kb:.1f}KB)",
+                                original_kb, output_kb)
+
+    def copy_cached(file_path: str, copy_from: str, output_path: str) -> ConversionResult:
+        try:
+            with atomic_output(output_path, sync) as f, open(copy_from, "rb") as src:
+                shutil.copyfileobj(src, f)
+        except OSError as e:
+            return ConversionResult(file_path, None, "failed", f"Failed to convert {file_path}: {str(e)}")
+        original_kb = os.path.getsize(file_path) / 1024
+        output_kb = os.path.getsize(output_path) / 1024
+        return ConversionResult(file_path, output_path, "converted",
+                                f"Successfully converted {file_path} to {output_path} "
+                                f"(copied from {copy_from}, an identical image converted before, "
+                                f"original={original_kb:.1f}KB, output={output_kb:.1f}KB)",
+                                original_kb, output_kb)
+
+    def check(file_path: str) -> ConversionResult | None:
+        """A result for files that need no conversion, else None.
+
+        Duplicates of a file still being converted are set aside and give
+        the placeholder result ``_WAITING``.
+        """
+        reason = _skip_reason(file_path, target)
+        if reason:
+            return ConversionResult(file_path, None, "skipped", f"Skipped {file_path} ({reason})")
+        stale_temps.remove(output_path_for(file_path, out_dir, target))
+        first = duplicate_of.get(file_path)
+        if first is not None and file_path not in retry_set:
+            if first not in outputs:
+                waiting.setdefault(first, []).append(file_path)
+                return _WAITING
+            existing = outputs[first]
+            if existing is not None:
+                return link_duplicate(file_path, first, existing)
+        output = journal.finished_output(file_path) if journal is not None else None
+        if output is not None:
+            return ConversionResult(file_path, output, "skipped",
+                                    f"Skipped {file_path} (converted to {output} before the run was interrupted)")
+        if cache is not None:
+            output_path = output_path_for(file_path, out_dir, target)
+            try:
+                hit = cache.lookup(file_path, output_path, params)
+            except OSError as e:
+                return ConversionResult(file_path, None, "failed", f"Failed to convert {file_path}: {str(e)}")
+            if hit is not None and hit[0] == "unchanged":
+                return ConversionResult(file_path, output_path, "skipped",
+                                        f"Skipped {file_path} ({output_path} is up to date)")
+            if hit is not None:
+                return copy_cached(file_path, hit[1], output_path)
+        return None
+
+    def finish(result: ConversionResult) -> ConversionResult:
+        if result.source in firsts:
+            outputs[result.source] = result.output
+        for dup in waiting.pop(result.source, ()):
+            retry.append(dup)
+            if result.output is None:
+                retry_set.add(dup)  # convert it after all
+        _log(result)
+        if cache is not None:
+            if result.status == "converted" and result.output is not None:
+                cache.record(result.source, result.output, params)
+            else:
+                cache.forget(result.source)
+        if result.status == "converted" and journal is not None:
+            journal.record(result)
+        if remove_originals and result.output is not None:
+            _remove_original(result)
+        return result
+
+    def stopped() -> bool:
+        if resume_event is not None:
+            resume_event.wait()
+        return cancel_event is not None and cancel_event.is_set()
+
+    paths = iter(file_paths)
+
+    def next_path() -> str | None:
+        return retry.popleft() if retry else next(paths, None)
+
+    if jobs == 1 and executor is None:
+        # Files come in order here, so a duplicate's file has always finished
+        while (file_path := next_path()) is not None:
+            if stopped():
+                return
+            skipped = check(file_path)
+            if skipped is _WAITING:
+                continue
+            yield finish(skipped or convert_file(file_path, out_dir, target, max_size, reducing_gap, sync))
+        return
+
+    workers = jobs or os.cpu_count() or 1
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    # Only a few conversions per worker are queued at a time, so pause and
+    # cancel take effect without waiting for the whole batch
+    max_in_flight = 2 * workers
+    pending = {}
+    exhausted = False
+    try:
+        while True:
+            while ((retry or not exhausted) and len(pending) < max_in_flight
+                   and (resume_event is None or resume_event.is_set())
+                   and not (cancel_event is not None and cancel_event.is_set())):
+                file_path = next_path()
+                if file_path is None:
+                    exhausted = True
+                    break
+                skipped = check(file_path)
+                if skipped is _WAITING:
+                    continue
+                if skipped:
+                    yield finish(skipped)
+                    continue
+                pending[executor.submit(convert_file, file_path, out_dir, target, max_size, reducing_gap,
+                                        sync)] = file_path
+
+            if cancel_event is not None and cancel_event.is_set():
+                # Drop conversions that have not started yet; running ones finish
+                for future in [f for f in pending if f.cancel()]:
+                    if cache is not None:
+                        cache.forget(pending[future])
+                    del pending[future]
+            if not pending:
+                if (exhausted and not retry) or (cancel_event is not None and cancel_event.is_set()):
+                    break
+                if resume_event is not None:
+                    resume_event.wait(0.1)  # paused with nothing in flight
+                continue
+
+            finished, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in finished:
+                file_path = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:  # worker process died
+                    result = ConversionResult(file_path, None, "failed", f"Failed to convert {file_path}: {str(e)}")
+                yield finish(result)
+    finally:
+        if own_executor:
+            executor.shutdown(cancel_futures=True)
@@ -1,46 +1,31 @@
-import base64
-import io
+import itertools
+import multiprocessing
 import os
+import queue
 import shutil
 import subprocess
 import sys
-import time
+import threading
 import tkinter as tk
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from tkinter import filedialog
-from urllib.parse import unquote, urlparse
-from PIL import Image
 import logging
 from pathlib import Path
 import tkinterdnd2 as tkdnd
-import math
-
-# Set up the main application window
-root = tkdnd.TkinterDnD.Tk()
-root.title("SVG Converter")
-root.configure(bg="#2B2B2B")  # Dark gray background
-
-# Set window size and position near the top-right corner
-window_width = 720
-window_height = 320
-offset = 400
-screen_width = root.winfo_screenwidth()
-screen_height = root.winfo_screenheight()
-x_position = screen_width - window_width - offset
-y_position = offset
-root.geometry(f"{window_width}x{window_height}+{x_position}+{y_position}")
-
-# Get the Downloads folder path
-downloads_path = str(Path.home() / "Downloads")
-output_folder = os.path.join(downloads_path, "Converted_Images")
-os.makedirs(output_folder, exist_ok=True)
-
-# Set up logging
-log_file = os.path.join(output_folder, "log.txt")
-logging.basicConfig(filename=log_file, level=logging.INFO,
-                    format="%(asctime)s - %(levelname)s - %(message)s")
-logger = logging.getLogger()
 
-SUPPORTED_EXTENSIONS = frozenset({".png", ".jpg", ".jpeg", ".webp"})
+# The conversion itself lives in pipeline.py (also used headless through
+# `python -m ImageConverter convert`); this file is only the window.
+from pipeline import (
+    batch_includes_folder,
+    default_cache_path,
+    default_journal_path,
+    iter_conversions,
+    iter_image_paths,
+    normalize_dnd_path,
+    resolve_directory_root,
+)
+
+logger = logging.getLogger()
 
 # Track conversion stats
 total_files = 0
@@ -48,6 +33,26 @@ successful_conversions = 0
 total_original_kb = 0.0
 total_output_kb = 0.0
 
+# Worker pool for conversions, started on first use and sized to the core count
+executor = None
+
+# The batch loop runs on this background thread so the Tk loop never blocks;
+# it reports to the window through progress_queue, polled with root.after.
+batch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch")
+batch_future = None
+progress_queue = queue.Queue()
+cancel_event = threading.Event()
+resume_event = threading.Event()  # cleared while paused
+resume_event.set()
+POLL_MS = 100
+
+
+def get_executor():
+    global executor
+    if executor is None:
+        executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+    return executor
+
 
 def pick_root_folder() -> tuple[str, str]:
     """Pick a directory to use as conversion root. Returns (path or \"\", source).
@@ -105,181 +110,59 @@ def pick_root_folder() -> tuple[str, str]:
     return (tk_path, "tk")
 
 
-def normalize_dnd_path(raw: str) -> str:
-    p = raw.strip()
-    if len(p) >= 2 and p[0] == "{" and p[-1] == "}":
-        p = p[1:-1]
-    if p.startswith("file:"):
-        parsed = urlparse(p)
-        p = unquote(parsed.path)
-        if os.name == "nt" and len(p) >= 3 and p[0] == "/" and p[2] == ":":
-            p = p[1:]
-    p = os.path.normpath(p)
-    if not os.path.isabs(p) and os.path.exists(p):
-        p = os.path.abspath(p)
-    return p
-
-
-def resolve_directory_root(p: str) -> str:
-    """Absolute, canonical directory to use as os.walk root (the chosen folder itself)."""
-    if not os.path.isdir(p):
-        return p
-    return str(Path(p).resolve())
-
-
-def batch_includes_folder(raw_paths: list[str]) -> bool:
-    """True if any dropped/selected path is a directory (triggers in-place + delete originals)."""
-    for raw in raw_paths:
-        p = normalize_dnd_path(raw)
-        if os.path.isdir(p):
-            return True
-    return False
-
-
-def collect_image_paths(raw_paths: list[str]) -> list[str]:
-    """Expand files and directories; recursively collect supported images (sorted)."""
-    collected: list[str] = []
-    for raw in raw_paths:
-        p = normalize_dnd_path(raw)
-        if not os.path.exists(p):
-            logger.warning(f"Skipped missing path: {raw}")
-            continue
-        if os.path.isfile(p):
-            ext = os.path.splitext(p)[1].lower()
-            if ext in SUPPORTED_EXTENSIONS:
-                collected.append(p)
-            else:
-                logger.warning(f"Skipped file {p} (unsupported image format)")
-        elif os.path.isdir(p):
-            root_dir = resolve_directory_root(p)
-            for walk_root, _dirs, files in os.walk(root_dir):
-                for name in files:
-                    ext = os.path.splitext(name)[1].lower()
-                    if ext in SUPPORTED_EXTENSIONS:
-                        collected.append(os.path.join(walk_root, name))
-        else:
-            logger.warning(f"Skipped path {p} (not a file or directory)")
-    return sorted(collected)
-
-def calculate_entropy(img):
-    """Calculate image entropy to determine complexity for adaptive compression."""
-    histogram = img.histogram()
-    histogram_length = sum(histogram)
-    if histogram_length == 0:
-        return 0
-    probabilities = [float(h) / histogram_length for h in histogram if h != 0]
-    return -sum(p * math.log2(p) for p in probabilities)
-
-def build_svg_with_webp_embed(width: int, height: int, webp_b64: str) -> str:
-    data_uri = f"data:image/webp;base64,{webp_b64}"
-    return (
-        '<?xml version="1.0" encoding="UTF-8"?>\n'
-        f'<svg xmlns="http://www.w3.org/2000/svg" '
-        f'width="{width}" height="{height}" viewBox="0 0 {width} {height}">\n'
-        f'  <image width="{width}" height="{height}" href="{data_uri}"/>\n'
-        "</svg>\n"
-    )
-
-def process_images(raw_paths: list[str]) -> None:
+def process_images(raw_paths: list[str], dedupe: bool = False) -> None:
+    """Convert a batch; runs on the background batch thread."""
     global total_files, successful_conversions, total_original_kb, total_output_kb
     use_downloads = not batch_includes_folder(raw_paths)
-    file_paths = collect_image_paths(raw_paths)
-    if not file_paths:
-        status_label.config(text="No supported images found.")
+    # Images are converted as the folders are searched, so the total is only
+    # known once the search has finished
+    file_paths = iter_image_paths(raw_paths)
+    first = next(file_paths, None)
+    if first is None:
+        progress_queue.put(("done", "No supported images found."))
         logger.info("No supported images in selection.")
         return
 
-    total_files = len(file_paths)
+    total_files = 0
+    searching = True
+
+    def found():
+        global total_files
+        nonlocal searching
+        for path in itertools.chain([first], file_paths):
+            total_files += 1
+            yield path
+        searching = False
+
     successful_conversions = 0
     total_original_kb = 0.0
     total_output_kb = 0.0
 
     # Initialize status label
     mode_hint = "Downloads" if use_downloads else "In-place (originals removed after OK)"
-    status_label.config(text=f"Preparing…\n({mode_hint})")
-    root.update_idletasks()
-
-    for i, file_path in enumerate(file_paths, 1):
-        file_ext = os.path.splitext(file_path)[1].lower()
-
-        try:
-            # Open image and get original size
-            original_size_kb = os.path.getsize(file_path) / 1024
-            img = Image.open(file_path)
-
-            # Optimize PNG inputs in memory
-            if file_ext == ".png":
-                buf = io.BytesIO()
-                img.save(buf, format="PNG", optimize=True)
-                buf.seek(0)
-                img = Image.open(buf)
-
-            # Convert to RGB if necessary
-            if img.mode in ("RGBA", "LA"):
-                img = img.convert("RGB")
-
-            # Resize to max 1000px
-            max_dimensions = (1000, 1000)
-            img.thumbnail(max_dimensions, Image.Resampling.LANCZOS)
-
-            w, h = img.size
-
-            # Determine compression settings based on entropy
-            entropy = calculate_entropy(img)
-            if entropy < 4.0:  # Low complexity (e.g., text, logos)
-                quality = 60
-                lossless = True
-            else:  # High complexity (e.g., photos)
-                quality = 75
-                lossless = False
-
-            save_params = {
-                "format": "WEBP",
-                "quality": quality if not lossless else 100,
-                "lossless": lossless,
-                "method": 6,  # Maximum compression effort
-                "exif": b"",  # Strip EXIF metadata
-                "icc_profile": None  # Strip ICC profile
-            }
-            webp_buf = io.BytesIO()
-            img.save(webp_buf, **save_params)
-            webp_bytes = webp_buf.getvalue()
-            webp_b64 = base64.b64encode(webp_bytes).decode("ascii")
-
-            svg_body = build_svg_with_webp_embed(w, h, webp_b64)
-            output_filename = os.path.splitext(os.path.basename(file_path))[0] + ".svg"
-            if use_downloads:
-                output_path = os.path.join(output_folder, output_filename)
-            else:
-                output_path = os.path.join(os.path.dirname(file_path), output_filename)
-
-            with open(output_path, "w", encoding="utf-8") as f:
-                f.write(svg_body)
-
-            output_size_kb = os.path.getsize(output_path) / 1024
-            total_original_kb += original_size_kb
-            total_output_kb += output_size_kb
-
-            logger.info(
-                f"Successfully converted {file_path} to {output_path} "
-                f"(quality={quality}, lossless={lossless}, webp_embed={len(webp_bytes) / 1024:.1f}KB, "
-                f"original={original_size_kb:.1f}KB, output_svg={output_size_kb:.1f}KB)")
+    progress_queue.put(("progress", f"Preparing…\n({mode_hint})"))
+
+    done = 0
+    results = iter_conversions(found(), output_folder if use_downloads else None, target="svg",
+                               remove_originals=not use_downloads,
+                               journal=None if use_downloads else default_journal_path(raw_paths),
+                               cache=default_cache_path(output_folder if use_downloads else None),
+                               dedupe="exact" if dedupe else "off", executor=get_executor(),
+                               cancel_event=cancel_event, resume_event=resume_event)
+    for result in results:
+        if result.status == "converted":
+            successful_conversions += 1
+            total_original_kb += result.original_kb
+            total_output_kb += result.output_kb
+        elif result.output is not None:  # already converted, output up to date
             successful_conversions += 1
-
-            if not use_downloads:
-                try:
-                    os.remove(file_path)
-                    logger.info(f"Removed original after successful convert: {file_path}")
-                except OSError as exc:
-                    logger.error(f"Converted but could not remove original {file_path}: {exc}")
-
-        except Exception as e:
-            logger.error(f"Failed to convert {file_path}: {str(e)}")
 
         # Update status label with counter
-        status_label.config(text=f"Processing:\n{i}/{total_files} {'image' if total_files == 1 else 'images'}")
-        root.update_idletasks()
-        time.sleep(0.01)  # Slight delay for visible updates
+        done += 1
+        if searching:
+            progress_queue.put(("progress", f"Processing:\n{done}/{total_files}+ images (still searching…)"))
+        else:
+            progress_queue.put(("progress", f"Processing:\n{done}/{total_files} {'image' if total_files == 1 else 'images'}"))
 
     # Show final status
     where = f"→ {output_folder}" if use_downloads else "(in-place)"
@@ -287,8 +170,68 @@ def process_images(raw_paths: list[str]) -> None:
         f"Success: {successful_conversions}/{total_files} {where}\n"
         f"Original: {total_original_kb:.1f} KB → Output: {total_output_kb:.1f} KB"
     )
-    status_label.config(text=status_text)
+    if cancel_event.is_set():
+        status_text = f"Cancelled after {done}/{total_files}\n" + status_text
     logger.info(status_text)
+    progress_queue.put(("done", status_text))
+
+
+def run_batch(raw_paths: list[str], dedupe: bool) -> None:
+    try:
+        process_images(raw_paths, dedupe)
+    except Exception as e:
+        logger.error(f"Batch failed: {str(e)}")
+        progress_queue.put(("done", f"Batch failed: {str(e)}"))
+
+
+def start_batch(raw_paths: list[str]) -> None:
+    global batch_future
+    if batch_future is not None and not batch_future.done():
+        status_label.config(text="Busy: cancel or wait for the current batch")
+        return
+    cancel_event.clear()
+    resume_event.set()
+    set_busy(True)
+    # Tk variables are read here, on the Tk thread
+    batch_future = batch_executor.submit(run_batch, list(raw_paths), dedupe_var.get())
+
+
+def poll_progress() -> None:
+    # Only the latest message matters; drain everything queued since last poll
+    try:
+        while True:
+            kind, text = progress_queue.get_nowait()
+            if resume_event.is_set() or kind == "done":
+                status_label.config(text=text)
+            if kind == "done":
+                set_busy(False)
+    except queue.Empty:
+        pass
+    root.after(POLL_MS, poll_progress)
+
+
+def set_busy(busy: bool) -> None:
+    state = tk.NORMAL if busy else tk.DISABLED
+    pause_button.config(state=state, text="Pause")
+    cancel_button.config(state=state)
+    for button in (select_button, folder_button, dedupe_check):
+        button.config(state=tk.DISABLED if busy else tk.NORMAL)
+
+
+def toggle_pause() -> None:
+    if resume_event.is_set():
+        resume_event.clear()
+        pause_button.config(text="Resume")
+        status_label.config(text="Paused")
+    else:
+        resume_event.set()
+        pause_button.config(text="Pause")
+
+
+def cancel_batch() -> None:
+    cancel_event.set()
+    resume_event.set()  # a paused batch has to wake up to stop
+    status_label.config(text="Cancelling…")
 
 def select_files():
     files = filedialog.askopenfilenames(
@@ -296,7 +239,7 @@ def select_files():
         filetypes=[("Image files", "*.png *.jpg *.jpeg *.webp")]
     )
     if files:
-        process_images(list(files))
+        start_batch(list(files))
 
 
 def select_folder():
@@ -304,45 +247,97 @@ def select_folder():
     if not folder:
         return
     folder = resolve_directory_root(normalize_dnd_path(folder))
-    process_images([folder])
+    start_batch([folder])
 
 
 def drop(event):
     file_paths = list(root.tk.splitlist(event.data))
-    process_images(file_paths)
-
-# UI Elements
-frame = tk.Frame(root, bg="#2B2B2B")
-frame.pack(pady=20)
-
-instruction_label = tk.Label(
-    frame,
-    text=(
-        "drop image files only → svg in Downloads/Converted_Images\n"
-        "drop a folder (or Select folder) → svg in place; "
-        "original removed if OK (failed files kept)\n"
-        "png, jpg, webp (WebP inside svg)"
-    ),
-    bg="#2B2B2B", fg="#FFFFFF", font=("Arial", 10),
-    justify=tk.CENTER,
-)
-instruction_label.pack(pady=10)
-
-btn_row = tk.Frame(frame, bg="#2B2B2B")
-btn_row.pack(pady=5)
-select_button = tk.Button(btn_row, text="Select images", command=select_files,
-                          bg="#3C3F41", fg="#FFFFFF", font=("Arial", 10), activebackground="#4B4B4B")
-select_button.pack(side=tk.LEFT, padx=4)
-folder_button = tk.Button(btn_row, text="Select folder", command=select_folder,
-                          bg="#3C3F41", fg="#FFFFFF", font=("Arial", 10), activebackground="#4B4B4B")
-folder_button.pack(side=tk.LEFT, padx=4)
-
-status_label = tk.Label(frame, text="", bg="#2B2B2B", fg="#FFFFFF", font=("Arial", 10))
-status_label.pack(pady=10)
-
-# Enable drag-and-drop
-root.drop_target_register(tkdnd.DND_FILES)
-root.dnd_bind('<<Drop>>', drop)
-
-# Start the application
-root.mainloop()
+    start_batch(file_paths)
+
+
+# Conversions run in worker processes, which import this file again; the
+# window is only built in the main process.
+if __name__ == "__main__":
+    # Needed for worker processes in a frozen (pyinstaller) build
+    multiprocessing.freeze_support()
+
+    # Set up the main application window
+    root = tkdnd.TkinterDnD.Tk()
+    root.title("SVG Converter")
+    root.configure(bg="#2B2B2B")  # Dark gray background
+
+    # Set window size and position near the top-right corner
+    window_width = 720
+    window_height = 360
+    offset = 400
+    screen_width = root.winfo_screenwidth()
+    screen_height = root.winfo_screenheight()
+    x_position = screen_width - window_width - offset
+    y_position = offset
+    root.geometry(f"{window_width}x{window_height}+{x_position}+{y_position}")
+
+    # Get the Downloads folder path
+    downloads_path = str(Path.home() / "Downloads")
+    output_folder = os.path.join(downloads_path, "Converted_Images")
+    os.makedirs(output_folder, exist_ok=True)
+
+    # Set up logging
+    log_file = os.path.join(output_folder, "log.txt")
+    logging.basicConfig(filename=log_file, level=logging.INFO,
+                        format="%(asctime)s - %(levelname)s - %(message)s")
+
+    # UI Elements
+    frame = tk.Frame(root, bg="#2B2B2B")
+    frame.pack(pady=20)
+
+    instruction_label = tk.Label(
+        frame,
+        text=(
+            "drop image files only → svg in Downloads/Converted_Images\n"
+            "drop a folder (or Select folder) → svg in place; "
+            "original removed if OK (failed files kept)\n"
+            "png, jpg, webp (WebP inside svg)"
+        ),
+        bg="#2B2B2B", fg="#FFFFFF", font=("Arial", 10),
+        justify=tk.CENTER,
+    )
+    instruction_label.pack(pady=10)
+
+    btn_row = tk.Frame(frame, bg="#2B2B2B")
+    btn_row.pack(pady=5)
+    select_button = tk.Button(btn_row, text="Select images", command=select_files,
+                              bg="#3C3F41", fg="#FFFFFF", font=("Arial", 10), activebackground="#4B4B4B")
+    select_button.pack(side=tk.LEFT, padx=4)
+    folder_button = tk.Button(btn_row, text="Select folder", command=select_folder,
+                              bg="#3C3F41", fg="#FFFFFF", font=("Arial", 10), activebackground="#4B4B4B")
+    folder_button.pack(side=tk.LEFT, padx=4)
+    pause_button = tk.Button(btn_row, text="Pause", command=toggle_pause, state=tk.DISABLED,
+                             bg="#3C3F41", fg="#FFFFFF", font=("Arial", 10), activebackground="#4B4B4B")
+    pause_button.pack(side=tk.LEFT, padx=4)
+    cancel_button = tk.Button(btn_row, text="Cancel", command=cancel_batch, state=tk.DISABLED,
+                              bg="#3C3F41", fg="#FFFFFF", font=("Arial", 10), activebackground="#4B4B4B")
+    cancel_button.pack(side=tk.LEFT, padx=4)
+
+    dedupe_var = tk.BooleanVar(value=False)
+    dedupe_check = tk.Checkbutton(frame, text="Convert identical copies once (hard-link the rest)",
+                                  variable=dedupe_var, bg="#2B2B2B", fg="#FFFFFF", selectcolor="#3C3F41",
+                                  activebackground="#2B2B2B", activeforeground="#FFFFFF", font=("Arial", 10))
+    dedupe_check.pack()
+
+    status_label = tk.Label(frame, text="", bg="#2B2B2B", fg="#FFFFFF", font=("Arial", 10))
+    status_label.pack(pady=10)
+
+    # Enable drag-and-drop
+    root.drop_target_register(tkdnd.DND_FILES)
+    root.dnd_bind('<<Drop>>', drop)
+
+    # Start the application
+    root.after(POLL_MS, poll_progress)
+    root.mainloop()
+
+    # Window closed: stop a running batch before the pools shut down
+    cancel_event.set()
+    resume_event.set()
+    batch_executor.shutdown()
+    if executor is not None:
+        executor.shutdown(cancel_futures=True)
@@ -0,0 +1,340 @@
+import os
+import shutil
+from pathlib import Path
+
+from PIL import Image
+
+from ImageConverter import pipeline
+
+
+def make_image(path: Path, size=(64, 48), color=(200, 40, 40)) -> str:
+    Image.new("RGB", size, color).save(path)
+    return str(path)
+
+
+def test_repeated_paths_are_not_their_own_duplicates(tmp_path: Path):
+    a = make_image(tmp_path / "a.png")
+    b = str(tmp_path / "b.png")
+    shutil.copyfile(a, b)
+    spelled_again = os.path.join(str(tmp_path), ".", "a.png")
+
+    assert pipeline.find_duplicates([a, a, spelled_again, b]) == {b: a}
+    assert pipeline.find_duplicates([a, a], perceptual=True) == {}
+
+    for jobs in (1, 2):
+        out = tmp_path / f"out{jobs}"
+        results = list(pipeline.iter_conversions([a, a, b], str(out), jobs=jobs, dedupe="exact"))
+        assert sorted((r.source, r.status) for r in results) == [(a, "converted"), (b, "converted")]
+        assert os.path.samefile(out / "a.webp", out / "b.webp")
+
+
+def test_find_duplicates_exact(tmp_path: Path):
+    a = make_image(tmp_path / "a.png")
+    b = str(tmp_path / "b.png")
+    shutil.copyfile(a, b)
+    # Same size as a but different bytes, and a file of another size
+    c = tmp_path / "c.png"
+    c.write_bytes(Path(a).read_bytes()[:-1] + b"x")
+    d = make_image(tmp_path / "d.png", (65, 48))
+    missing = str(tmp_path / "missing.png")
+
+    assert pipeline.find_duplicates([b, str(c), a, d, missing]) == {a: b}
+    assert pipeline.find_duplicates([a, b, a, b]) == {b: a}
+    assert pipeline.unique_paths([a, b, os.path.join(str(tmp_path), ".", "a.png"), b]) == [a, b]
+
+
+def test_perceptual_dedupe_keeps_originals(tmp_path: Path):
+    import pytest
+    from ImageConverter.__main__ import main
+
+    a = make_image(tmp_path / "a.png")
+    for kwargs in ({"remove_originals": True}, {"out_dir": None}):
+        args = {"out_dir": str(tmp_path / "out"), "dedupe": "perceptual", **kwargs}
+        with pytest.raises(ValueError):
+            next(pipeline.iter_conversions([a], **args))
+    for flag in (["--in-place"], ["--out", str(tmp_path / "out"), "--remove-originals"]):
+        assert main(["convert", a, "--dedupe", "perceptual", *flag]) == 2
+    assert os.path.exists(a)
+
+
+def test_load_image_matches_thumbnail(tmp_path: Path):
+    from PIL import ImageChops, ImageStat
+
+    for size in [(1234, 5678), (5000, 37), (8191, 3333), (1898, 37)]:
+        gradient = Image.radial_gradient("L").resize(size)
+        noise = Image.effect_noise((64, 64), 40).resize(size)
+        img = Image.merge("RGB", [gradient, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT), noise])
+        for ext in ("bmp", "jpg"):
+            path = tmp_path / f"odd.{ext}"
+            img.save(path)
+            loaded = pipeline.load_image(str(path))
+            with Image.open(path) as expected:
+                expected.thumbnail((pipeline.MAX_SIZE, pipeline.MAX_SIZE), Image.Resampling.LANCZOS)
+                assert loaded.size == expected.size, (size, ext)
+                if ext == "bmp":
+                    assert loaded.tobytes() == expected.tobytes(), size
+                else:
+                    # Drafted from the target size, which may be a smaller scale
+                    assert max(ImageStat.Stat(ImageChops.difference(loaded, expected)).mean) < 1, size
+
+
+def test_stale_temporary_outputs_are_removed(tmp_path: Path):
+    src = tmp_path / "src"
+    src.mkdir()
+    a = make_image(src / "a.png")
+    out = tmp_path / "out"
+    out.mkdir()
+    stale = out / "a.webp.4242.tmp"
+    unrelated = out / "notes.tmp"
+    unrelated.write_bytes(b"keep")
+
+    # With or without a journal to resume from
+    for journal in (None, str(tmp_path / "journal")):
+        stale.write_bytes(b"half written")
+        os.utime(stale, (0, 0))
+        (out / "a.webp").unlink(missing_ok=True)
+        results = list(pipeline.iter_conversions([a], str(out), journal=journal))
+        assert [r.status for r in results] == ["converted"]
+        assert sorted(os.listdir(out)) == ["a.webp", "notes.tmp"]
+
+
+def test_journal_resumes_a_partial_run(tmp_path: Path):
+    import threading
+
+    images = [make_image(tmp_path / f"{name}.png", color=color)
+              for name, color in (("a", (255, 0, 0)), ("b", (0, 255, 0)), ("c", (0, 0, 255)))]
+    out = str(tmp_path / "out")
+    journal = str(tmp_path / "journal")
+
+    # Interrupted after the first file: the journal is kept
+    cancel = threading.Event()
+    first_run = []
+    for result in pipeline.iter_conversions(images, out, journal=journal, cancel_event=cancel):
+        first_run.append(result)
+        cancel.set()
+    assert [(r.source, r.status) for r in first_run] == [(images[0], "converted")]
+    assert len(pipeline.Journal(journal)) == 1
+
+    results = list(pipeline.iter_conversions(images, out, journal=journal))
+    assert [(r.source, r.status) for r in results] == [
+        (images[0], "skipped"), (images[1], "converted"), (images[2], "converted")]
+    assert results[0].output == first_run[0].output
+    # A completed run leaves nothing to resume
+    assert not os.path.exists(journal)
+
+
+
+def test_in_place_cache_stays_out_of_image_folders(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(pipeline.sys, "platform", "linux")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    images = tmp_path / "images"
+    images.mkdir()
+    a = make_image(images / "a.png")
+
+    cache = pipeline.default_cache_path(None)
+    assert cache == os.path.join(str(tmp_path / "cache"), "imageconverter", pipeline.CACHE_NAME)
+    assert pipeline.default_cache_path("out") == os.path.join("out", pipeline.CACHE_NAME)
+    results = list(pipeline.iter_conversions([a], None, cache=cache))
+    assert [r.status for r in results] == ["converted"]
+    assert sorted(os.listdir(images)) == ["a.png", "a.webp"]
+    assert os.path.exists(cache)
+
+
+def test_conversion_cache_hits_and_invalidation(tmp_path: Path):
+    a = make_image(tmp_path / "a.png")
+    out = tmp_path / "out"
+    cache = str(tmp_path / "cache.sqlite")
+
+    def run(*paths):
+        return [(os.path.basename(r.source), r.status, "copied from" in r.message)
+                for r in pipeline.iter_conversions(list(paths), str(out), cache=cache)]
+
+    assert run(a) == [("a.png", "converted", False)]
+    assert run(a) == [("a.png", "skipped", False)]
+
+    # An identical image under another name gets the earlier output copied
+    b = str(tmp_path / "b.png")
+    shutil.copyfile(a, b)
+    assert run(b) == [("b.png", "converted", True)]
+
+    # Changed settings, a changed source and a deleted output all convert again
+    assert [r.status for r in pipeline.iter_conversions([a], str(out), cache=cache, max_size=10)] == ["converted"]
+    make_image(tmp_path / "a.png", color=(0, 0, 0))
+    assert run(a) == [("a.png", "converted", False)]
+    os.remove(out / "a.webp")
+    assert run(a) == [("a.png", "converted", False)]
+    assert run(a) == [("a.png", "skipped", False)]
+
+
+def test_conversion_cache_forgets_unconverted_files(tmp_path: Path, monkeypatch):
+    left_over = []
+    close = pipeline.ConversionCache.close
+    monkeypatch.setattr(pipeline.ConversionCache, "close",
+                        lambda self: left_over.append(dict(self._digests)) or close(self))
+    a = make_image(tmp_path / "a.png")
+    broken = tmp_path / "broken.png"
+    broken.write_bytes(b"not an image")
+    cache = str(tmp_path / "cache.sqlite")
+
+    for jobs in (1, 2):
+        results = list(pipeline.iter_conversions([a, str(broken)], str(tmp_path / "out"), jobs=jobs, cache=cache))
+        assert sorted((os.path.basename(r.source), r.status) for r in results) == [
+            ("a.png", "converted" if jobs == 1 else "skipped"), ("broken.png", "failed")]
+    assert left_over == [{}, {}]
+
+
+def test_convert_file_each_format(tmp_path: Path):
+    sources = [make_image(tmp_path / "photo.jpg", (1600, 900)), make_image(tmp_path / "photo2.jpeg"),
+               make_image(tmp_path / "still.webp"), make_image(tmp_path / "logo.png")]
+    transparent = tmp_path / "alpha.png"
+    Image.new("RGBA", (40, 30), (0, 0, 255, 128)).save(transparent)
+    sources.append(str(transparent))
+
+    for target in pipeline.TARGETS:
+        out = tmp_path / target
+        out.mkdir()
+        for source in sources:
+            result = pipeline.convert_file(source, str(out), target)
+            assert result.status == "converted", result.message
+            assert result.output is not None
+            assert result.output == pipeline.output_path_for(source, str(out), target)
+            if target == "webp":
+                with Image.open(result.output) as img:
+                    assert img.format == "WEBP"
+                    assert max(img.size) <= pipeline.MAX_SIZE
+            else:
+                assert Path(result.output).read_text().startswith("<?xml")
+        assert not [name for name in os.listdir(out) if name.endswith(".tmp")]
+
+    broken = tmp_path / "broken.png"
+    broken.write_bytes(b"not an image")
+    result = pipeline.convert_file(str(broken), str(tmp_path / "webp"))
+    assert (result.status, result.output) == ("failed", None)
+
+
+def test_pooled_conversions_match_serial(tmp_path: Path):
+    sources = [make_image(tmp_path / "photo.jpg", (900, 600), (30, 120, 200)), make_image(tmp_path / "logo.png")]
+    photo = Image.effect_noise((300, 200), 60).convert("RGB")
+    photo.save(tmp_path / "noise.png")
+    sources.append(str(tmp_path / "noise.png"))
+
+    for target in pipeline.TARGETS:
+        outputs = {}
+        for jobs in (1, 2):
+            out = tmp_path / f"{target}-{jobs}"
+            results = list(pipeline.iter_conversions(sources, str(out), target, jobs=jobs))
+            assert sorted(r.status for r in results) == ["converted"] * len(sources)
+            outputs[jobs] = {name: (out / name).read_bytes() for name in sorted(os.listdir(out))}
+        assert len(outputs[1]) == len(sources)
+        assert outputs[2] == outputs[1], target
+
+
+def test_iter_image_paths_matches_sorted_walk(tmp_path: Path):
+    root = tmp_path / "root"
+    for rel in ["a.png", "a-b.JPG", "a/b.png", "a/c/d.webp", "a b/e.jpeg", "a0.png", "z.png",
+                "notes.txt", "a/c/readme.md", "B/x.png", "empty/"]:
+        path = root / rel
+        if rel.endswith("/"):
+            path.mkdir(parents=True)
+            continue
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+    single = tmp_path / "single.jpg"
+    single.write_bytes(b"")
+
+    def sorted_walk(raw_paths):
+        # How the converters collected images before iter_image_paths
+        collected = []
+        for raw in raw_paths:
+            if os.path.isfile(raw):
+                if os.path.splitext(raw)[1].lower() in pipeline.SUPPORTED_EXTENSIONS:
+                    collected.append(raw)
+                continue
+            for walk_root, _dirs, files in os.walk(raw):
+                for name in files:
+                    if os.path.splitext(name)[1].lower() in pipeline.SUPPORTED_EXTENSIONS:
+                        collected.append(os.path.join(walk_root, name))
+        return sorted(collected)
+
+    raw_paths = [str(root), str(single)]
+    expected = sorted_walk(raw_paths)
+    assert len(expected) == 9
+    for threads in (1, 8):
+        assert list(pipeline.iter_image_paths([str(root)], ordered=True, threads=threads)) == sorted_walk([str(root)])
+        assert sorted(pipeline.iter_image_paths(raw_paths, threads=threads)) == expected
+    assert pipeline.collect_image_paths(raw_paths) == expected
+
+
+def test_streamed_svg_matches_built_svg():
+    import base64
+    import io
+
+    # Several chunks plus a tail whose length is not a multiple of 3
+    size = 2 * pipeline.SVG_CHUNK_SIZE + 1001
+    payload = (bytes(range(256)) * (size // 256 + 1))[:size]
+    assert size % 3
+    for webp in (payload, memoryview(payload), payload[:2], b""):
+        f = io.BytesIO()
+        pipeline.write_svg_with_webp_embed(f, 640, 480, webp)
+        built = pipeline.build_svg_with_webp_embed(640, 480, base64.b64encode(webp).decode("ascii"))
+        assert f.getvalue() == built.encode("utf-8")
+
+
+def test_complexity_backends_agree():
+    import pytest
+
+    img = Image.merge("RGB", [Image.radial_gradient("L"), Image.linear_gradient("L"),
+                              Image.effect_noise((256, 256), 30)])
+    pillow = pipeline._measure_pillow(pipeline.make_preview(img))
+    if pipeline.np is None:
+        pytest.skip("NumPy is not installed")
+    numpy = pipeline._measure_numpy(pipeline.make_preview(img))
+    assert numpy.unique_colors == pillow.unique_colors
+    assert numpy.edge_density == pytest.approx(pillow.edge_density)
+    assert numpy.entropy == pytest.approx(pillow.entropy, abs=1e-6)
+
+
+
+def test_complexity_classifies_graphics_and_photos(monkeypatch):
+    import pytest
+    from PIL import ImageDraw, ImageFilter, ImageFont
+
+    flat = Image.new("RGB", (800, 600), (240, 240, 235))
+    draw = ImageDraw.Draw(flat)
+    draw.rectangle((100, 100, 500, 400), fill=(30, 90, 200))
+    draw.ellipse((450, 300, 700, 550), fill=(220, 60, 40))
+
+    text = Image.new("RGB", (900, 600), "white")
+    draw = ImageDraw.Draw(text)
+    font = ImageFont.load_default(size=22)
+    for i in range(18):
+        draw.text((20, 10 + 32 * i), "The quick brown fox jumps over the lazy dog 0123456789", fill="black", font=font)
+
+    chart = Image.new("RGB", (800, 500), "white")
+    draw = ImageDraw.Draw(chart)
+    for y in range(60, 460, 50):
+        draw.line((60, y, 780, y), fill=(200, 200, 200))
+    for i, height in enumerate([120, 300, 220, 380, 160, 260]):
+        colour = [(31, 119, 180), (255, 127, 14), (44, 160, 44)][i % 3]
+        draw.rectangle((90 + i * 110, 460 - height, 160 + i * 110, 459), fill=colour)
+    draw.line((60, 20, 60, 460, 780, 460), fill="black", width=2)
+    draw.line([(60 + x * 12, 300 - (x * 7) % 150) for x in range(60)], fill=(214, 39, 40), width=3)
+
+    size = (800, 600)
+    photo = Image.merge("RGB", [Image.radial_gradient("L").resize(size), Image.linear_gradient("L").resize(size),
+                                Image.effect_noise(size, 60)])
+    photo = Image.blend(photo, Image.effect_noise(size, 50).convert("RGB"), 0.5).filter(ImageFilter.GaussianBlur(1))
+
+    cases = {"flat": (flat, True), "text": (text, True), "chart": (chart, True), "photo": (photo, False)}
+    measured = {name: pipeline.measure_complexity(img) for name, (img, _) in cases.items()}
+    for name, (_, lossless) in cases.items():
+        assert measured[name].lossless is lossless, (name, measured[name])
+
+    # The Pillow fallback classifies every image the same way
+    monkeypatch.setattr(pipeline, "np", None)
+    for name, (img, lossless) in cases.items():
+        fallback = pipeline.measure_complexity(img)
+        assert fallback.lossless is lossless, name
+        assert fallback.unique_colors == measured[name].unique_colors
+        assert fallback.entropy == pytest.approx(measured[name].entropy, abs=1e-6)
+        assert fallback.edge_density == pytest.approx(measured[name].edge_density)